@@ -0,0 +1,130 @@
+"""
+Benchmark do modo analítico (utils.analytics, DuckDB) nos Relatórios.
+
+Todo o histórico (--years) com os filtros da tela, a partir da mesma cópia
+local das entregas (utils.delivery_cache), de dois jeitos:
+- pandas: relatório do período em memória (load_report_index) -> filtros
+  pelos índices -> cubo / famílias / totais por groupby -> export_csv e
+  export_excel_pretty do DataFrame
+- duckdb: cubo, resumo e exportação em SQL, lida em lotes direto para o
+  CSV / Excel
+Cada etapa começa fria (caches do banco, dos períodos e dos arquivos
+vazios). Confere que os números e os CSVs são iguais.
+
+Banco: SQLite local (só para montar a cópia local; a medição não vai ao banco
+além das dimensões).
+
+Uso:
+    python benchmarks/bench_analytics.py --scale 1 --years 3
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from seed_data import generate  # noqa: E402
+from utils import analytics, delivery_cache  # noqa: E402
+from utils.db import use_client, clear_cache  # noqa: E402
+from utils.sqlite_backend import SQLiteClient, SYNC_TABLES  # noqa: E402
+from utils.reports import (load_dimensions, load_report_index, clear_report_index, filter_options,  # noqa: E402
+                           export_csv, export_excel_pretty)
+from utils.delivery_cube import _cube_from_report, filter_cube, rollup  # noqa: E402
+
+BY = ("Dia", "Célula", "Supervisor")
+
+
+def by_pandas(start, end, dims, filters):
+    index = load_report_index(start, end, dims)
+    f = index.select(**filters)
+    cube = filter_cube(_cube_from_report(start, end, dims), **filters)
+    numbers = (len(f), int(f["Quantidade"].sum()), int(f["Telefone Representante"].nunique()),
+               {by: rollup(cube, by)["Cestas"].astype(int).rename(index=str).sort_index().to_dict() for by in BY})
+    return numbers, lambda: export_csv(f), lambda: export_excel_pretty(f)
+
+
+def by_duckdb(start, end, dims, filters):
+    s = analytics.summary(start, end, dims, **filters)
+    cube = analytics.load_cube(start, end, dims, **filters)
+    numbers = (s["deliveries"], s["baskets"], s["families"],
+               {by: rollup(cube, by)["Cestas"].astype(int).rename(index=str).sort_index().to_dict() for by in BY})
+    return (numbers, lambda: analytics.export("csv", start, end, dims, **filters),
+            lambda: analytics.export("xlsx", start, end, dims, **filters))
+
+
+def cold():
+    clear_cache()
+    clear_report_index()
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, (time.perf_counter() - t0) * 1000
+
+
+def measure(fn, start, end, filters, repeat):
+    rows = {"resumo": [], "csv": [], "xlsx": []}
+    out = None
+    for _ in range(repeat):
+        cold()
+        dims = load_dimensions()
+        (numbers, csv, xlsx), ms = timed(lambda: fn(start, end, dims, filters))
+        rows["resumo"].append(ms)
+        csv_bytes, ms = timed(csv)
+        rows["csv"].append(ms)
+        rows["xlsx"].append(timed(xlsx)[1])
+        out = numbers, csv_bytes
+    return out, {step: statistics.median(v) for step, v in rows.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tables = generate(args.scale * args.years / 2, args.seed, days=365 * args.years)
+    local = SQLiteClient(":memory:", journal=False)
+    for table in SYNC_TABLES:
+        local.load_rows(table, tables.get(table, []))
+    use_client(local)
+
+    start = date.fromisoformat(min(d["delivered_at"] for d in tables["deliveries"])[:10])
+    end = date.fromisoformat(max(d["delivered_at"] for d in tables["deliveries"])[:10])
+    options = filter_options(load_dimensions())
+    cases = {
+        "sem filtros": {},
+        "1 supervisor": {"supervisor": options["supers"][0]},
+        "célula + cesta": {"cell": options["cells"][0], "basket": options["baskets"][0]},
+    }
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        delivery_cache.CACHE_DIR = tmp
+        delivery_cache.ENABLED = True
+        analytics.snapshot(full=True)
+        print(f"{len(tables['deliveries'])} entregas em {args.years} anos ({start} a {end})")
+        print(f"{'':<16} {'':<8} {'resumo':>10} {'csv':>10} {'xlsx':>10}   (ms)")
+        for case, filters in cases.items():
+            results = {}
+            for label, fn in (("pandas", by_pandas), ("duckdb", by_duckdb)):
+                results[label], steps = measure(fn, start, end, filters, args.repeat)
+                cells = "".join(f"{ms:>11.0f}" for ms in steps.values())
+                print(f"{case:<16} {label:<8} {cells}", flush=True)
+            same = results["pandas"] == results["duckdb"]
+            ok &= same
+            print(f"{'':<16} {'✅ mesmos números e CSV' if same else '❌ resultados diferentes'}"
+                  f" ({results['duckdb'][0][0]} entregas)")
+    use_client(None)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Benchmark da disponibilidade das cestas no Dashboard (utils.calculations).
+
+Mede o cálculo de cada rerun, em cadastros de tamanhos diferentes:
+- completo: compute_availability de todas as cestas (o que havia antes)
+- incremental: cached_availability (compara estoque e receitas e recalcula
+  só as cestas afetadas)
+Em dois momentos: rerun sem mudança e rerun depois de uma baixa de estoque
+(lista nova do inventory com 1 produto diferente). Confere que todos dão o
+mesmo resultado do cálculo completo.
+
+Uso:
+    python benchmarks/bench_availability.py --repeat 200
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from utils.calculations import (compute_availability, cached_availability, clear_availability_cache,  # noqa: E402
+                                group_recipes, inventory_map)
+
+# (cestas, produtos no cadastro, itens por receita)
+SIZES = [(5, 60, 15), (20, 300, 25), (100, 2000, 40)]
+
+
+def dataset(baskets, products, per_recipe, seed):
+    rng = random.Random(seed)
+    pids = [f"produto-{i:05d}" for i in range(products)]
+    items = [{"basket_type_id": f"cesta-{b:03d}", "product_id": pid, "quantity_required": float(rng.randint(1, 3))}
+             for b in range(baskets) for pid in rng.sample(pids, per_recipe)]
+    inventory = [{"product_id": pid, "quantity": float(rng.randint(0, 500))} for pid in pids]
+    return [f"cesta-{b:03d}" for b in range(baskets)], items, inventory
+
+
+def rerun(mode, ids, items, inventory):
+    # mesma sequência do Dashboard: agrupa as leituras e calcula
+    recipes, inv_map = group_recipes(items, ids), inventory_map(inventory)
+    if mode == "completo":
+        return compute_availability(recipes=recipes, inv_map=inv_map)
+    return cached_availability(ids, recipes, inv_map)
+
+
+def measure(mode, ids, items, inventory, repeat, write):
+    clear_availability_cache()
+    rerun(mode, ids, items, inventory)
+    times, out = [], None
+    for i in range(repeat):
+        if write:
+            # baixa de 1 produto: o cache do banco devolve uma lista nova
+            inventory = [dict(r) for r in inventory]
+            inventory[i % len(inventory)]["quantity"] -= 1
+        t0 = time.perf_counter()
+        out = rerun(mode, ids, items, inventory)
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    return out, inventory, times[len(times) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    ok = True
+    print(f"{'cadastro':<26} {'momento':<16} {'completo':>10} {'incremental':>12}   (ms, mediana)")
+    for baskets, products, per_recipe in SIZES:
+        ids, items, inventory = dataset(baskets, products, per_recipe, args.seed)
+        label = f"{baskets} cestas x {products} prod."
+        for moment, write in (("sem mudança", False), ("depois de baixa", True)):
+            cells = []
+            for mode in ("completo", "incremental"):
+                out, last_inventory, ms = measure(mode, ids, items, inventory, args.repeat, write)
+                expected = compute_availability(recipes=group_recipes(items, ids), inv_map=inventory_map(last_inventory))
+                ok &= out == expected
+                cells.append(f"{ms:>12.3f}" if cells else f"{ms:>10.3f}")
+            print(f"{label:<26} {moment:<16} {' '.join(cells)}", flush=True)
+    print("✅ mesmos resultados do cálculo completo" if ok else "❌ resultados diferentes")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Benchmark: requests e latência do registro de entrega x tamanho da cesta.
+
+Compara, no backend em memória (utils.local_backend):
+- por linha   : algoritmo antigo (1 insert da entrega + 4 requests por item)
+- em lote     : caminho sem migrations, usando insert_rows/upsert_rows
+- RPC         : register_delivery_tx (migrations/0002), 1 request
+
+A latência "estimada" soma o tempo local com requests x RTT (--rtt-ms),
+que é o que domina quando o banco é o Supabase na nuvem.
+
+Uso:
+    python benchmarks/bench_bulk_writes.py --sizes 1 5 10 20 50 --rtt-ms 80
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from utils.db import use_client, fetch_table, insert_row, update_row  # noqa: E402
+from utils.local_backend import MemoryClient  # noqa: E402
+from utils.operations import register_delivery  # noqa: E402
+
+
+def seed(n_items):
+    products = [{"id": f"p{i}", "name": f"Produto {i}"} for i in range(n_items)]
+    return {
+        "products": products,
+        "inventory": [{"id": f"i{i}", "product_id": p["id"], "quantity": 1_000_000.0} for i, p in enumerate(products)],
+        "basket_type_items": [
+            {"id": f"bi{i}", "basket_type_id": "b1", "product_id": p["id"], "quantity_required": 1.0}
+            for i, p in enumerate(products)
+        ],
+    }
+
+
+def legacy_register_delivery(basket_type_id, quantity):
+    """Cópia do register_delivery original (read-modify-write por item)."""
+    delivery = insert_row("deliveries", {
+        "family_id": "f1", "leader_id": "l1", "basket_type_id": basket_type_id,
+        "quantity": int(quantity), "notes": None, "is_partial": False, "partial_notes": None
+    })[0]
+    for it in fetch_table("basket_type_items", {"basket_type_id": basket_type_id}):
+        pid = it["product_id"]
+        qty = float(it["quantity_required"]) * int(quantity)
+        inv = fetch_table("inventory", {"product_id": pid}, use_cache=False)
+        update_row("inventory", {"product_id": pid}, {"quantity": float(inv[0]["quantity"]) - qty})
+        insert_row("stock_movements", {"product_id": pid, "qty_change": -qty,
+                                       "movement_type": "saida_cesta", "reference": f"Entrega {delivery['id']}"})
+        insert_row("delivery_items", {"delivery_id": delivery["id"], "product_id": pid, "qty_delivered": qty})
+    return delivery
+
+
+def measure(mode, n_items, repeat):
+    client = MemoryClient(seed(n_items), rpc_functions={} if mode != "RPC" else None)
+    use_client(client)
+    fetch_table("basket_type_items", {"basket_type_id": "b1"})  # receita em cache, como no app
+    client.request_count = 0
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        if mode == "por linha":
+            legacy_register_delivery("b1", 1)
+        else:
+            register_delivery("f1", "l1", "b1", 1, "Família")
+    elapsed = (time.perf_counter() - t0) / repeat
+    return client.request_count / repeat, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 5, 10, 20, 50, 100])
+    parser.add_argument("--rtt-ms", type=float, default=80.0)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'itens':>6} | {'modo':<10} | {'requests':>8} | {'local (ms)':>10} | {'estimado (ms)':>13}")
+    print("-" * 60)
+    for n in args.sizes:
+        for mode in ("por linha", "em lote", "RPC"):
+            requests, elapsed = measure(mode, n, args.repeat)
+            estimated = elapsed * 1000 + requests * args.rtt_ms
+            print(f"{n:>6} | {mode:<10} | {requests:>8.0f} | {elapsed * 1000:>10.2f} | {estimated:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark do cache local das entregas (utils.delivery_cache) nos Relatórios.
+
+Carrega 1 ano de entregas para a página (load_report_index, frio) de dois jeitos:
+- banco: a view delivery_report, paginada (o caminho sem DELIVERY_CACHE)
+- cache: sync incremental (marca d'água + checksums) + leitura do arquivo
+  com memory map + famílias/dimensões do banco
+Antes da medição o cache é criado (cópia completa) e uma entrega nova (de
+hoje, fora do período medido) é registrada a cada rodada, para o sync ter o
+que buscar. Confere que os dois
+relatórios são iguais.
+
+Banco: SQLite local (schema das migrations); --rtt soma a ida e volta ao
+servidor em cada request, como no Supabase.
+
+Uso:
+    python benchmarks/bench_delivery_cache.py --scale 0.5 --rtt 80
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from seed_data import generate  # noqa: E402
+from utils import delivery_cache  # noqa: E402
+from utils.db import use_client, clear_cache, insert_row  # noqa: E402
+from utils.local_backend import LatencyClient  # noqa: E402
+from utils.sqlite_backend import SQLiteClient, SYNC_TABLES  # noqa: E402
+from utils.reports import load_dimensions, load_report_index, clear_report_index  # noqa: E402
+
+
+def measure(label, start, end, local, tables, repeat):
+    times, requests, df = [], [], None
+    for k in range(repeat):
+        d = tables["deliveries"][k]
+        insert_row("deliveries", {"family_id": d["family_id"], "leader_id": d["leader_id"],
+                                  "basket_type_id": d["basket_type_id"], "quantity": 1,
+                                  "delivered_at": datetime.now(timezone.utc).isoformat()})
+        clear_cache()
+        clear_report_index()
+        before = local.request_count
+        t0 = time.perf_counter()
+        df = load_report_index(start, end, load_dimensions()).df
+        times.append((time.perf_counter() - t0) * 1000)
+        requests.append(local.request_count - before)
+    print(f"{label:<8} {statistics.median(times):>10.1f} ms   {statistics.median(requests):>5.0f} requests   "
+          f"{len(df)} entregas", flush=True)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--rtt", type=float, default=0.0, help="ms de ida e volta por request")
+    args = parser.parse_args()
+
+    tables = generate(args.scale, args.seed)
+    local = SQLiteClient(":memory:", journal=False)
+    for table in SYNC_TABLES:
+        local.load_rows(table, tables.get(table, []))
+    use_client(LatencyClient(local, args.rtt) if args.rtt else local)
+
+    end = date.fromisoformat(max(d["delivered_at"] for d in tables["deliveries"])[:10])
+    start = end - timedelta(days=364)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        delivery_cache.CACHE_DIR = tmp
+        delivery_cache.sync()
+        size = delivery_cache.DeliveryCache().size() / 2**20
+        print(f"{len(tables['deliveries'])} entregas no total, arquivos {size:.1f} MiB")
+        for label, enabled in (("banco", False), ("cache", True)):
+            delivery_cache.ENABLED = enabled
+            results[label] = measure(label, start, end, local, tables, args.repeat)
+    use_client(None)
+
+    old, new = (df.astype({c: object for c in df.columns if df[c].dtype == "category"}) for df in results.values())
+    same = new.equals(old)
+    print("✅ mesmos relatórios" if same else "❌ relatórios diferentes")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Benchmark do cubo de entregas (utils.delivery_cube) no Resumo dos Relatórios.
+
+Compara, para 1 ano de entregas, o Resumo (entregas, cestas, famílias) e os
+totais por dia / célula / supervisor:
+- linha a linha: lê as entregas do período (load_report_index) e agrega no app
+- cubo: lê delivery_cube (mantido pelos triggers) + delivery_family_count
+Cada rodada começa fria (cache do banco e dos períodos vazios). Confere que
+as duas formas dão os mesmos números.
+
+Os dados saem de seed_data, mas com a distribuição como ela acontece: as
+entregas do mês são feitas no primeiro sábado, pelo líder da célula da
+família, e cada família recebe sempre o mesmo tipo de cesta (um dos
+BASKET_KINDS mais comuns); algumas entregas não têm família ("-"). No seed
+puro cada entrega tem dia, líder e cesta sorteados e quase não há o que
+agregar.
+
+Banco: SQLite local (schema e triggers das migrations); --rtt soma a ida e
+volta ao servidor em cada request, como no Supabase.
+
+Uso:
+    python benchmarks/bench_delivery_cube.py --scale 0.5 --rtt 80
+"""
+import argparse
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from seed_data import generate  # noqa: E402
+from utils.db import use_client, clear_cache  # noqa: E402
+from utils.local_backend import LatencyClient  # noqa: E402
+from utils.sqlite_backend import SQLiteClient, SYNC_TABLES  # noqa: E402
+from utils.reports import load_dimensions, load_report_index, clear_report_index  # noqa: E402
+from utils.delivery_cube import load_cube, summary, rollup, family_count  # noqa: E402
+
+BY = ("Dia", "Célula", "Supervisor")
+
+# tipos de cesta entregues de fato (os demais ficam no cadastro)
+BASKET_KINDS = 3
+# 1 a cada N entregas sem família
+NO_FAMILY_EVERY = 500
+
+
+def distribution_days(tables):
+    """Entregas no 1º sábado do mês, pelo líder da célula, sempre a mesma cesta por família."""
+    cell_leader = {c["id"]: c["leader_id"] for c in tables["cells"]}
+    family_cell = {f["id"]: f["cell_id"] for f in tables["families"]}
+    kinds = [b["id"] for b in tables["basket_types"][:BASKET_KINDS]]
+    family_basket = {f["id"]: kinds[k % len(kinds)] for k, f in enumerate(tables["families"])}
+    for d in tables["deliveries"]:
+        at = datetime.fromisoformat(d["delivered_at"]).replace(day=1)
+        at += timedelta(days=(5 - at.weekday()) % 7)
+        d["delivered_at"] = d["created_at"] = at.isoformat()
+        d["leader_id"] = cell_leader.get(family_cell.get(d["family_id"])) or d["leader_id"]
+        d["basket_type_id"] = family_basket[d["family_id"]]
+    # algumas entregas avulsas, sem família: no Resumo contam como uma família "-"
+    for d in tables["deliveries"][::NO_FAMILY_EVERY]:
+        d["family_id"] = None
+    return tables
+
+
+def by_rows(start, end, dims):
+    df = load_report_index(start, end, dims).df
+    day = df.assign(Dia=df["Data"].dt.normalize())
+    totals = {by: day.groupby(by, observed=True)["Quantidade"].sum() for by in BY}
+    return (len(df), int(df["Quantidade"].sum()), int(df["Telefone Representante"].nunique())), totals
+
+
+def by_cube(start, end, dims):
+    cube = load_cube(start, end, dims)
+    s = summary(cube)
+    totals = {by: rollup(cube, by)["Cestas"] for by in BY}
+    return (s["deliveries"], s["baskets"], family_count(start, end, dims)), totals
+
+
+def measure(fn, start, end, client, counter, repeat):
+    times, requests, out = [], [], None
+    for _ in range(repeat):
+        clear_cache()
+        clear_report_index()
+        before = counter.request_count
+        t0 = time.perf_counter()
+        dims = load_dimensions()
+        out = fn(start, end, dims)
+        times.append((time.perf_counter() - t0) * 1000)
+        requests.append(counter.request_count - before)
+    return out, statistics.median(times), statistics.median(requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--rtt", type=float, default=0.0, help="ms de ida e volta por request")
+    args = parser.parse_args()
+
+    tables = distribution_days(generate(args.scale, args.seed))
+    local = SQLiteClient(":memory:", journal=False)
+    for table in SYNC_TABLES:
+        local.load_rows(table, tables.get(table, []))
+    client = LatencyClient(local, args.rtt) if args.rtt else local
+    use_client(client)
+
+    end = date.fromisoformat(max(d["delivered_at"] for d in tables["deliveries"])[:10])
+    start = end - timedelta(days=364)
+    cube_rows = local.conn.execute("select count(*) from delivery_cube where day >= ?",
+                                   (start.isoformat(),)).fetchone()[0]
+
+    results = {}
+    for label, fn in (("linha a linha", by_rows), ("cubo", by_cube)):
+        results[label], ms, requests = measure(fn, start, end, client, local, args.repeat)
+        print(f"{label:<16} {ms:>10.1f} ms   {requests:>5.0f} requests", flush=True)
+    (rows_summary, rows_totals), (cube_summary, cube_totals) = results.values()
+    print(f"{rows_summary[0]} entregas em 1 ano -> {cube_rows} linhas no cubo "
+          f"({rows_summary[0] / max(cube_rows, 1):.1f} entregas por linha)")
+
+    same = rows_summary == cube_summary and all(
+        rows_totals[by].astype(int).sort_index().equals(cube_totals[by].astype(int).sort_index()) for by in BY
+    )
+    print(f"✅ mesmos totais {cube_summary}" if same else f"❌ totais diferentes: {rows_summary} x {cube_summary}")
+    use_client(None)
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+Benchmark do export Excel (utils.reports.export_excel_pretty).
+
+Compara o export atual (workbook write-only) com a implementação antiga
+(pandas.ExcelWriter + estilo/largura célula a célula, copiada abaixo) num
+relatório sintético com as colunas de REPORT_COLUMNS. Cada versão roda num
+processo separado: tempo e pico de memória do processo (ru_maxrss) acima do
+que já estava em uso antes do export. Depois confere se as duas planilhas
+têm os mesmos valores, larguras, freeze e filtro.
+
+Uso:
+    python benchmarks/bench_export.py --rows 100000
+"""
+import argparse
+import io
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from utils.reports import REPORT_COLUMNS, export_excel_pretty  # noqa: E402
+
+
+def export_excel_legacy(df):
+    """Implementação anterior, para comparação."""
+    from openpyxl.styles import Font, PatternFill, Alignment
+
+    output = io.BytesIO()
+    if "Data" in df.columns:
+        df = df.copy()
+        df["Data"] = pd.to_datetime(df["Data"], errors="coerce", utc=True).dt.tz_localize(None)
+
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False, sheet_name="Entregas")
+        ws = writer.sheets["Entregas"]
+        ws.freeze_panes = "A2"
+        ws.auto_filter.ref = ws.dimensions
+        for cell in ws[1]:
+            cell.font = Font(bold=True, color="FFFFFF")
+            cell.fill = PatternFill("solid", fgColor="4F4F4F")
+            cell.alignment = Alignment(horizontal="center", vertical="center")
+        for col in ws.columns:
+            max_length = 0
+            for cell in col:
+                if cell.value:
+                    max_length = max(max_length, len(str(cell.value)))
+            ws.column_dimensions[col[0].column_letter].width = min(max_length + 2, 45)
+    return output.getvalue()
+
+
+def report_frame(rows, seed=42):
+    """Relatório sintético no formato de load_report."""
+    rng = random.Random(seed)
+    people = [f"Pessoa {i} da Silva" for i in range(5000)]
+    cells = [(f"Célula {i}", f"Rede {i % 12}") for i in range(300)]
+    leaders = [(f"Líder {i}", f"(11) 9{i:04d}-0000", f"Rede {i % 12}") for i in range(400)]
+    supers = [(f"Supervisor {i}", f"(11) 8{i:04d}-0000") for i in range(40)] + [("-", "-")]
+    baskets = ["Cesta Básica", "Cesta Grande", "Cesta Especial de Natal", "Kit Limpeza"]
+    start = datetime(2024, 1, 1)
+
+    data = []
+    for _ in range(rows):
+        cell, net = rng.choice(cells)
+        leader, phone, lnet = rng.choice(leaders)
+        sup, sphone = rng.choice(supers)
+        data.append((
+            start + timedelta(seconds=rng.randint(0, 730 * 86400)),
+            rng.choice(people), f"(21) 9{rng.randint(0, 99999999):08d}",
+            cell, net, sup, sphone, leader, phone, lnet,
+            rng.choice(baskets), rng.randint(1, 3),
+        ))
+    df = pd.DataFrame(data, columns=REPORT_COLUMNS)
+    # famílias sem telefone: célula vazia no Excel
+    df.loc[df.sample(frac=0.02, random_state=seed).index, "Telefone Representante"] = None
+    return df.sort_values("Data", kind="stable").reset_index(drop=True)
+
+
+VARIANTS = {"antigo": export_excel_legacy, "write-only": export_excel_pretty}
+
+
+def _max_rss_mib():
+    # Linux: KiB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_variant(name, rows, seed, out):
+    """Roda um export (processo novo) e imprime: segundos, pico MiB acima da base."""
+    df = report_frame(rows, seed)
+    base = _max_rss_mib()
+    t0 = time.perf_counter()
+    data = VARIANTS[name](df)
+    elapsed = time.perf_counter() - t0
+    Path(out).write_bytes(data)
+    print(f"{elapsed} {_max_rss_mib() - base}")
+
+
+def read_back(data):
+    from openpyxl import load_workbook
+    wb = load_workbook(io.BytesIO(data))
+    ws = wb["Entregas"]
+    values = list(ws.iter_rows(values_only=True))
+    widths = {k: d.width for k, d in ws.column_dimensions.items()}
+    return values, widths, ws.freeze_panes, ws.auto_filter.ref
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-check", action="store_true", help="não relê as planilhas para comparar")
+    parser.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        run_variant(args.variant, args.rows, args.seed, args.out)
+        return 0
+
+    print(f"{args.rows} linhas x {len(REPORT_COLUMNS)} colunas")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in VARIANTS:
+            out = Path(tmp) / f"{name}.xlsx"
+            line = subprocess.run(
+                [sys.executable, __file__, "--rows", str(args.rows), "--seed", str(args.seed),
+                 "--variant", name, "--out", str(out)],
+                check=True, capture_output=True, text=True
+            ).stdout.split()
+            elapsed, peak = float(line[0]), float(line[1])
+            results[name] = out.read_bytes()
+            print(f"{name:<12} {elapsed:>8.2f} s   pico +{peak:>7.1f} MiB   arquivo {len(results[name]) / 2**20:>6.1f} MiB",
+                  flush=True)
+
+    if not args.no_check:
+        old, new = (read_back(d) for d in results.values())
+        print("✅ mesmos valores, larguras, freeze e filtro" if old == new else "❌ planilhas diferentes")
+        return 0 if old == new else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
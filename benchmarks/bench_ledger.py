@@ -0,0 +1,101 @@
+"""
+Benchmark do ledger de estoque (utils/ledger.py) sobre dados sintéticos.
+
+Carrega os dados de seed_data num SQLite em memória (com os índices das
+migrations, como o Postgres, e o mesmo max-rows de 1000 do Supabase: cada
+leitura confere que nenhum movimento ficou de fora) e mede:
+- leitura + reconstrução do ledger inteiro e reconciliação com inventory
+- gravação dos checkpoints mensais e reconstrução a partir do último
+- consultas "saldo em D" (busca binária por produto)
+- compactação dos movimentos com mais de 1 ano, verify e o ledger depois dela
+
+Uso:
+    python benchmarks/bench_ledger.py --scale 1
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from seed_data import generate  # noqa: E402
+from utils.db import use_client  # noqa: E402
+from utils.sqlite_backend import SQLiteClient  # noqa: E402
+from utils import ledger, compaction  # noqa: E402
+
+# max-rows do Supabase (PostgREST)
+MAX_ROWS = 1000
+
+
+def check(label, got, expected):
+    print(f"  {'✅' if got == expected else '❌'} {label}: {got} (esperado {expected})")
+    return got == expected
+
+
+def timed(label, fn):
+    t0 = time.perf_counter()
+    out = fn()
+    print(f"{label:<38} {(time.perf_counter() - t0) * 1000:>10.1f} ms", flush=True)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--queries", type=int, default=10_000)
+    args = parser.parse_args()
+
+    tables = generate(args.scale, args.seed)
+    # max-rows como o PostgREST: leitura sem paginação correta perde movimentos
+    client = SQLiteClient(":memory:", journal=False, max_rows=MAX_ROWS)
+    for table, rows in tables.items():
+        client.load_rows(table, rows)
+    use_client(client)
+    print(f"scale={args.scale}: {len(tables['stock_movements'])} movimentos, {len(tables['products'])} produtos")
+
+    full = timed("ledger completo (leitura + cumsum)", lambda: ledger.load_ledger(use_checkpoints=False))
+    ok = check("movimentos lidos", len(full), len(tables["stock_movements"]))
+    drift = timed("reconcile (sobre o ledger carregado)", lambda: ledger.reconcile(full))
+    print(f"  {len(drift)} produto(s) com drift")
+
+    last = max(m["created_at"] for m in tables["stock_movements"])
+    cut = date.fromisoformat(last[:10]) - timedelta(days=45)
+    n = timed("checkpoints mensais", lambda: ledger.save_checkpoints(full, until=cut))
+    print(f"  {n} linhas")
+    inc = timed("ledger a partir do último checkpoint", ledger.load_ledger)
+    print(f"  {len(inc)} movimentos lidos (a partir de {inc.base_time})")
+    ok &= check("movimentos depois do checkpoint", len(inc),
+                sum(m["created_at"] >= inc.base_time.isoformat() for m in tables["stock_movements"]))
+
+    rng = random.Random(args.seed)
+    pids = list(full.products)
+    day = date.fromisoformat(last[:10])
+    queries = [(rng.choice(pids), day - timedelta(days=rng.randint(0, 700))) for _ in range(args.queries)]
+    t0 = time.perf_counter()
+    for pid, d in queries:
+        full.as_of(pid, d)
+    print(f"{'saldo em D (por consulta)':<38} {(time.perf_counter() - t0) / len(queries) * 1e6:>10.1f} µs")
+
+    with tempfile.TemporaryDirectory() as archive:
+        now = datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc)
+        r = timed("compactação (> 365 dias)", lambda: compaction.compact(365, archive, now=now))
+        print(f"  {r['archived']} movimentos → {r['summaries']} resumos")
+        ok &= check("movimentos arquivados", r["archived"],
+                    sum(m["created_at"] < r["before"] for m in tables["stock_movements"]))
+        v = timed("verify", lambda: compaction.verify(archive))
+        print(f"  {'✅ consistente' if v['ok'] else '❌ inconsistente'}")
+        ok &= v["ok"]
+    after = timed("ledger completo depois da compactação", lambda: ledger.load_ledger(use_checkpoints=False))
+    ok &= check("movimentos depois da compactação", len(after),
+                len(tables["stock_movements"]) - r["archived"] + r["summaries"])
+    use_client(None)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Benchmark do relatório compacto (category) e dos índices de filtro
+(utils.reports.ReportIndex).
+
+Monta o relatório de N entregas (seed_data + build_report_frame, como no
+caminho sem a view) e compara:
+- memória: colunas object x category (memory_usage(deep=True))
+- filtros: máscaras booleanas sobre o frame inteiro (o jeito anterior de
+  filtrar em pandas) x recorte por data + intersecção dos índices
+Confere que os dois filtros devolvem as mesmas linhas.
+
+Uso:
+    python benchmarks/bench_report_index.py --deliveries 100000
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from bench_report_join import dataset  # noqa: E402
+from utils.reports import FILTER_COLUMNS, ReportIndex, build_report_frame  # noqa: E402
+
+
+def mask_filter(df, start, end, **filters):
+    """Filtro por máscaras booleanas sobre todas as linhas."""
+    keep = (df["Data"] >= pd.Timestamp(start)) & (df["Data"] < pd.Timestamp(end + timedelta(days=1)))
+    for name, value in filters.items():
+        if value is not None:
+            keep &= df[FILTER_COLUMNS[name]] == value
+    return df[keep]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--deliveries", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    deliveries, families, dims = dataset(args.deliveries, args.seed)
+    df = build_report_frame(deliveries, families, dims)
+    df["Data"] = pd.to_datetime(df["Data"], utc=True).dt.tz_localize(None)
+    df = df.sort_values("Data", kind="stable").reset_index(drop=True)
+
+    t0 = time.perf_counter()
+    index = ReportIndex(df)
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    before = df.memory_usage(deep=True).sum() / 2**20
+    after = index.df.memory_usage(deep=True).sum() / 2**20
+    print(f"{len(df)} linhas")
+    print(f"{'memória object':<30} {before:>10.1f} MiB")
+    print(f"{'memória category':<30} {after:>10.1f} MiB  ({before / after:.1f}x menor)")
+    print(f"{'montar o índice':<30} {build_ms:>10.1f} ms")
+
+    rng = random.Random(args.seed)
+    values = {name: sorted(index.groups[col]) for name, col in FILTER_COLUMNS.items()}
+    first, last = df["Data"].min().date(), df["Data"].max().date()
+    span = (last - first).days
+    queries = []
+    for _ in range(args.queries):
+        start = first + timedelta(days=rng.randint(0, span // 2))
+        end = start + timedelta(days=rng.randint(7, span // 2))
+        filters = {name: rng.choice(v) if rng.random() < 0.4 else None for name, v in values.items()}
+        queries.append((start, end, filters))
+
+    timings = {}
+    results = {}
+    for label, fn in (("máscaras (object)", lambda s, e, f: mask_filter(df, s, e, **f)),
+                      ("índices (category)", lambda s, e, f: index.select(s, e, **f))):
+        t0 = time.perf_counter()
+        results[label] = [fn(s, e, f) for s, e, f in queries]
+        timings[label] = (time.perf_counter() - t0) / len(queries) * 1000
+        print(f"{label:<30} {timings[label]:>10.2f} ms por filtro", flush=True)
+
+    old, new = results.values()
+    same = all(a.reset_index(drop=True).astype(object).equals(b.astype(object)) for a, b in zip(old, new))
+    print("✅ mesmas linhas" if same else "❌ filtros diferentes")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
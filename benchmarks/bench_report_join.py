@@ -0,0 +1,139 @@
+"""
+Benchmark + conferência do join do relatório (utils.reports.build_report_frame).
+
+Compara o join vetorizado (posições via pandas.Index) com o join antigo, entrega a
+entrega com dicionários (copiado abaixo), sobre os dados de seed_data com
+casos de borda injetados:
+- entregas de famílias apagadas, cestas apagadas e líderes apagados
+- famílias sem célula e sem telefone
+- células sem supervisor ou com supervisor apagado (fallback para o do líder)
+- líderes sem supervisor
+
+Sai com erro se os dois DataFrames não forem idênticos.
+
+Uso:
+    python benchmarks/bench_report_join.py --deliveries 100000
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from seed_data import generate  # noqa: E402
+from utils.reports import REPORT_COLUMNS, build_report_frame  # noqa: E402
+
+
+def build_report_rows_legacy(deliveries, families, dims):
+    """Implementação anterior (laço Python por entrega), para comparação."""
+    fam_map = {f["id"]: f for f in families}
+    leader_map = {l["id"]: l for l in dims["leaders"]}
+    basket_map = {b["id"]: b for b in dims["baskets"]}
+    cell_map = {c["id"]: c for c in dims["cells"]}
+    super_map = {s["id"]: s for s in dims["supers"]}
+
+    rows = []
+    for d in deliveries:
+        fam = fam_map.get(d["family_id"])
+        leader = leader_map.get(d["leader_id"])
+        basket = basket_map.get(d["basket_type_id"])
+        cell = None
+        if fam and fam.get("cell_id"):
+            cell = cell_map.get(fam["cell_id"])
+        supervisor = None
+        if cell and cell.get("supervisor_id"):
+            supervisor = super_map.get(cell["supervisor_id"])
+        if not supervisor and leader and leader.get("supervisor_id"):
+            supervisor = super_map.get(leader["supervisor_id"])
+        rows.append({
+            "Data": d["delivered_at"],
+            "Representante": fam["representative_name"] if fam else "-",
+            "Telefone Representante": fam["representative_phone"] if fam else "-",
+            "Célula": cell["cell_name"] if cell else "-",
+            "Rede da Célula": cell["network_name"] if cell else "-",
+            "Supervisor": supervisor["name"] if supervisor else "-",
+            "Telefone Supervisor": supervisor["phone"] if supervisor else "-",
+            "Líder": leader["name"] if leader else "-",
+            "Telefone Líder": leader["phone"] if leader else "-",
+            "Rede do Líder": leader["network_name"] if leader else "-",
+            "Cesta": basket["name"] if basket else "-",
+            "Quantidade": d["quantity"]
+        })
+    return pd.DataFrame(rows, columns=REPORT_COLUMNS)
+
+
+def dataset(n_deliveries, seed):
+    tables = generate(max(n_deliveries / 120_000, 0.01), seed)
+    rng = random.Random(seed)
+
+    deliveries = [{k: d[k] for k in ("id", "delivered_at", "family_id", "leader_id", "basket_type_id", "quantity")}
+                  for d in tables["deliveries"][:n_deliveries]]
+    families = [dict(f) for f in tables["families"]]
+    cells = [dict(c) for c in tables["cells"]]
+    leaders = [dict(l) for l in tables["cell_leaders"]]
+    supers = [dict(s) for s in tables["supervisors"]]
+    baskets = [dict(b) for b in tables["basket_types"]]
+
+    for f in families:
+        if rng.random() < 0.02:
+            f["representative_phone"] = None
+    for c in cells:
+        if rng.random() < 0.1:
+            c["supervisor_id"] = "supervisor-apagado"
+    for l in leaders:
+        if rng.random() < 0.2:
+            l["supervisor_id"] = None
+    # registros apagados: as entregas continuam apontando para eles
+    families = [f for f in families if rng.random() >= 0.01]
+    leaders = leaders[:-2]
+    baskets = baskets[1:]
+    supers = supers[:-1]
+
+    dims = {"leaders": leaders, "baskets": baskets, "cells": cells, "supers": supers}
+    return deliveries, families, dims
+
+
+def timed(label, fn, repeat):
+    best, out = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<28} {best * 1000:>10.1f} ms", flush=True)
+    return out, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--deliveries", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    deliveries, families, dims = dataset(args.deliveries, args.seed)
+    print(f"{len(deliveries)} entregas, {len(families)} famílias, {len(dims['cells'])} células")
+
+    old, t_old = timed("antigo (dict por entrega)", lambda: build_report_rows_legacy(deliveries, families, dims),
+                       args.repeat)
+    # o carregamento novo já recebe as entregas em DataFrames (iter_table_frames)
+    frame = pd.DataFrame(deliveries)
+    new, t_new = timed("vetorizado", lambda: build_report_frame(frame, families, dims), args.repeat)
+    print(f"{'ganho':<28} {t_old / t_new:>10.1f} x")
+    timed("  (lista de dicts -> frame)", lambda: pd.DataFrame(deliveries), args.repeat)
+
+    try:
+        pd.testing.assert_frame_equal(old, new)
+    except AssertionError as e:
+        print(f"❌ resultados diferentes:\n{e}")
+        return 1
+    print(f"✅ resultados idênticos ({(new == '-').sum().sum()} campos '-' de registros ausentes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+"""
+Benchmark dos fluxos principais sobre dados sintéticos (benchmarks/seed_data.py).
+
+Casos:
+- dashboard            : leituras da página + disponibilidade de todas as cestas
+- dashboard_pos_baixa  : add_stock em 1 produto e o Dashboard de novo (recálculo incremental)
+- entrega_pequena      : register_delivery de uma cesta com 5 itens
+- entrega_grande       : register_delivery de uma cesta com 60 itens
+- entrega_fila         : a mesma entrega grande em modo write-behind (só enfileira)
+- relatorio_30d        : Relatórios, últimos 30 dias, sem filtros
+- relatorio_supervisor : Relatórios, 1 ano, filtro de supervisor
+- relatorio_export     : CSV + Excel do relatório de 30 dias
+- relatorio_export_rerun: rerun da página com os arquivos já gerados (chave + cache)
+- estoque              : Estoque (produtos, estoque atual, últimos 50 movimentos)
+
+Cada caso roda em duas variantes do banco local:
+- migrated : com as funções/views de migrations/
+- fallback : banco sem migrations (caminhos feitos no app)
+
+Cada repetição começa com o cache do banco vazio (como um rerun frio); o cache
+de disponibilidade das cestas é por processo e continua entre as repetições.
+Resultados: tabela no terminal; --json salva, --compare mostra a diferença
+contra um JSON anterior (regressões acima de --threshold % ficam marcadas).
+
+Uso:
+    python benchmarks/bench_suite.py --scale 0.2 --json antes.json
+    ... (muda o código) ...
+    python benchmarks/bench_suite.py --scale 0.2 --compare antes.json
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from seed_data import generate  # noqa: E402
+from utils.db import use_client, clear_cache, fetch_many, MigrationMissing  # noqa: E402
+from utils.local_backend import MemoryClient, LatencyClient  # noqa: E402
+from utils.calculations import (basket_summaries, group_recipes, inventory_map,  # noqa: E402
+                                clear_availability_cache, INVENTORY_COLUMNS, RECIPE_COLUMNS)
+from utils.operations import register_delivery, new_idempotency_key, add_stock  # noqa: E402
+from utils.reports import load_dimensions, load_report, export_csv, export_excel_pretty  # noqa: E402
+from utils.export_cache import export_key, get_cached_export, get_export, clear_export_cache  # noqa: E402
+from utils.delivery_queue import DeliveryQueue, enqueue_delivery  # noqa: E402
+
+VARIANTS = {
+    "migrated": {},
+    "fallback": {"rpc_functions": {}, "views": {}},
+}
+
+
+def dashboard(ctx):
+    """Mesmas leituras e cálculos de pages/1_Dashboard.py."""
+    data = fetch_many({
+        "baskets": ("basket_types", {"filters": {"is_active": True}, "order": "name", "columns": ["id", "name"]}),
+        "leaders": ("cell_leaders", {"order": "name", "columns": ["id", "name", "phone", "network_name"]}),
+        "families": ("families", {
+            "order": "representative_name",
+            "columns": ["id", "representative_name", "representative_phone"]
+        }),
+        "products": ("products", {"order": "name", "columns": ["id", "name"]}),
+        "inventory": ("inventory", {"columns": INVENTORY_COLUMNS}),
+        "recipe_items": ("basket_type_items", {"columns": RECIPE_COLUMNS}),
+    })
+    ids = [b["id"] for b in data["baskets"]]
+    return basket_summaries(ids, recipes=group_recipes(data["recipe_items"], ids),
+                            inv_map=inventory_map(data["inventory"]), products=data["products"])
+
+
+def dashboard_after_movement(ctx):
+    add_stock(ctx["product_id"], 1, reference="Benchmark")
+    return dashboard(ctx)
+
+
+def _delivery(basket_name):
+    def run(ctx):
+        return register_delivery(ctx["family_id"], ctx["leader_id"], ctx["baskets"][basket_name], 1,
+                                 "Benchmark", idempotency_key=new_idempotency_key())
+    return run
+
+
+def delivery_queued(ctx):
+    # a fila não é enviada durante a medição: mede o que o voluntário espera
+    return enqueue_delivery(ctx["family_id"], ctx["leader_id"], ctx["baskets"]["Cesta Grande"], 1, "Benchmark",
+                            idempotency_key=new_idempotency_key(), queue=ctx["queue"])
+
+
+def report_30d(ctx):
+    return load_report(ctx["today"] - timedelta(days=29), ctx["today"], load_dimensions())
+
+
+def report_supervisor(ctx):
+    return load_report(ctx["today"] - timedelta(days=364), ctx["today"], load_dimensions(),
+                       supervisor=ctx["supervisor"])
+
+
+def report_export(ctx):
+    # só a exportação: o relatório é carregado uma vez, fora da medição
+    if "report_df" not in ctx:
+        ctx["report_df"] = report_30d(ctx)
+    df = ctx["report_df"]
+    return len(export_csv(df)) + len(export_excel_pretty(df))
+
+
+def report_export_rerun(ctx):
+    # arquivos gerados no primeiro clique; os reruns seguintes só calculam a chave
+    if "report_df" not in ctx:
+        ctx["report_df"] = report_30d(ctx)
+    df = ctx["report_df"]
+    key = export_key({"start": ctx["today"] - timedelta(days=29), "end": ctx["today"]}, df)
+    for kind in ("csv", "xlsx"):
+        if get_cached_export(kind, key) is None:
+            get_export(kind, df, key)
+    return sum(len(get_cached_export(kind, key)) for kind in ("csv", "xlsx"))
+
+
+def estoque(ctx):
+    """Mesmas leituras de pages/3_Estoque.py."""
+    return fetch_many({
+        "products": ("products", {"order": "name", "columns": ["id", "name", "unit"]}),
+        "inventory": ("inventory", {"columns": ["product_id", "quantity"]}),
+        "moves": ("stock_movements", {
+            "columns": ["created_at", "product_id", "qty_change", "movement_type", "reference"],
+            "order": "created_at",
+            "desc": True,
+            "limit": 50
+        }),
+    })
+
+
+CASES = {
+    "dashboard": dashboard,
+    "dashboard_pos_baixa": dashboard_after_movement,
+    "entrega_pequena": _delivery("Cesta Pequena"),
+    "entrega_grande": _delivery("Cesta Grande"),
+    "entrega_fila": delivery_queued,
+    "relatorio_30d": report_30d,
+    "relatorio_supervisor": report_supervisor,
+    "relatorio_export": report_export,
+    "relatorio_export_rerun": report_export_rerun,
+    "estoque": estoque,
+}
+
+
+def context(tables):
+    last = max(d["delivered_at"] for d in tables["deliveries"])
+    return {
+        "today": date.fromisoformat(last[:10]),
+        "family_id": tables["families"][0]["id"],
+        "leader_id": tables["cell_leaders"][0]["id"],
+        "product_id": tables["basket_type_items"][0]["product_id"],
+        "baskets": {b["name"]: b["id"] for b in tables["basket_types"]},
+        "supervisor": tables["supervisors"][0]["name"],
+    }
+
+
+def measure(fn, ctx, client, repeat):
+    times = []
+    requests = []
+    for _ in range(repeat):
+        clear_cache()
+        before = client.request_count
+        t0 = time.perf_counter()
+        fn(ctx)
+        times.append((time.perf_counter() - t0) * 1000)
+        requests.append(client.request_count - before)
+    return {
+        "requests": statistics.median(requests),
+        "median_ms": round(statistics.median(times), 2),
+        "min_ms": round(min(times), 2),
+    }
+
+
+def run(scale, seed, repeat, rtt_ms, cases, variants):
+    tables = generate(scale, seed)
+    ctx = context(tables)
+    results = []
+    for variant in variants:
+        memory = MemoryClient(tables, **VARIANTS[variant])
+        client = LatencyClient(memory, rtt_ms) if rtt_ms else memory
+        use_client(client)
+        clear_availability_cache()
+        clear_export_cache()
+        ctx.pop("report_df", None)
+        try:
+            ctx["queue"] = DeliveryQueue(":memory:", client=client)
+        except MigrationMissing:
+            # sem as migrations 0002/0009 a fila não liga (ver utils.delivery_queue)
+            ctx["queue"] = None
+        if "relatorio_export" in cases or "relatorio_export_rerun" in cases:
+            report_export_rerun(ctx)
+        for case in cases:
+            if case == "entrega_fila" and ctx["queue"] is None:
+                continue
+            r = measure(CASES[case], ctx, memory, repeat)
+            results.append({"case": case, "variant": variant, **r})
+            print_row(results[-1])
+    use_client(None)
+    return results
+
+
+HEADER = f"{'caso':<22} | {'variante':<9} | {'requests':>8} | {'mediana (ms)':>12} | {'mín (ms)':>9}"
+
+
+def print_row(r, before=None, threshold=None):
+    line = (f"{r['case']:<22} | {r['variant']:<9} | {r['requests']:>8.0f} | "
+            f"{r['median_ms']:>12.2f} | {r['min_ms']:>9.2f}")
+    if before is not None:
+        if before:
+            delta = (r["median_ms"] - before["median_ms"]) / before["median_ms"] * 100 if before["median_ms"] else 0.0
+            flag = " ⚠️" if delta > threshold or r["requests"] > before["requests"] else ""
+            line += f" | {before['median_ms']:>10.2f} | {delta:>+7.1f}%{flag}"
+        else:
+            line += f" | {'-':>10} | {'novo':>8}"
+    print(line, flush=True)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parents[1]).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplica os volumes de seed_data.VOLUMES")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="latência simulada por request")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument("--json", help="salva os resultados neste arquivo")
+    parser.add_argument("--compare", help="JSON de uma rodada anterior")
+    parser.add_argument("--threshold", type=float, default=20.0, help="%% de piora marcada como regressão")
+    args = parser.parse_args()
+
+    print(f"scale={args.scale} seed={args.seed} repeat={args.repeat} rtt={args.rtt_ms}ms")
+    print(HEADER)
+    print("-" * len(HEADER))
+    results = run(args.scale, args.seed, args.repeat, args.rtt_ms, args.cases, args.variants)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        before = {(r["case"], r["variant"]): r for r in previous["results"]}
+        print(f"\nComparação com {args.compare} (rev {previous.get('revision') or '?'})")
+        print(HEADER + f" | {'antes (ms)':>10} | {'Δ':>8}")
+        print("-" * (len(HEADER) + 24))
+        for r in results:
+            print_row(r, before.get((r["case"], r["variant"]), {}), args.threshold)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "revision": git_revision(),
+                "params": {"scale": args.scale, "seed": args.seed, "repeat": args.repeat, "rtt_ms": args.rtt_ms},
+                "results": results,
+            }, f, indent=2)
+        print(f"\n✅ Resultados salvos em {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Gerador de dados sintéticos para o backend local (utils.local_backend).
+
+Volumes padrão (--scale 1):
+- 20 supervisores, 300 células, 200 líderes, 5.000 famílias
+- 300 produtos, 40 tipos de cesta (5 a 60 itens), estoque de todos
+- 120.000 entregas e 150.000 movimentos de estoque em 2 anos
+
+Uso:
+    python benchmarks/seed_data.py --scale 0.1 --out /tmp/dados.json
+    DB_BACKEND=memory DB_MEMORY_DATA=/tmp/dados.json streamlit run app.py
+"""
+import argparse
+import json
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+VOLUMES = {
+    "supervisors": 20,
+    "cells": 300,
+    "cell_leaders": 200,
+    "families": 5_000,
+    "products": 300,
+    "basket_types": 40,
+    "deliveries": 120_000,
+    "stock_movements": 150_000,
+}
+
+UNITS = ["unidade", "kg", "litro", "pacote", "caixa", "saco"]
+NETWORKS = ["Rede Jovem", "Rede Casais", "Rede Kids", "Rede Homens", "Rede Mulheres"]
+MOVEMENT_TYPES = ["entrada", "ajuste", "correcao", "saida_cesta"]
+
+# cestas "pequena" e "grande" fixas, para os benchmarks de register_delivery
+SMALL_BASKET_ITEMS = 5
+LARGE_BASKET_ITEMS = 60
+
+
+def _ids(rng, n):
+    return [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(n)]
+
+
+def _ts(base, seconds):
+    return (base + timedelta(seconds=seconds)).isoformat()
+
+
+def generate(scale=1.0, seed=42, days=730, now=None):
+    """
+    Retorna {tabela: [linhas]} pronto para MemoryClient(tables=...).
+    O mesmo (scale, seed, now) gera sempre os mesmos dados.
+    """
+    rng = random.Random(seed)
+    n = {t: max(1, int(v * scale)) for t, v in VOLUMES.items()}
+    now = now or datetime(2026, 1, 1, tzinfo=timezone.utc)
+    start = now - timedelta(days=days)
+    span = days * 86400
+    created = _ts(start, 0)
+
+    supers = [{"id": i, "name": f"Supervisor {k}", "phone": f"2199{k:07d}", "created_at": created}
+              for k, i in enumerate(_ids(rng, n["supervisors"]))]
+    super_ids = [s["id"] for s in supers]
+
+    leaders = [{
+        "id": i, "name": f"Líder {k}", "phone": f"2198{k:07d}",
+        "network_name": rng.choice(NETWORKS), "supervisor_id": rng.choice(super_ids), "created_at": created
+    } for k, i in enumerate(_ids(rng, n["cell_leaders"]))]
+    leader_ids = [l["id"] for l in leaders]
+
+    # ~30% das células sem supervisor (o relatório cai no supervisor do líder)
+    cells = [{
+        "id": i, "cell_name": f"Célula {k}", "network_name": rng.choice(NETWORKS),
+        "leader_id": rng.choice(leader_ids),
+        "supervisor_id": rng.choice(super_ids) if rng.random() < 0.7 else None, "created_at": created
+    } for k, i in enumerate(_ids(rng, n["cells"]))]
+    cell_ids = [c["id"] for c in cells]
+
+    families = []
+    for k, i in enumerate(_ids(rng, n["families"])):
+        adults, children = rng.randint(1, 3), rng.randint(0, 4)
+        families.append({
+            "id": i, "representative_name": f"Família {k}", "representative_phone": f"2197{k:07d}",
+            "cell_id": rng.choice(cell_ids) if rng.random() < 0.9 else None,
+            "total_people": adults + children, "adults": adults, "children": children,
+            "adolescents": 0, "elderly": 0,
+            "is_church_member": rng.random() < 0.5, "is_cell_member": rng.random() < 0.5,
+            "created_at": created
+        })
+    family_ids = [f["id"] for f in families]
+
+    products = [{"id": i, "name": f"Produto {k:03d}", "unit": rng.choice(UNITS), "created_at": created}
+                for k, i in enumerate(_ids(rng, n["products"]))]
+    product_ids = [p["id"] for p in products]
+
+    baskets = [{"id": i, "name": f"Cesta {k:02d}", "description": None, "is_active": True, "created_at": created}
+               for k, i in enumerate(_ids(rng, n["basket_types"]))]
+    baskets[0]["name"], baskets[-1]["name"] = "Cesta Pequena", "Cesta Grande"
+
+    items = []
+    for k, b in enumerate(baskets):
+        if k == 0:
+            size = SMALL_BASKET_ITEMS
+        elif k == len(baskets) - 1:
+            size = LARGE_BASKET_ITEMS
+        else:
+            size = rng.randint(SMALL_BASKET_ITEMS, LARGE_BASKET_ITEMS)
+        for pid in rng.sample(product_ids, min(size, len(product_ids))):
+            items.append({"id": str(uuid.UUID(int=rng.getrandbits(128), version=4)), "basket_type_id": b["id"],
+                          "product_id": pid, "quantity_required": float(rng.randint(1, 5)), "created_at": created})
+
+    inventory = [{"id": i, "product_id": pid, "quantity": float(rng.randint(0, 5_000)), "updated_at": created}
+                 for i, pid in zip(_ids(rng, len(product_ids)), product_ids)]
+
+    basket_ids = [b["id"] for b in baskets]
+    deliveries = []
+    for i in _ids(rng, n["deliveries"]):
+        at = _ts(start, rng.randrange(span))
+        deliveries.append({
+            "id": i, "family_id": rng.choice(family_ids), "leader_id": rng.choice(leader_ids),
+            "basket_type_id": rng.choice(basket_ids), "quantity": rng.randint(1, 3),
+            "notes": None, "is_partial": False, "partial_notes": None, "delivered_at": at, "created_at": at
+        })
+
+    movements = []
+    for i in _ids(rng, n["stock_movements"]):
+        movements.append({
+            "id": i, "product_id": rng.choice(product_ids), "qty_change": float(rng.randint(-20, 50)),
+            "movement_type": rng.choice(MOVEMENT_TYPES), "reference": None,
+            "created_at": _ts(start, rng.randrange(span))
+        })
+
+    return {
+        "supervisors": supers,
+        "cell_leaders": leaders,
+        "cells": cells,
+        "families": families,
+        "products": products,
+        "basket_types": baskets,
+        "basket_type_items": items,
+        "inventory": inventory,
+        "deliveries": deliveries,
+        "stock_movements": movements,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+
+    tables = generate(args.scale, args.seed)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(tables, f, ensure_ascii=False)
+        print(", ".join(f"{t}: {len(rows)}" for t, rows in tables.items()), file=sys.stderr)
+    else:
+        json.dump(tables, sys.stdout, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
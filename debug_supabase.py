@@ -1,18 +1,28 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import argparse
 import os
-from supabase import create_client
+import time
 
-url = os.getenv("SUPABASE_URL")
-key = os.getenv("SUPABASE_KEY")
+from utils.db import create_backend, DB_BACKEND, DB_LATENCY_MS
 
-print("URL:", url)
-print("KEY starts:", key[:30] if key else None)
+parser = argparse.ArgumentParser(description="Testa a conexão com o banco")
+parser.add_argument("--backend", default=DB_BACKEND, help="supabase (padrão), memory ou sqlite")
+parser.add_argument("--latency-ms", type=float, default=DB_LATENCY_MS, help="latência simulada por request")
+args = parser.parse_args()
 
-client = create_client(url, key)
+print("Backend:", args.backend, f"(+{args.latency_ms:g} ms/request)" if args.latency_ms else "")
+if args.backend == "supabase":
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_KEY")
+    print("URL:", url)
+    print("KEY starts:", key[:30] if key else None)
+
+client = create_backend(args.backend, latency_ms=args.latency_ms)
 print("✅ Client criado com sucesso!")
 
 # teste simples
+started = time.perf_counter()
 res = client.table("products").select("*").limit(1).execute()
-print("✅ Query OK:", res.data)
+print("✅ Query OK:", res.data, f"({(time.perf_counter() - started) * 1000:.0f} ms)")
@@ -0,0 +1,106 @@
+-- 0000 — Schema base do app
+--
+-- As tabelas que o app usa. No Supabase elas já existem (criadas pelo painel),
+-- então tudo aqui é "if not exists": serve para subir um Postgres local
+-- (stand-in do Supabase) do zero com `python -m utils.migrations`.
+
+create table if not exists supervisors (
+    id uuid primary key default gen_random_uuid(),
+    name text not null,
+    phone text not null unique,
+    created_at timestamptz not null default now()
+);
+
+create table if not exists cell_leaders (
+    id uuid primary key default gen_random_uuid(),
+    name text not null,
+    phone text not null unique,
+    network_name text not null,
+    supervisor_id uuid references supervisors (id),
+    created_at timestamptz not null default now()
+);
+
+create table if not exists cells (
+    id uuid primary key default gen_random_uuid(),
+    cell_name text not null,
+    network_name text not null,
+    leader_id uuid references cell_leaders (id),
+    supervisor_id uuid references supervisors (id),
+    created_at timestamptz not null default now()
+);
+
+create table if not exists families (
+    id uuid primary key default gen_random_uuid(),
+    representative_name text not null,
+    representative_phone text not null unique,
+    is_church_member boolean not null default false,
+    is_cell_member boolean not null default false,
+    total_people integer not null default 1,
+    adults integer not null default 0,
+    children integer not null default 0,
+    adolescents integer not null default 0,
+    elderly integer not null default 0,
+    cell_id uuid references cells (id),
+    created_at timestamptz not null default now()
+);
+
+create table if not exists products (
+    id uuid primary key default gen_random_uuid(),
+    name text not null,
+    unit text not null default 'unidade',
+    created_at timestamptz not null default now()
+);
+
+create table if not exists inventory (
+    id uuid primary key default gen_random_uuid(),
+    product_id uuid not null references products (id) on delete cascade,
+    quantity numeric not null default 0,
+    updated_at timestamptz not null default now(),
+    created_at timestamptz not null default now()
+);
+
+create table if not exists basket_types (
+    id uuid primary key default gen_random_uuid(),
+    name text not null unique,
+    description text,
+    is_active boolean not null default true,
+    created_at timestamptz not null default now()
+);
+
+create table if not exists basket_type_items (
+    id uuid primary key default gen_random_uuid(),
+    basket_type_id uuid not null references basket_types (id),
+    product_id uuid not null references products (id),
+    quantity_required numeric not null,
+    created_at timestamptz not null default now()
+);
+
+create table if not exists deliveries (
+    id uuid primary key default gen_random_uuid(),
+    family_id uuid references families (id),
+    leader_id uuid references cell_leaders (id),
+    basket_type_id uuid references basket_types (id),
+    quantity integer not null default 1,
+    notes text,
+    is_partial boolean not null default false,
+    partial_notes text,
+    delivered_at timestamptz not null default now(),
+    created_at timestamptz not null default now()
+);
+
+create table if not exists delivery_items (
+    id uuid primary key default gen_random_uuid(),
+    delivery_id uuid not null references deliveries (id) on delete cascade,
+    product_id uuid not null references products (id),
+    qty_delivered numeric not null,
+    created_at timestamptz not null default now()
+);
+
+create table if not exists stock_movements (
+    id uuid primary key default gen_random_uuid(),
+    product_id uuid not null references products (id) on delete cascade,
+    qty_change numeric not null,
+    movement_type text not null,
+    reference text,
+    created_at timestamptz not null default now()
+);
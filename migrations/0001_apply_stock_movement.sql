@@ -0,0 +1,38 @@
+-- 0001 — Entrada/baixa de estoque atômica
+--
+-- Soma o delta em inventory e grava o stock_movements na MESMA transação.
+-- Substitui o "lê estoque -> soma no Python -> grava" de utils.operations.add_stock,
+-- que perdia atualizações quando dois voluntários baixavam estoque ao mesmo tempo.
+--
+-- Como aplicar: cole no SQL Editor do Supabase e execute.
+
+create or replace function apply_stock_movement(
+    p_product_id uuid,
+    p_qty_change numeric,
+    p_movement_type text default 'entrada',
+    p_reference text default null
+) returns numeric
+language plpgsql
+as $$
+declare
+    v_quantity numeric;
+begin
+    -- UPDATE com quantity = quantity + delta trava a linha: sem lost update
+    update inventory
+       set quantity = quantity + p_qty_change,
+           updated_at = now()
+     where product_id = p_product_id
+    returning quantity into v_quantity;
+
+    if not found then
+        insert into inventory (product_id, quantity)
+        values (p_product_id, p_qty_change)
+        returning quantity into v_quantity;
+    end if;
+
+    insert into stock_movements (product_id, qty_change, movement_type, reference)
+    values (p_product_id, p_qty_change, p_movement_type, p_reference);
+
+    return v_quantity;
+end;
+$$;
@@ -0,0 +1,116 @@
+-- 0002 — Entrega transacional com chave de idempotência
+--
+-- Uma única chamada cria a entrega, os delivery_items, os stock_movements
+-- e baixa o inventory. Ou aplica tudo, ou nada.
+-- A chave (gerada no app) faz um duplo clique / rerun do Streamlit devolver
+-- a MESMA entrega em vez de baixar o estoque duas vezes.
+--
+-- Requer: 0001_apply_stock_movement.sql
+-- Como aplicar: cole no SQL Editor do Supabase e execute.
+
+create table if not exists operation_keys (
+    key text primary key,
+    kind text not null,
+    result jsonb,
+    created_at timestamptz not null default now()
+);
+
+-- p_items: [{"product_id": "...", "qty": 2.5}, ...] (quantidade TOTAL entregue)
+--          null = receita padrão da cesta x p_quantity
+create or replace function register_delivery_tx(
+    p_idempotency_key text,
+    p_family_id uuid,
+    p_leader_id uuid,
+    p_basket_type_id uuid,
+    p_quantity integer,
+    p_notes text default null,
+    p_is_partial boolean default false,
+    p_partial_notes text default null,
+    p_items jsonb default null
+) returns jsonb
+language plpgsql
+as $$
+declare
+    v_result jsonb;
+    v_delivery deliveries%rowtype;
+    v_ref text;
+    v_item record;
+begin
+    -- um segundo clique com a mesma chave espera o primeiro terminar
+    perform pg_advisory_xact_lock(hashtext(p_idempotency_key));
+
+    select result into v_result from operation_keys where key = p_idempotency_key;
+    if found then
+        return v_result;
+    end if;
+
+    insert into deliveries (family_id, leader_id, basket_type_id, quantity, notes, is_partial, partial_notes)
+    values (p_family_id, p_leader_id, p_basket_type_id, p_quantity, p_notes, p_is_partial, p_partial_notes)
+    returning * into v_delivery;
+
+    v_ref := 'Entrega ' || v_delivery.id;
+
+    for v_item in
+        select x.product_id, x.qty
+          from (
+                select bti.product_id, bti.quantity_required * p_quantity as qty
+                  from basket_type_items bti
+                 where p_items is null
+                   and bti.basket_type_id = p_basket_type_id
+                union all
+                select (e->>'product_id')::uuid, (e->>'qty')::numeric
+                  from jsonb_array_elements(coalesce(p_items, '[]'::jsonb)) e
+               ) x
+         where x.qty > 0
+    loop
+        perform apply_stock_movement(v_item.product_id, -v_item.qty, 'saida_cesta', v_ref);
+
+        insert into delivery_items (delivery_id, product_id, qty_delivered)
+        values (v_delivery.id, v_item.product_id, v_item.qty);
+    end loop;
+
+    v_result := to_jsonb(v_delivery);
+    insert into operation_keys (key, kind, result) values (p_idempotency_key, 'delivery', v_result);
+    return v_result;
+end;
+$$;
+
+-- Baixa rápida (sem entrega) pela receita da cesta
+create or replace function checkout_basket_tx(
+    p_idempotency_key text,
+    p_basket_type_id uuid,
+    p_quantity integer,
+    p_reference text default 'Baixa rápida - Dashboard'
+) returns jsonb
+language plpgsql
+as $$
+declare
+    v_result jsonb;
+    v_item record;
+    v_count integer := 0;
+begin
+    perform pg_advisory_xact_lock(hashtext(p_idempotency_key));
+
+    select result into v_result from operation_keys where key = p_idempotency_key;
+    if found then
+        return v_result;
+    end if;
+
+    for v_item in
+        select product_id, quantity_required * p_quantity as qty
+          from basket_type_items
+         where basket_type_id = p_basket_type_id
+    loop
+        perform apply_stock_movement(v_item.product_id, -v_item.qty, 'saida_cesta', p_reference);
+        v_count := v_count + 1;
+    end loop;
+
+    if v_count = 0 then
+        raise exception 'Esta cesta não tem itens cadastrados. Cadastre a receita primeiro.';
+    end if;
+
+    v_result := jsonb_build_object('basket_type_id', p_basket_type_id, 'quantity', p_quantity, 'items', v_count);
+    insert into operation_keys (key, kind, result) values (p_idempotency_key, 'checkout', v_result);
+    return v_result;
+end;
+$$;
@@ -0,0 +1,39 @@
+-- 0003 — View desnormalizada do relatório de entregas + índices
+--
+-- Faz no banco o join que as páginas de Relatórios montavam linha a linha:
+-- entrega -> família -> célula -> supervisor (fallback: supervisor do líder) -> cesta.
+-- Os ids ficam expostos para os filtros da tela virarem WHERE direto na view.
+
+create or replace view delivery_report as
+select
+    d.id,
+    d.created_at,
+    d.delivered_at,
+    d.quantity,
+    d.family_id,
+    d.leader_id,
+    d.basket_type_id,
+    c.id as cell_id,
+    coalesce(cs.id, ls.id) as supervisor_id,
+    f.representative_name,
+    f.representative_phone,
+    c.cell_name,
+    c.network_name as cell_network,
+    case when cs.id is not null then cs.name else ls.name end as supervisor_name,
+    case when cs.id is not null then cs.phone else ls.phone end as supervisor_phone,
+    l.name as leader_name,
+    l.phone as leader_phone,
+    l.network_name as leader_network,
+    b.name as basket_name
+from deliveries d
+left join families f on f.id = d.family_id
+left join cells c on c.id = f.cell_id
+left join supervisors cs on cs.id = c.supervisor_id
+left join cell_leaders l on l.id = d.leader_id
+left join supervisors ls on ls.id = l.supervisor_id
+left join basket_types b on b.id = d.basket_type_id;
+
+create index if not exists deliveries_delivered_at_idx on deliveries (delivered_at);
+create index if not exists stock_movements_created_at_idx on stock_movements (created_at);
+create index if not exists basket_type_items_basket_type_id_idx on basket_type_items (basket_type_id);
+create index if not exists inventory_product_id_idx on inventory (product_id);
@@ -0,0 +1,20 @@
+-- 0004 — Checkpoints do ledger de estoque (utils/ledger.py)
+--
+-- stock_movements é o histórico (append-only) e inventory é o contador.
+-- Um checkpoint guarda o saldo de cada produto no início de um mês
+-- (soma dos movimentos com created_at < as_of): reconstruir o estoque
+-- ou responder "quanto tinha na data D" lê só os movimentos depois dele.
+-- Os checkpoints são gerados pelo app: python -m utils.ledger checkpoint
+
+create table if not exists stock_checkpoints (
+    id uuid primary key default gen_random_uuid(),
+    product_id uuid not null references products (id) on delete cascade,
+    as_of timestamptz not null,
+    quantity numeric not null,
+    movements integer not null,
+    created_at timestamptz not null default now(),
+    unique (product_id, as_of)
+);
+
+create index if not exists stock_checkpoints_as_of_idx on stock_checkpoints (as_of);
+create index if not exists stock_movements_product_created_idx on stock_movements (product_id, created_at);
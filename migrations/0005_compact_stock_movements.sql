@@ -0,0 +1,46 @@
+-- 0005 — Compactação do histórico de estoque (utils/compaction.py)
+--
+-- Troca os movimentos anteriores a p_before por 1 linha por produto e mês
+-- (movement_type 'compactado'), na MESMA transação: o saldo de cada produto
+-- não muda. A linha de resumo fica no último instante do mês, então os
+-- checkpoints (saldo antes do início de cada mês) continuam valendo.
+-- Os movimentos originais são arquivados pelo app ANTES de chamar esta função.
+--
+-- Como aplicar: cole no SQL Editor do Supabase e execute.
+
+create or replace function compact_stock_movements(p_before timestamptz)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_archived integer;
+    v_summaries integer;
+begin
+    with old as (
+        delete from stock_movements
+         where created_at < p_before
+           and movement_type <> 'compactado'
+        returning product_id, qty_change, created_at
+    ), grouped as (
+        select product_id,
+               date_trunc('month', created_at at time zone 'UTC') as month,
+               sum(qty_change) as qty,
+               count(*) as n
+          from old
+         group by 1, 2
+    ), ins as (
+        insert into stock_movements (product_id, qty_change, movement_type, reference, created_at)
+        select product_id,
+               qty,
+               'compactado',
+               'Compactação ' || to_char(month, 'YYYY-MM') || ': ' || n || ' movimentos',
+               ((month + interval '1 month') at time zone 'UTC') - interval '1 microsecond'
+          from grouped
+        returning 1
+    )
+    select (select count(*) from old), (select count(*) from ins)
+      into v_archived, v_summaries;
+
+    return jsonb_build_object('archived', v_archived, 'summaries', v_summaries);
+end;
+$$;
@@ -0,0 +1,175 @@
+-- 0006 — Cubo de entregas (utils/delivery_cube.py)
+--
+-- Totais pré-agregados por dia (UTC) x célula x líder x tipo de cesta:
+-- nº de entregas e de cestas. O supervisor não é guardado: é o da célula,
+-- senão o do líder (mesma regra da view delivery_report), resolvido na
+-- leitura. O Resumo e os gráficos dos Relatórios leem o cubo; as entregas
+-- linha a linha só são lidas no detalhe.
+--
+-- Mantido por triggers na mesma transação da escrita:
+-- - insert/update/delete em deliveries
+-- - família que muda de célula (as entregas dela mudam de célula no cubo)
+-- Sem célula/líder/cesta = uuid zero (a chave única não aceita null).
+--
+-- delivery_family_count: famílias distintas atendidas (não somam no cubo).
+--
+-- Como aplicar: cole no SQL Editor do Supabase e execute.
+
+create table if not exists delivery_cube (
+    id uuid primary key default gen_random_uuid(),
+    day date not null,
+    cell_id uuid not null,
+    leader_id uuid not null,
+    basket_type_id uuid not null,
+    deliveries integer not null default 0,
+    baskets integer not null default 0,
+    unique (day, cell_id, leader_id, basket_type_id)
+);
+
+create index if not exists deliveries_family_id_idx on deliveries (family_id);
+
+create or replace function delivery_cube_add(
+    p_day date,
+    p_cell_id uuid,
+    p_leader_id uuid,
+    p_basket_type_id uuid,
+    p_deliveries integer,
+    p_baskets integer
+)
+returns void
+language plpgsql
+as $$
+declare
+    v_none constant uuid := '00000000-0000-0000-0000-000000000000';
+begin
+    insert into delivery_cube (day, cell_id, leader_id, basket_type_id, deliveries, baskets)
+    values (p_day, coalesce(p_cell_id, v_none), coalesce(p_leader_id, v_none), coalesce(p_basket_type_id, v_none),
+            p_deliveries, p_baskets)
+    on conflict (day, cell_id, leader_id, basket_type_id) do update
+        set deliveries = delivery_cube.deliveries + excluded.deliveries,
+            baskets = delivery_cube.baskets + excluded.baskets;
+
+    delete from delivery_cube
+     where day = p_day
+       and cell_id = coalesce(p_cell_id, v_none)
+       and leader_id = coalesce(p_leader_id, v_none)
+       and basket_type_id = coalesce(p_basket_type_id, v_none)
+       and deliveries = 0;
+end;
+$$;
+
+create or replace function delivery_cube_on_delivery()
+returns trigger
+language plpgsql
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform delivery_cube_add(
+            (old.delivered_at at time zone 'UTC')::date,
+            (select cell_id from families where id = old.family_id),
+            old.leader_id, old.basket_type_id, -1, -old.quantity
+        );
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform delivery_cube_add(
+            (new.delivered_at at time zone 'UTC')::date,
+            (select cell_id from families where id = new.family_id),
+            new.leader_id, new.basket_type_id, 1, new.quantity
+        );
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists delivery_cube_on_delivery on deliveries;
+create trigger delivery_cube_on_delivery
+    after insert or delete or update of delivered_at, family_id, leader_id, basket_type_id, quantity
+    on deliveries
+    for each row execute function delivery_cube_on_delivery();
+
+create or replace function delivery_cube_on_family_cell()
+returns trigger
+language plpgsql
+as $$
+declare
+    v_none constant uuid := '00000000-0000-0000-0000-000000000000';
+begin
+    -- tira as entregas da família da célula antiga e põe na nova
+    insert into delivery_cube (day, cell_id, leader_id, basket_type_id, deliveries, baskets)
+    select (d.delivered_at at time zone 'UTC')::date,
+           m.cell_id,
+           coalesce(d.leader_id, v_none),
+           coalesce(d.basket_type_id, v_none),
+           sum(m.sign)::integer,
+           sum(m.sign * d.quantity)::integer
+      from deliveries d
+     cross join (values (coalesce(old.cell_id, v_none), -1), (coalesce(new.cell_id, v_none), 1)) as m (cell_id, sign)
+     where d.family_id = new.id
+     group by 1, 2, 3, 4
+    on conflict (day, cell_id, leader_id, basket_type_id) do update
+        set deliveries = delivery_cube.deliveries + excluded.deliveries,
+            baskets = delivery_cube.baskets + excluded.baskets;
+
+    delete from delivery_cube where deliveries = 0;
+    return null;
+end;
+$$;
+
+drop trigger if exists delivery_cube_on_family_cell on families;
+create trigger delivery_cube_on_family_cell
+    after update of cell_id on families
+    for each row
+    when (old.cell_id is distinct from new.cell_id)
+    execute function delivery_cube_on_family_cell();
+
+-- Refaz o cubo inteiro a partir das entregas (conferência: python -m utils.delivery_cube verify)
+create or replace function delivery_cube_rebuild()
+returns integer
+language plpgsql
+as $$
+declare
+    v_none constant uuid := '00000000-0000-0000-0000-000000000000';
+    v_rows integer;
+begin
+    lock table delivery_cube in exclusive mode;
+    delete from delivery_cube;
+    insert into delivery_cube (day, cell_id, leader_id, basket_type_id, deliveries, baskets)
+    select (d.delivered_at at time zone 'UTC')::date,
+           coalesce(f.cell_id, v_none),
+           coalesce(d.leader_id, v_none),
+           coalesce(d.basket_type_id, v_none),
+           count(*),
+           sum(d.quantity)
+      from deliveries d
+      left join families f on f.id = d.family_id
+     group by 1, 2, 3, 4;
+    get diagnostics v_rows = row_count;
+    return v_rows;
+end;
+$$;
+
+-- primeira carga (rodar a migration de novo não duplica)
+select delivery_cube_rebuild() where not exists (select 1 from delivery_cube);
+
+create or replace function delivery_family_count(
+    p_start timestamptz,
+    p_end timestamptz,
+    p_cell_ids uuid[] default null,
+    p_leader_ids uuid[] default null,
+    p_basket_type_ids uuid[] default null,
+    p_supervisor_ids uuid[] default null
+)
+returns integer
+language sql
+stable
+as $$
+    -- mesmo critério do Resumo: telefones distintos ("-" = entrega sem família)
+    select count(distinct coalesce(representative_phone, '-'))::integer
+      from delivery_report
+     where delivered_at >= p_start
+       and delivered_at < p_end
+       and (p_cell_ids is null or cell_id = any (p_cell_ids))
+       and (p_leader_ids is null or leader_id = any (p_leader_ids))
+       and (p_basket_type_ids is null or basket_type_id = any (p_basket_type_ids))
+       and (p_supervisor_ids is null or supervisor_id = any (p_supervisor_ids));
+$$;
@@ -0,0 +1,38 @@
+-- 0007 — Conferência barata do cache local de entregas (utils/delivery_cache.py)
+--
+-- O cache local copia só as entregas novas (created_at / delivered_at depois
+-- da marca d'água). Para achar entregas editadas ou apagadas sem baixar tudo,
+-- delivery_checksums devolve por mês (ou por dia) o nº de entregas, as cestas
+-- e a soma de um hash de cada linha; o app calcula o mesmo no arquivo local e
+-- só relê os dias que não batem.
+--
+-- Hash da linha: primeiros 32 bits do md5 de
+--   id|family_id|leader_id|basket_type_id|quantity   (null = '')
+-- como inteiro com sinal (mesma conta em utils.local_backend.row_checksum).
+--
+-- Como aplicar: cole no SQL Editor do Supabase e execute.
+
+create index if not exists deliveries_created_at_idx on deliveries (created_at);
+
+create or replace function delivery_checksums(
+    p_unit text default 'month',
+    p_start timestamptz default null,
+    p_end timestamptz default null
+)
+returns table (period date, deliveries bigint, baskets bigint, checksum bigint)
+language sql
+stable
+as $$
+    select date_trunc(p_unit, d.delivered_at at time zone 'UTC')::date,
+           count(*),
+           coalesce(sum(d.quantity), 0),
+           coalesce(sum(('x' || substr(md5(
+               d.id::text || '|' || coalesce(d.family_id::text, '') || '|' || coalesce(d.leader_id::text, '')
+               || '|' || coalesce(d.basket_type_id::text, '') || '|' || d.quantity::text
+           ), 1, 8))::bit(32)::integer), 0)
+      from deliveries d
+     where (p_start is null or d.delivered_at >= p_start)
+       and (p_end is null or d.delivered_at < p_end)
+     group by 1
+     order by 1;
+$$;
@@ -0,0 +1,65 @@
+-- 0008 — Sync do banco local em lote
+--
+-- O sync (utils/sqlite_backend.py) repete no Supabase as RPCs feitas offline.
+-- Esta função recebe um bloco delas e executa todas numa transação só
+-- (1 request por bloco, em vez de 1 por entrega). As chamadas levam a chave
+-- de idempotência e as datas originais: repetir o bloco não baixa o estoque
+-- duas vezes.
+--
+-- p_calls: [{"fn": "register_delivery_tx", "params": {"p_idempotency_key": ..., ...}}, ...]
+--
+-- Requer: 0001_apply_stock_movement.sql, 0002_register_delivery_tx.sql,
+--         0009_operation_dates.sql (datas e chave de idempotência nas RPCs)
+-- Como aplicar: cole no SQL Editor do Supabase e execute.
+
+create or replace function sync_rpc_batch(p_calls jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+    v_call jsonb;
+    v_p jsonb;
+    v_count integer := 0;
+begin
+    for v_call in select value from jsonb_array_elements(p_calls) loop
+        v_p := v_call->'params';
+        case v_call->>'fn'
+            when 'apply_stock_movement' then
+                perform apply_stock_movement(
+                    (v_p->>'p_product_id')::uuid,
+                    (v_p->>'p_qty_change')::numeric,
+                    coalesce(v_p->>'p_movement_type', 'entrada'),
+                    v_p->>'p_reference',
+                    v_p->>'p_idempotency_key',
+                    (v_p->>'p_created_at')::timestamptz
+                );
+            when 'register_delivery_tx' then
+                perform register_delivery_tx(
+                    v_p->>'p_idempotency_key',
+                    (v_p->>'p_family_id')::uuid,
+                    (v_p->>'p_leader_id')::uuid,
+                    (v_p->>'p_basket_type_id')::uuid,
+                    (v_p->>'p_quantity')::integer,
+                    v_p->>'p_notes',
+                    coalesce((v_p->>'p_is_partial')::boolean, false),
+                    v_p->>'p_partial_notes',
+                    nullif(v_p->'p_items', 'null'::jsonb),
+                    (v_p->>'p_delivered_at')::timestamptz,
+                    (v_p->>'p_created_at')::timestamptz
+                );
+            when 'checkout_basket_tx' then
+                perform checkout_basket_tx(
+                    v_p->>'p_idempotency_key',
+                    (v_p->>'p_basket_type_id')::uuid,
+                    (v_p->>'p_quantity')::integer,
+                    coalesce(v_p->>'p_reference', 'Baixa rápida - Dashboard'),
+                    (v_p->>'p_created_at')::timestamptz
+                );
+            else
+                raise exception 'sync_rpc_batch: função % não pode ser repetida em lote.', v_call->>'fn';
+        end case;
+        v_count := v_count + 1;
+    end loop;
+    return v_count;
+end;
+$$;
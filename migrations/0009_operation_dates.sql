@@ -0,0 +1,194 @@
+-- 0009 — Datas originais e chave de idempotência nas RPCs de estoque/entrega
+--
+-- O sync do banco local (utils/sqlite_backend.py, sync_rpc_batch da 0008) e a
+-- fila de entregas (utils/delivery_queue.py) repetem no Supabase chamadas
+-- feitas antes, às vezes horas depois. Para a entrega não cair no dia do envio
+-- nem baixar o estoque duas vezes, as RPCs ganham parâmetros opcionais:
+-- - apply_stock_movement: p_idempotency_key, p_created_at
+-- - register_delivery_tx: p_delivered_at, p_created_at
+-- - checkout_basket_tx: p_created_at
+-- Sem eles (padrão null) o comportamento é o da 0001/0002 (now()).
+--
+-- As assinaturas antigas são apagadas (drop function): com as duas, o
+-- PostgREST não saberia qual chamar.
+--
+-- operation_dates_version(): conferência só de leitura usada pelo app para
+-- saber se esta migration foi aplicada (nada é gravado).
+--
+-- Requer: 0001_apply_stock_movement.sql, 0002_register_delivery_tx.sql
+-- Como aplicar: cole no SQL Editor do Supabase e execute.
+
+create table if not exists operation_keys (
+    key text primary key,
+    kind text not null,
+    result jsonb,
+    created_at timestamptz not null default now()
+);
+
+-- versão anterior (sem chave e sem data)
+drop function if exists apply_stock_movement(uuid, numeric, text, text);
+
+create or replace function apply_stock_movement(
+    p_product_id uuid,
+    p_qty_change numeric,
+    p_movement_type text default 'entrada',
+    p_reference text default null,
+    p_idempotency_key text default null,
+    p_created_at timestamptz default null
+) returns numeric
+language plpgsql
+as $$
+declare
+    v_quantity numeric;
+    v_result jsonb;
+begin
+    if p_idempotency_key is not null then
+        perform pg_advisory_xact_lock(hashtext(p_idempotency_key));
+        select result into v_result from operation_keys where key = p_idempotency_key;
+        if found then
+            return (v_result->>'quantity')::numeric;
+        end if;
+    end if;
+
+    -- UPDATE com quantity = quantity + delta trava a linha: sem lost update
+    update inventory
+       set quantity = quantity + p_qty_change,
+           updated_at = now()
+     where product_id = p_product_id
+    returning quantity into v_quantity;
+
+    if not found then
+        insert into inventory (product_id, quantity)
+        values (p_product_id, p_qty_change)
+        returning quantity into v_quantity;
+    end if;
+
+    insert into stock_movements (product_id, qty_change, movement_type, reference, created_at)
+    values (p_product_id, p_qty_change, p_movement_type, p_reference, coalesce(p_created_at, now()));
+
+    if p_idempotency_key is not null then
+        insert into operation_keys (key, kind, result)
+        values (p_idempotency_key, 'stock', jsonb_build_object('quantity', v_quantity));
+    end if;
+
+    return v_quantity;
+end;
+$$;
+
+-- versões anteriores (sem as datas)
+drop function if exists register_delivery_tx(text, uuid, uuid, uuid, integer, text, boolean, text, jsonb);
+drop function if exists checkout_basket_tx(text, uuid, integer, text);
+
+-- p_items: [{"product_id": "...", "qty": 2.5}, ...] (quantidade TOTAL entregue)
+--          null = receita padrão da cesta x p_quantity
+create or replace function register_delivery_tx(
+    p_idempotency_key text,
+    p_family_id uuid,
+    p_leader_id uuid,
+    p_basket_type_id uuid,
+    p_quantity integer,
+    p_notes text default null,
+    p_is_partial boolean default false,
+    p_partial_notes text default null,
+    p_items jsonb default null,
+    p_delivered_at timestamptz default null,
+    p_created_at timestamptz default null
+) returns jsonb
+language plpgsql
+as $$
+declare
+    v_result jsonb;
+    v_delivery deliveries%rowtype;
+    v_ref text;
+    v_item record;
+    v_now timestamptz := coalesce(p_created_at, now());
+begin
+    -- um segundo clique com a mesma chave espera o primeiro terminar
+    perform pg_advisory_xact_lock(hashtext(p_idempotency_key));
+
+    select result into v_result from operation_keys where key = p_idempotency_key;
+    if found then
+        return v_result;
+    end if;
+
+    insert into deliveries (family_id, leader_id, basket_type_id, quantity, notes, is_partial, partial_notes,
+                            delivered_at, created_at)
+    values (p_family_id, p_leader_id, p_basket_type_id, p_quantity, p_notes, p_is_partial, p_partial_notes,
+            coalesce(p_delivered_at, v_now), v_now)
+    returning * into v_delivery;
+
+    v_ref := 'Entrega ' || v_delivery.id;
+
+    for v_item in
+        select x.product_id, x.qty
+          from (
+                select bti.product_id, bti.quantity_required * p_quantity as qty
+                  from basket_type_items bti
+                 where p_items is null
+                   and bti.basket_type_id = p_basket_type_id
+                union all
+                select (e->>'product_id')::uuid, (e->>'qty')::numeric
+                  from jsonb_array_elements(coalesce(p_items, '[]'::jsonb)) e
+               ) x
+         where x.qty > 0
+    loop
+        perform apply_stock_movement(v_item.product_id, -v_item.qty, 'saida_cesta', v_ref, null, v_now);
+
+        insert into delivery_items (delivery_id, product_id, qty_delivered)
+        values (v_delivery.id, v_item.product_id, v_item.qty);
+    end loop;
+
+    v_result := to_jsonb(v_delivery);
+    insert into operation_keys (key, kind, result) values (p_idempotency_key, 'delivery', v_result);
+    return v_result;
+end;
+$$;
+
+-- Baixa rápida (sem entrega) pela receita da cesta
+create or replace function checkout_basket_tx(
+    p_idempotency_key text,
+    p_basket_type_id uuid,
+    p_quantity integer,
+    p_reference text default 'Baixa rápida - Dashboard',
+    p_created_at timestamptz default null
+) returns jsonb
+language plpgsql
+as $$
+declare
+    v_result jsonb;
+    v_item record;
+    v_count integer := 0;
+begin
+    perform pg_advisory_xact_lock(hashtext(p_idempotency_key));
+
+    select result into v_result from operation_keys where key = p_idempotency_key;
+    if found then
+        return v_result;
+    end if;
+
+    for v_item in
+        select product_id, quantity_required * p_quantity as qty
+          from basket_type_items
+         where basket_type_id = p_basket_type_id
+    loop
+        perform apply_stock_movement(v_item.product_id, -v_item.qty, 'saida_cesta', p_reference, null, p_created_at);
+        v_count := v_count + 1;
+    end loop;
+
+    if v_count = 0 then
+        raise exception 'Esta cesta não tem itens cadastrados. Cadastre a receita primeiro.';
+    end if;
+
+    v_result := jsonb_build_object('basket_type_id', p_basket_type_id, 'quantity', p_quantity, 'items', v_count);
+    insert into operation_keys (key, kind, result) values (p_idempotency_key, 'checkout', v_result);
+    return v_result;
+end;
+$$;
+
+create or replace function operation_dates_version()
+returns integer
+language sql
+immutable
+as $$
+    select 9;
+$$;
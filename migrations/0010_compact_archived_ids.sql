@@ -0,0 +1,57 @@
+-- 0010 — Compactação só dos movimentos arquivados (utils/compaction.py)
+--
+-- A versão da 0005 apagava tudo antes de p_before, até movimentos gravados
+-- depois da leitura do app (que não estão no arquivo). Esta versão recebe os
+-- ids arquivados (p_ids) e apaga só eles; se o número apagado for diferente de
+-- p_expected, levanta erro e nada muda (rollback).
+--
+-- O app chama a função um mês por vez (p_ids só com os ids daquele mês), para
+-- o corpo de cada request não crescer com o histórico inteiro.
+--
+-- Requer: 0005_compact_stock_movements.sql
+-- Como aplicar: cole no SQL Editor do Supabase e execute.
+
+-- versão anterior (apagava tudo antes de p_before, mesmo o que não foi arquivado)
+drop function if exists compact_stock_movements(timestamptz);
+
+create or replace function compact_stock_movements(p_before timestamptz, p_ids uuid[], p_expected integer)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_archived integer;
+    v_summaries integer;
+begin
+    with old as (
+        delete from stock_movements
+         where id = any(p_ids)
+           and created_at < p_before
+           and movement_type <> 'compactado'
+        returning product_id, qty_change, created_at
+    ), grouped as (
+        select product_id,
+               date_trunc('month', created_at at time zone 'UTC') as month,
+               sum(qty_change) as qty,
+               count(*) as n
+          from old
+         group by 1, 2
+    ), ins as (
+        insert into stock_movements (product_id, qty_change, movement_type, reference, created_at)
+        select product_id,
+               qty,
+               'compactado',
+               'Compactação ' || to_char(month, 'YYYY-MM') || ': ' || n || ' movimentos',
+               ((month + interval '1 month') at time zone 'UTC') - interval '1 microsecond'
+          from grouped
+        returning 1
+    )
+    select (select count(*) from old), (select count(*) from ins)
+      into v_archived, v_summaries;
+
+    if v_archived <> p_expected then
+        raise exception 'Compactação cancelada: % movimentos a apagar, % no arquivo.', v_archived, p_expected;
+    end if;
+
+    return jsonb_build_object('archived', v_archived, 'summaries', v_summaries);
+end;
+$$;
@@ -0,0 +1,36 @@
+-- 0011 — Contagem de famílias do Resumo: entregas sem família (utils/delivery_cube.py)
+--
+-- Mesma função da 0006, agora com o critério documentado no corpo:
+-- families.representative_phone é not null, então telefone nulo em
+-- delivery_report só vem de entrega sem família (ou com a família apagada).
+-- O Resumo antigo mostrava essas entregas como "-" e o nunique() contava "-"
+-- uma vez; coalesce(representative_phone, '-') mantém essa conta.
+--
+-- Requer: 0006_delivery_cube.sql
+-- Como aplicar: cole no SQL Editor do Supabase e execute.
+
+create or replace function delivery_family_count(
+    p_start timestamptz,
+    p_end timestamptz,
+    p_cell_ids uuid[] default null,
+    p_leader_ids uuid[] default null,
+    p_basket_type_ids uuid[] default null,
+    p_supervisor_ids uuid[] default null
+)
+returns integer
+language sql
+stable
+as $$
+    -- mesmo critério do Resumo: telefones distintos ("-" = entrega sem família).
+    -- families.representative_phone é not null: phone nulo aqui só vem de entrega
+    -- sem família (ou com a família apagada), que o Resumo mostrava como "-" e
+    -- contava uma vez no nunique()
+    select count(distinct coalesce(representative_phone, '-'))::integer
+      from delivery_report
+     where delivered_at >= p_start
+       and delivered_at < p_end
+       and (p_cell_ids is null or cell_id = any (p_cell_ids))
+       and (p_leader_ids is null or leader_id = any (p_leader_ids))
+       and (p_basket_type_ids is null or basket_type_id = any (p_basket_type_ids))
+       and (p_supervisor_ids is null or supervisor_id = any (p_supervisor_ids));
+$$;
@@ -1,18 +1,21 @@
 import streamlit as st
 import pandas as pd
-from utils.db import fetch_table, insert_row, update_row, delete_row
+from utils.db import fetch_many, insert_row, update_row, delete_row
 from utils.auth import require_pin
 require_pin()
 from utils.ui import apply_global_layout
-apply_global_layout()
+apply_global_layout(page="0_Celulas")
 
 
 
 st.title("🏠 Células — Cadastro / Edição / Exclusão")
 
-cells = fetch_table("cells", order="cell_name")
-leaders = fetch_table("cell_leaders", order="name")
-supers = fetch_table("supervisors", order="name")
+data = fetch_many({
+    "cells": ("cells", {"order": "cell_name"}),
+    "leaders": ("cell_leaders", {"order": "name", "columns": ["id", "name", "phone"]}),
+    "supers": ("supervisors", {"order": "name", "columns": ["id", "name", "phone"]}),
+})
+cells, leaders, supers = data["cells"], data["leaders"], data["supers"]
 
 leader_map = {f"{l['name']} ({l['phone']})": l for l in leaders} if leaders else {}
 super_map = {f"{s['name']} ({s['phone']})": s for s in supers} if supers else {}
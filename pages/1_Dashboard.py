@@ -1,35 +1,76 @@
 import streamlit as st
 import pandas as pd
-from utils.db import fetch_table
-from utils.calculations import basket_summary
-from utils.operations import quick_basket_checkout, register_delivery, register_delivery_custom_items
+from utils.db import fetch_many
+from utils.calculations import basket_summaries, group_recipes, inventory_map, INVENTORY_COLUMNS, RECIPE_COLUMNS
+from utils.operations import quick_basket_checkout, register_delivery, register_delivery_custom_items, new_idempotency_key
+from utils import delivery_queue
 from utils.auth import require_pin
 require_pin()
-from utils.ui import apply_global_layout
-apply_global_layout()
+from utils.ui import apply_global_layout, render_queue_status
+apply_global_layout(page="1_Dashboard")
 
 
 
 st.title("📦 Dashboard — Cestas disponíveis (montáveis)")
 
-baskets = fetch_table("basket_types", {"is_active": True}, order="name")
+# ✅ Chaves de idempotência: o mesmo clique (ou rerun) nunca baixa o estoque duas vezes.
+# São trocadas só depois que a operação foi concluída.
+if "checkout_key" not in st.session_state:
+    st.session_state.checkout_key = new_idempotency_key()
+if "delivery_key" not in st.session_state:
+    st.session_state.delivery_key = new_idempotency_key()
+
+# ✅ todas as leituras da página saem juntas (~1 ida ao banco)
+data = fetch_many({
+    "baskets": ("basket_types", {"filters": {"is_active": True}, "order": "name", "columns": ["id", "name"]}),
+    "leaders": ("cell_leaders", {"order": "name", "columns": ["id", "name", "phone", "network_name"]}),
+    "families": ("families", {
+        "order": "representative_name",
+        "columns": ["id", "representative_name", "representative_phone"]
+    }),
+    "products": ("products", {"order": "name", "columns": ["id", "name"]}),
+    "inventory": ("inventory", {"columns": INVENTORY_COLUMNS}),
+    "recipe_items": ("basket_type_items", {"columns": RECIPE_COLUMNS}),
+})
+baskets = data["baskets"]
 
 if not baskets:
     st.warning("Nenhum tipo de cesta ativo cadastrado.")
     st.stop()
 
-leaders = fetch_table("cell_leaders", order="name")
-families = fetch_table("families", order="representative_name")
-products = fetch_table("products", order="name")
+leaders = data["leaders"]
+families = data["families"]
+products = data["products"]
 prod_map = {p["id"]: p["name"] for p in products}
 prod_name_to_id = {p["name"]: p["id"] for p in products}
 
 # ==========================
 # RESUMO POR CESTA
 # ==========================
+basket_ids = [b["id"] for b in baskets]
+recipes = group_recipes(data["recipe_items"], basket_ids)
+inv_map = inventory_map(data["inventory"])
+
+# ✅ DELIVERY_WRITE_BEHIND=1: entregas vão para a fila e o estoque já desconta o que está nela
+queue = delivery_queue.get_queue() if delivery_queue.ENABLED else None
+if delivery_queue.ENABLED and queue is None:
+    st.warning("⚠️ Fila de entregas desligada: aplique migrations/0002_register_delivery_tx.sql "
+               "e 0009_operation_dates.sql e reinicie o app. As entregas vão direto para o banco.")
+if queue is not None:
+    inv_map = queue.local_inventory(inv_map)
+    register_delivery = delivery_queue.enqueue_delivery
+    register_delivery_custom_items = delivery_queue.enqueue_delivery_custom_items
+
+summaries = basket_summaries(
+    basket_ids,
+    recipes=recipes,
+    inv_map=inv_map,
+    products=products
+)
+
 rows = []
 for b in baskets:
-    completas, limitante, falta = basket_summary(b["id"])
+    completas, limitante, falta = summaries[b["id"]]
     rows.append({
         "id": b["id"],
         "Tipo de Cesta": b["name"],
@@ -41,6 +82,8 @@ df = pd.DataFrame(rows)
 
 st.subheader("📌 Disponibilidade atual")
 st.dataframe(df[["Tipo de Cesta", "Disponíveis", "Falta p/ +1"]], use_container_width=True, height=280)
+if queue is not None:
+    render_queue_status(queue)
 
 st.divider()
 
@@ -71,7 +114,8 @@ with tab1:
     else:
         if st.button("⚡ Baixar agora"):
             try:
-                quick_basket_checkout(basket_id, qty, reference=ref)
+                quick_basket_checkout(basket_id, qty, reference=ref, idempotency_key=st.session_state.checkout_key)
+                st.session_state.checkout_key = new_idempotency_key()
                 st.success("✅ Baixa rápida realizada! Estoque atualizado.")
                 st.experimental_rerun()
             except Exception as e:
@@ -108,7 +152,7 @@ with tab2:
     if partial_mode:
         st.warning("⚠️ Ajuste os itens entregues. Isso baixa exatamente o que você definir.")
 
-        recipe = fetch_table("basket_type_items", {"basket_type_id": basket_id})
+        recipe = recipes[basket_id]
 
         # Editor da receita base
         st.markdown("### ✅ Itens da cesta (base)")
@@ -157,9 +201,11 @@ with tab2:
                     items_dict=items_dict,
                     notes=notes,
                     is_partial=True,
-                    partial_notes=partial_notes
+                    partial_notes=partial_notes,
+                    idempotency_key=st.session_state.delivery_key
                 )
-                st.success(f"✅ Entrega personalizada registrada! ID: {delivery['id']}")
+                st.success("✅ Entrega personalizada registrada! "
+                           + ("Na fila de envio." if delivery.get("queued") else f"ID: {delivery['id']}"))
             else:
                 delivery = register_delivery(
                     family_id=family_map[family_sel]["id"],
@@ -167,10 +213,13 @@ with tab2:
                     basket_type_id=basket_id,
                     quantity=int(qty),
                     recipient_name=family_map[family_sel]["representative_name"],
-                    notes=notes
+                    notes=notes,
+                    idempotency_key=st.session_state.delivery_key
                 )
-                st.success(f"✅ Entrega registrada! ID: {delivery['id']}")
+                st.success("✅ Entrega registrada! "
+                           + ("Na fila de envio." if delivery.get("queued") else f"ID: {delivery['id']}"))
 
+            st.session_state.delivery_key = new_idempotency_key()
             st.experimental_rerun()
 
         except Exception as e:
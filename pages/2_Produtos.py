@@ -4,13 +4,13 @@ from utils.db import fetch_table, insert_row, update_row, delete_row
 from utils.auth import require_pin
 require_pin()
 from utils.ui import apply_global_layout
-apply_global_layout()
+apply_global_layout(page="2_Produtos")
 
 
 
 st.title("🛒 Produtos — Cadastro / Edição / Exclusão")
 
-products = fetch_table("products", order="name")
+products = fetch_table("products", order="name", columns=["id", "name", "unit", "created_at"])
 
 st.subheader("➕ Cadastrar novo produto")
 with st.form("add_product"):
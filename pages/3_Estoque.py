@@ -1,17 +1,30 @@
 import streamlit as st
 import pandas as pd
-from utils.db import fetch_table
+from utils.db import fetch_many
 from utils.operations import add_stock
+from utils.ledger import load_ledger, reconcile
 from utils.auth import require_pin
 require_pin()
 from utils.ui import apply_global_layout
-apply_global_layout()
+apply_global_layout(page="3_Estoque")
 
 
 
 st.title("📥 Estoque — Entrada / Ajuste")
 
-products = fetch_table("products", order="name")
+# ✅ produtos, estoque e histórico saem juntos (~1 ida ao banco)
+# ordenação e limite do histórico no banco: só trafegam as 50 linhas exibidas
+data = fetch_many({
+    "products": ("products", {"order": "name", "columns": ["id", "name", "unit"]}),
+    "inventory": ("inventory", {"columns": ["product_id", "quantity"]}),
+    "moves": ("stock_movements", {
+        "columns": ["created_at", "product_id", "qty_change", "movement_type", "reference"],
+        "order": "created_at",
+        "desc": True,
+        "limit": 50
+    }),
+})
+products = data["products"]
 if not products:
     st.warning("Cadastre produtos primeiro.")
     st.stop()
@@ -38,8 +51,7 @@ with st.form("stock_form"):
 st.divider()
 st.subheader("📌 Estoque atual")
 
-inv = fetch_table("inventory")
-inv_map = {i["product_id"]: float(i["quantity"]) for i in inv}
+inv_map = {i["product_id"]: float(i["quantity"]) for i in data["inventory"]}
 
 rows = []
 for p in products:
@@ -51,11 +63,24 @@ for p in products:
 
 st.dataframe(pd.DataFrame(rows), use_container_width=True)
 
+# ✅ confere o contador (inventory) contra a soma dos movimentos (sob demanda: lê o histórico)
+with st.expander("🧮 Conferir estoque x movimentações"):
+    if st.button("Conferir agora"):
+        with st.spinner("Somando o histórico de movimentos..."):
+            ledger = load_ledger()
+            drift = reconcile(ledger)
+        if drift.empty:
+            st.success(f"✅ Estoque bate com as movimentações ({len(ledger)} movimentos).")
+        else:
+            st.warning(f"⚠️ {len(drift)} produto(s) com diferença ({len(ledger)} movimentos).")
+            drift = drift[["name", "inventory", "ledger", "drift"]]
+            drift.columns = ["Produto", "Estoque atual", "Soma dos movimentos", "Diferença"]
+            st.dataframe(drift, use_container_width=True)
+
 st.divider()
 st.subheader("🧾 Histórico de Movimentos (últimos 50)")
 
-moves = fetch_table("stock_movements", order="created_at")
-moves = sorted(moves, key=lambda x: x["created_at"], reverse=True)[:50]
+moves = data["moves"]
 
 if not moves:
     st.info("Nenhum movimento registrado ainda.")
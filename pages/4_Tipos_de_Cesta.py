@@ -5,13 +5,13 @@ from utils.calculations import analyze_basket
 from utils.auth import require_pin
 require_pin()
 from utils.ui import apply_global_layout
-apply_global_layout()
+apply_global_layout(page="4_Tipos_de_Cesta")
 
 
 
 st.title("🧺 Tipos de Cesta — Cadastro e Receita")
 
-products = fetch_table("products", order="name")
+products = fetch_table("products", order="name", columns=["id", "name"])
 prod_id_to_name = {p["id"]: p["name"] for p in products}
 
 if not products:
@@ -4,7 +4,7 @@ from utils.db import fetch_table, insert_row, update_row, delete_row
 from utils.auth import require_pin
 require_pin()
 from utils.ui import apply_global_layout
-apply_global_layout()
+apply_global_layout(page="5_Supervisores_e_Lideres")
 
 
 
@@ -15,7 +15,7 @@ st.title("👥 Supervisores e Líderes")
 # ==========================
 st.header("✅ Supervisores")
 
-supers = fetch_table("supervisors", order="name")
+supers = fetch_table("supervisors", order="name", columns=["id", "name", "phone", "created_at"])
 
 st.subheader("➕ Cadastrar supervisor")
 with st.form("add_supervisor", clear_on_submit=True):
@@ -114,7 +114,11 @@ st.divider()
 # ==========================
 st.header("✅ Líderes de Célula")
 
-leaders = fetch_table("cell_leaders", order="name")
+leaders = fetch_table(
+    "cell_leaders",
+    order="name",
+    columns=["id", "name", "phone", "network_name", "supervisor_id"]
+)
 sup_id_to_label = {s["id"]: f"{s['name']} ({s['phone']})" for s in supers} if supers else {}
 
 st.subheader("➕ Cadastrar líder")
@@ -1,10 +1,10 @@
 import streamlit as st
 import pandas as pd
-from utils.db import fetch_table, insert_row, update_row, delete_row
+from utils.db import fetch_many, insert_row, update_row, delete_row
 from utils.auth import require_pin
 require_pin()
 from utils.ui import apply_global_layout
-apply_global_layout()
+apply_global_layout(page="6_Familias")
 
 
 
@@ -13,8 +13,11 @@ st.title("🏠 Famílias / Beneficiários")
 # ==========================
 # CARREGAMENTO DE DADOS
 # ==========================
-cells = fetch_table("cells", order="cell_name")
-families = fetch_table("families", order="representative_name")
+data = fetch_many({
+    "cells": ("cells", {"order": "cell_name", "columns": ["id", "cell_name"]}),
+    "families": ("families", {"order": "representative_name"}),
+})
+cells, families = data["cells"], data["families"]
 
 cell_map = {c["cell_name"]: c for c in cells} if cells else {}
 cell_id_to_name = {c["id"]: c["cell_name"] for c in cells} if cells else {}
@@ -0,0 +1,8 @@
+import os
+import sys
+from pathlib import Path
+
+# ⚠️ a raiz vai no fim do sys.path (como nos benchmarks): a pasta streamlit/ dela
+# (config do tema) esconderia o pacote streamlit, inclusive com python -m pytest
+ROOT = str(Path(__file__).resolve().parents[1])
+sys.path[:] = [p for p in sys.path if os.path.abspath(p or ".") != ROOT] + [ROOT]
@@ -0,0 +1,114 @@
+"""
+Disponibilidade incremental das cestas (utils.calculations.cached_availability)
+na mesma sequência do Dashboard: fetch_many -> group_recipes -> inventory_map.
+
+Uso:
+    pytest tests
+"""
+import time
+
+import pytest
+
+from utils import calculations, db
+from utils.calculations import (INVENTORY_COLUMNS, RECIPE_COLUMNS, cached_availability, clear_availability_cache,
+                                compute_availability, group_recipes, inventory_map)
+from utils.local_backend import MemoryClient
+from utils.operations import add_stock
+
+SEED = {
+    "products": [{"id": f"p{i}", "name": f"Produto {i}"} for i in range(4)],
+    "inventory": [{"id": f"i{i}", "product_id": f"p{i}", "quantity": 10.0} for i in range(4)],
+    "basket_type_items": [
+        # b1 usa p0/p1, b2 usa p1/p2, b3 usa p3
+        {"id": "bi1", "basket_type_id": "b1", "product_id": "p0", "quantity_required": 2.0},
+        {"id": "bi2", "basket_type_id": "b1", "product_id": "p1", "quantity_required": 1.0},
+        {"id": "bi3", "basket_type_id": "b2", "product_id": "p1", "quantity_required": 3.0},
+        {"id": "bi4", "basket_type_id": "b2", "product_id": "p2", "quantity_required": 1.0},
+        {"id": "bi5", "basket_type_id": "b3", "product_id": "p3", "quantity_required": 5.0},
+    ],
+}
+IDS = ["b1", "b2", "b3"]
+
+
+@pytest.fixture
+def client():
+    client = MemoryClient(SEED)
+    db.use_client(client)
+    clear_availability_cache()
+    yield client
+    db.use_client(None)
+    clear_availability_cache()
+
+
+@pytest.fixture
+def computed(monkeypatch):
+    """Cestas recalculadas em cada chamada de compute_availability."""
+    calls = []
+    original = calculations.compute_availability
+
+    def spy(basket_type_ids=None, recipes=None, inv_map=None):
+        calls.append(sorted(recipes))
+        return original(basket_type_ids, recipes, inv_map)
+
+    monkeypatch.setattr(calculations, "compute_availability", spy)
+    return calls
+
+
+def rerun():
+    data = db.fetch_many({
+        "inventory": ("inventory", {"columns": INVENTORY_COLUMNS}),
+        "recipe_items": ("basket_type_items", {"columns": RECIPE_COLUMNS}),
+    })
+    recipes, inv_map = group_recipes(data["recipe_items"], IDS), inventory_map(data["inventory"])
+    return cached_availability(IDS, recipes, inv_map), compute_availability(recipes=recipes, inv_map=inv_map)
+
+
+def mountable(result):
+    return {bid: r["mountable"] for bid, r in result.items()}
+
+
+def test_rerun_without_changes_recomputes_nothing(client, computed):
+    out, expected = rerun()
+    assert out == expected
+    assert mountable(out) == {"b1": 5, "b2": 3, "b3": 2}
+    assert computed == [IDS]
+
+    out, expected = rerun()
+    assert out == expected
+    assert computed == [IDS]
+
+
+def test_stock_movement_recomputes_only_affected_baskets(client, computed):
+    rerun()
+    add_stock("p1", -4)  # p1 está em b1 e b2
+
+    out, expected = rerun()
+    assert out == expected
+    assert mountable(out) == {"b1": 5, "b2": 2, "b3": 2}
+    assert computed[1:] == [["b1", "b2"]]
+
+
+def test_recipe_change_recomputes_that_basket(client, computed):
+    rerun()
+    db.update_row("basket_type_items", {"id": "bi5"}, {"quantity_required": 2.0})
+
+    out, expected = rerun()
+    assert out == expected
+    assert mountable(out)["b3"] == 5
+    assert computed[1:] == [["b3"]]
+
+
+def test_write_by_another_process_shows_up_after_the_cache_ttl(client, computed, monkeypatch):
+    rerun()
+    # outro usuário baixa o estoque: nenhuma invalidação neste processo
+    next(r for r in client.tables["inventory"] if r["product_id"] == "p3")["quantity"] = 4.0
+
+    out, _ = rerun()
+    assert mountable(out)["b3"] == 2  # ainda a leitura do cache do banco
+
+    later = time.monotonic() + db.CACHE_TTL_SECONDS + 1
+    monkeypatch.setattr(db.time, "monotonic", lambda: later)
+    out, expected = rerun()
+    assert out == expected
+    assert mountable(out)["b3"] == 0
+    assert computed[1:] == [["b3"]]
@@ -0,0 +1,144 @@
+"""
+Sync do cache local de entregas (utils.delivery_cache) contra o MemoryClient:
+marca d'água, conferência por checksum (janela recente e histórico inteiro)
+e entregas apagadas.
+
+Uso:
+    pytest tests
+"""
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from utils import db
+from utils.delivery_cache import CHECK_DAYS, FULL_SYNC_HOURS, DeliveryCache, sync
+from utils.local_backend import MemoryClient
+
+NOW = datetime.now(timezone.utc)
+
+
+def delivery(n, days_ago, quantity=1):
+    at = (NOW - timedelta(days=days_ago, hours=1)).isoformat()
+    return {"id": f"d{n:03d}", "delivered_at": at, "created_at": at, "family_id": f"f{n % 7}",
+            "leader_id": f"l{n % 3}", "basket_type_id": "b1", "quantity": quantity}
+
+
+# histórico antigo (fora da janela de CHECK_DAYS) + entregas recentes
+OLD_DAYS = CHECK_DAYS + 150
+SEED = [delivery(i, OLD_DAYS + i % 5) for i in range(10)] + \
+       [delivery(10 + i, 3 + i % 4, quantity=1 + i % 2) for i in range(10)]
+
+
+@pytest.fixture
+def client():
+    client = MemoryClient({"deliveries": [dict(d) for d in SEED]})
+    db.use_client(client)
+    yield client
+    db.use_client(None)
+
+
+@pytest.fixture
+def cache(tmp_path, client):
+    cache = DeliveryCache(tmp_path)
+    assert sync(cache)["full"]
+    return cache
+
+
+def cached(cache):
+    df = cache.read_all()
+    return {r.id: (r.delivered_at.isoformat(), r.quantity) for r in df.itertuples()}
+
+
+def server(client):
+    return {d["id"]: (datetime.fromisoformat(d["delivered_at"]).isoformat(), d["quantity"])
+            for d in client.tables["deliveries"]}
+
+
+def month_files(cache):
+    return {p.stem: p.stat().st_mtime_ns for p in cache.months_dir.glob("*.arrow")}
+
+
+def test_first_sync_copies_everything(client, cache):
+    meta = cache.meta()
+    assert cache.exists() and meta["checked"] is False  # ainda não conferiu: o próximo sync confere
+    assert cached(cache) == server(client)
+    assert meta["rows"] == len(SEED)
+    assert sum(m["deliveries"] for m in meta["months"].values()) == len(SEED)
+
+
+def test_new_delivery_past_the_watermark(client, cache):
+    sync(cache)
+    before = month_files(cache)
+    db.insert_row("deliveries", delivery(99, 0, quantity=3))
+
+    r = sync(cache)
+    assert not r["full"] and r["checked"] and r["days"] == 0
+    assert "d099" in cached(cache) and cached(cache) == server(client)
+    assert r["rows"] == len(SEED) + 1
+    # meses antigos não são regravados
+    old_month = (NOW - timedelta(days=OLD_DAYS, hours=1)).strftime("%Y-%m")
+    assert month_files(cache)[old_month] == before[old_month]
+
+
+def test_delivery_edited_into_an_earlier_month(client, cache):
+    sync(cache)
+    # entrega de 4 dias atrás corrigida para 35 dias atrás (outro mês, dentro da janela);
+    # created_at não muda, então a marca d'água não a traz: só o checksum
+    moved = (NOW - timedelta(days=35)).isoformat()
+    db.update_row("deliveries", {"id": "d011"}, {"delivered_at": moved})
+
+    r = sync(cache)
+    assert not r["full"] and r["days"] == 2  # o dia de onde saiu e o dia para onde foi
+    assert cached(cache) == server(client)
+    assert cached(cache)["d011"][0] == datetime.fromisoformat(moved).isoformat()
+    assert sum(m["deliveries"] for m in cache.meta()["months"].values()) == len(SEED)
+
+
+def test_deleted_delivery_leaves_the_cache(client, cache):
+    sync(cache)
+    db.delete_rows("deliveries", ["d012", "d015"])
+
+    r = sync(cache)
+    assert r["days"] >= 1
+    assert set(cached(cache)) == set(server(client)) == {d["id"] for d in SEED} - {"d012", "d015"}
+    assert r["rows"] == cache.meta()["rows"] == len(SEED) - 2
+
+
+def test_old_months_are_checked_by_the_periodic_full_check(client, cache):
+    sync(cache)
+    # edição num mês fora da janela de CHECK_DAYS
+    db.update_row("deliveries", {"id": "d003"}, {"quantity": 5})
+
+    r = sync(cache)
+    assert r["days"] == 0
+    assert cached(cache)["d003"][1] == 1  # ainda não conferido
+
+    # checked_at mais velho que FULL_SYNC_HOURS: o próximo sync confere o histórico inteiro
+    meta = cache.meta()
+    meta["checked_at"] = (NOW - timedelta(hours=FULL_SYNC_HOURS + 1)).isoformat()
+    cache.meta_path.write_text(json.dumps(meta), encoding="utf-8")
+
+    r = sync(cache)
+    assert not r["full"] and r["days"] == 1
+    assert cached(cache) == server(client)
+    assert datetime.fromisoformat(cache.meta()["checked_at"]) > NOW
+
+
+def test_without_the_checksums_migration_only_the_watermark_syncs(tmp_path):
+    client = MemoryClient({"deliveries": [dict(d) for d in SEED]}, rpc_functions={})
+    db.use_client(client)
+    try:
+        cache = DeliveryCache(tmp_path)
+        sync(cache)
+        db.delete_rows("deliveries", ["d012"])
+        db.insert_row("deliveries", delivery(99, 0))
+
+        r = sync(cache)
+        assert not r["full"] and r["checked"] is False
+        assert "d099" in cached(cache) and "d012" in cached(cache)
+
+        assert sync(cache, full=True)["full"]
+        assert cached(cache) == server(client)
+    finally:
+        db.use_client(None)
@@ -0,0 +1,201 @@
+"""
+Fila de entregas (utils.delivery_queue) sobre o MemoryClient: estoque local,
+data da entrega, novas tentativas com espera crescente e conflitos.
+
+Uso:
+    pytest tests
+"""
+from datetime import datetime, timezone
+
+import pytest
+
+from utils import delivery_queue
+from utils.db import MigrationMissing, use_client
+from utils.delivery_queue import DeliveryQueue, InsufficientStock, enqueue_delivery
+from utils.local_backend import LocalBackendError, MemoryClient
+
+T0 = datetime(2026, 1, 10, 12, 0, tzinfo=timezone.utc)
+
+SEED = {
+    "products": [{"id": "p1", "name": "Arroz"}, {"id": "p2", "name": "Feijão"}],
+    "inventory": [
+        {"id": "i1", "product_id": "p1", "quantity": 7.0},
+        {"id": "i2", "product_id": "p2", "quantity": 50.0},
+    ],
+    "basket_type_items": [
+        {"id": "bi1", "basket_type_id": "b1", "product_id": "p1", "quantity_required": 2.0},
+        {"id": "bi2", "basket_type_id": "b1", "product_id": "p2", "quantity_required": 1.0},
+    ],
+}
+
+
+class FlakyClient(MemoryClient):
+    """MemoryClient cujo register_delivery_tx levanta os erros de `errors`, um por chamada."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.errors = []
+        self.sent = []
+
+    def _call_rpc(self, fn, params):
+        if fn == "register_delivery_tx":
+            self.sent.append(params["p_idempotency_key"])
+            if self.errors:
+                raise self.errors.pop(0)
+        return super()._call_rpc(fn, params)
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now.timestamp()
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(T0)
+    monkeypatch.setattr(delivery_queue.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def client():
+    client = FlakyClient(SEED)
+    use_client(client)
+    yield client
+    use_client(None)
+
+
+@pytest.fixture
+def queue(client, clock):
+    queue = DeliveryQueue(":memory:", client=client)
+    yield queue
+    queue.conn.close()
+
+
+def row(queue, key):
+    return dict(queue.conn.execute("select * from delivery_queue where key = ?", (key,)).fetchone())
+
+
+def enqueue(queue, key, quantity=1):
+    return enqueue_delivery("f1", "l1", "b1", quantity, "Família 1", idempotency_key=key, queue=queue)
+
+
+def stock(client):
+    return {r["product_id"]: r["quantity"] for r in client.tables["inventory"]}
+
+
+def test_queue_needs_the_dates_migration(clock):
+    use_client(None)
+    with pytest.raises(MigrationMissing):
+        DeliveryQueue(":memory:", client=MemoryClient(SEED, rpc_functions={}))
+
+    # ✅ a conferência só lê: outros erros (rede, permissão) não são engolidos
+    class Offline(MemoryClient):
+        def _call_rpc(self, fn, params):
+            raise ConnectionError("sem rede")
+
+    offline = Offline(SEED)
+    use_client(None)  # esquece o "função não existe" do banco anterior
+    with pytest.raises(ConnectionError):
+        DeliveryQueue(":memory:", client=offline)
+    assert "deliveries" not in offline.tables
+
+
+def test_enqueue_checks_local_inventory(queue, client):
+    enqueue(queue, "k1", quantity=3)
+    enqueue(queue, "k1", quantity=3)  # mesma chave: não reserva de novo
+    assert queue.reserved() == {"p1": 6.0, "p2": 3.0}
+    assert queue.local_inventory() == {"p1": 1.0, "p2": 47.0}
+
+    with pytest.raises(InsufficientStock, match="falta 1.0 de Arroz"):
+        enqueue(queue, "k2")
+    assert queue.stats()["pending"] == 1
+    assert client.sent == []  # nada foi ao banco ainda
+
+
+def test_flush_keeps_the_time_the_delivery_was_queued(queue, client, clock):
+    enqueue(queue, "k1")
+    clock.advance(3 * 86400)  # enviada 3 dias depois (internet voltou)
+
+    assert queue.flush() == (1, 0)
+    delivery = client.tables["deliveries"][0]
+    assert datetime.fromisoformat(delivery["delivered_at"]) == T0
+    assert datetime.fromisoformat(delivery["created_at"]) == T0
+    assert {datetime.fromisoformat(m["created_at"]) for m in client.tables["stock_movements"]} == {T0}
+    assert stock(client) == {"p1": 5.0, "p2": 49.0}
+    assert queue.reserved() == {}
+
+
+def test_network_errors_retry_with_backoff(queue, client, clock):
+    enqueue(queue, "k1")
+    client.errors = [ConnectionError("timeout")] * 3
+
+    waits = []
+    for _ in range(3):
+        assert queue.flush() == (0, 0)
+        r = row(queue, "k1")
+        assert r["status"] == "pending"
+        waits.append(r["next_attempt_at"] - clock.now)
+        # antes da hora marcada a entrega não é reenviada
+        tried = len(client.sent)
+        assert queue.flush() == (0, 0) and len(client.sent) == tried
+        clock.advance(waits[-1])
+    assert waits == [2.0, 4.0, 8.0]
+    assert queue.stats()["last_error"] == "timeout"
+
+    assert queue.flush() == (1, 0)
+    assert row(queue, "k1")["status"] == "done" and row(queue, "k1")["attempts"] == 4
+    assert len(client.tables["deliveries"]) == 1
+    assert queue.stats()["last_error"] is None
+
+
+def test_backoff_is_capped(queue, client, clock):
+    enqueue(queue, "k1")
+    queue.conn.execute("update delivery_queue set attempts = 20")
+    client.errors = [ConnectionError("timeout")]
+    queue.flush()
+    assert row(queue, "k1")["next_attempt_at"] - clock.now == delivery_queue.RETRY_MAX_SECONDS
+
+
+def test_data_errors_become_conflicts(queue, client, clock):
+    enqueue(queue, "k1")
+    clock.advance(1)
+    enqueue(queue, "k2")
+    client.errors = [LocalBackendError("23503", "família apagada")]
+
+    # conflito não segura a fila: a entrega seguinte vai no mesmo envio
+    assert queue.flush() == (1, 1)
+    conflicts = queue.conflicts()
+    assert [(c["key"], c["error"]) for c in conflicts] == [("k1", "23503: família apagada")]
+    assert datetime.fromisoformat(conflicts[0]["created_at"]) == T0
+    assert queue.stats() == {**queue.stats(), "pending": 0, "conflicts": 1}
+    # entrega em conflito não reserva estoque
+    assert queue.reserved() == {}
+
+    queue.requeue("k1")
+    assert queue.flush() == (1, 0)
+    assert queue.conflicts() == []
+    assert len(client.tables["deliveries"]) == 2
+
+
+def test_flush_stops_at_the_first_network_error(queue, client, clock):
+    for i in range(3):
+        enqueue(queue, f"k{i}")
+        clock.advance(1)
+    client.errors = [ConnectionError("timeout")]
+
+    assert queue.flush() == (0, 0)
+    assert client.sent == ["k0"]
+    assert [row(queue, f"k{i}")["attempts"] for i in range(3)] == [1, 0, 0]
+    assert queue.stats()["pending"] == 3
+
+    clock.advance(delivery_queue.RETRY_BASE_SECONDS)
+    assert queue.flush() == (3, 0)
+    # mesma ordem em que entraram na fila
+    assert client.sent == ["k0", "k0", "k1", "k2"]
@@ -0,0 +1,192 @@
+"""
+Ledger de estoque (utils.ledger): saldos por cumsum/searchsorted e checkpoints
+conferidos contra a soma simples dos movimentos.
+
+Uso:
+    pytest tests
+"""
+import random
+from datetime import date, datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+
+from utils import db
+from utils.ledger import Ledger, load_ledger, reconcile, save_checkpoints
+from utils.local_backend import MemoryClient
+
+PRODUCTS = ["p1", "p2", "p3"]
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def movements(n=400, seed=7):
+    rng = random.Random(seed)
+    rows = [{"product_id": rng.choice(PRODUCTS[:2]),
+             "qty_change": float(rng.choice([-3, -1, 1, 2, 5, 10])),
+             "created_at": (START + timedelta(seconds=rng.randint(0, 200 * 86400))).isoformat()}
+            for _ in range(n)]
+    # movimento exatamente no início de um mês (limite do checkpoint)
+    rows.append({"product_id": "p1", "qty_change": 7.0, "created_at": "2025-03-01T00:00:00+00:00"})
+    return rows
+
+
+def plain_balance(rows, product_id, before):
+    """Soma simples dos movimentos com created_at < before."""
+    return sum(r["qty_change"] for r in rows
+               if r["product_id"] == product_id and pd.Timestamp(r["created_at"]) < before)
+
+
+def plain_count(rows, product_id, before):
+    return sum(1 for r in rows if r["product_id"] == product_id and pd.Timestamp(r["created_at"]) < before)
+
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=["product_id", "qty_change", "created_at"])
+
+
+def checkpoint_base(rows, as_of):
+    """{product_id: (saldo, movimentos)} antes de as_of, como em stock_checkpoints."""
+    return {pid: (plain_balance(rows, pid, as_of), plain_count(rows, pid, as_of))
+            for pid in PRODUCTS if plain_count(rows, pid, as_of)}
+
+
+QUERIES = [
+    date(2025, 1, 1), date(2025, 2, 28), date(2025, 3, 1), date(2025, 6, 15), date(2026, 1, 1),
+    datetime(2025, 3, 1, tzinfo=timezone.utc),
+    datetime(2025, 4, 10, 12, 30, tzinfo=timezone.utc),
+    "2025-05-20", "2025-05-20T08:00:00+00:00",
+]
+
+
+def cutoff(when):
+    # date conta o dia inteiro; datetime inclui o próprio instante
+    if isinstance(when, str):
+        when = date.fromisoformat(when) if len(when) == 10 else datetime.fromisoformat(when)
+    if isinstance(when, datetime):
+        return pd.Timestamp(when) + pd.Timedelta(1, "us")
+    return pd.Timestamp(when + timedelta(days=1), tz="UTC")
+
+
+def test_as_of_and_snapshot_match_a_plain_sum():
+    rows = movements()
+    ledger = Ledger(frame(rows))
+    assert len(ledger) == len(rows)
+
+    for when in QUERIES:
+        for pid in PRODUCTS:
+            assert ledger.as_of(pid, when) == pytest.approx(plain_balance(rows, pid, cutoff(when)))
+        snap = ledger.snapshot(when)
+        assert snap.to_dict() == pytest.approx({pid: plain_balance(rows, pid, cutoff(when)) for pid in PRODUCTS[:2]})
+
+    now = pd.Timestamp.max.tz_localize("UTC")
+    assert ledger.totals().to_dict() == pytest.approx({pid: plain_balance(rows, pid, now) for pid in PRODUCTS[:2]})
+    assert ledger.as_of("p3") == ledger.as_of("p3", date(2025, 6, 1)) == 0.0
+
+
+def test_movement_at_the_exact_instant_is_included():
+    rows = movements()
+    ledger = Ledger(frame(rows))
+    at = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    just_before = at - timedelta(microseconds=1)
+    assert ledger.as_of("p1", at) - ledger.as_of("p1", just_before) == pytest.approx(
+        sum(r["qty_change"] for r in rows if r["product_id"] == "p1" and pd.Timestamp(r["created_at"]) == at)
+    )
+
+
+def test_checkpoint_rows_are_month_starts_after_the_first_movement():
+    rows = movements()
+    ledger = Ledger(frame(rows))
+    until = datetime(2025, 9, 15, tzinfo=timezone.utc)
+    out = ledger.checkpoint_rows(until)
+
+    first = min(pd.Timestamp(r["created_at"]) for r in rows)
+    bounds = sorted({r["as_of"] for r in out})
+    expected = pd.date_range(first.normalize(), until, freq="MS", tz="UTC")
+    assert bounds == [b.isoformat() for b in expected[expected > first]]
+
+    for r in out:
+        # checkpoint = saldo ANTES de as_of (movimento às 00:00 do dia 1 fica para o mês seguinte)
+        as_of = pd.Timestamp(r["as_of"])
+        assert r["quantity"] == pytest.approx(plain_balance(rows, r["product_id"], as_of))
+        assert r["movements"] == plain_count(rows, r["product_id"], as_of)
+    # produto sem movimento nenhum não ganha checkpoint
+    assert {r["product_id"] for r in out} == {"p1", "p2"}
+
+
+@pytest.mark.parametrize("as_of", ["2025-03-01T00:00:00+00:00", "2025-04-01T00:00:00+00:00"])
+def test_ledger_from_a_checkpoint_matches_the_full_history(as_of):
+    rows = movements()
+    base_time = pd.Timestamp(as_of)
+    after = [r for r in rows if pd.Timestamp(r["created_at"]) >= base_time]
+    ledger = Ledger(frame(after), checkpoint_base(rows, base_time), base_time)
+    full = Ledger(frame(rows))
+
+    for when in QUERIES:
+        if cutoff(when) < base_time:
+            continue
+        for pid in PRODUCTS:
+            assert ledger.as_of(pid, when) == pytest.approx(plain_balance(rows, pid, cutoff(when)))
+        assert ledger.snapshot(when).to_dict() == pytest.approx(full.snapshot(when).to_dict())
+    assert ledger.totals().to_dict() == pytest.approx(full.totals().to_dict())
+
+    # checkpoints seguintes: os mesmos do histórico inteiro (bounds > base_time, sem repetir o de partida)
+    until = datetime(2025, 9, 15, tzinfo=timezone.utc)
+    expected = [r for r in full.checkpoint_rows(until) if pd.Timestamp(r["as_of"]) > base_time]
+    assert ledger.checkpoint_rows(until) == expected
+
+
+def test_dates_before_the_checkpoint_are_refused():
+    rows = movements()
+    base_time = pd.Timestamp("2025-04-01T00:00:00+00:00")
+    after = [r for r in rows if pd.Timestamp(r["created_at"]) >= base_time]
+    ledger = Ledger(frame(after), checkpoint_base(rows, base_time), base_time)
+
+    with pytest.raises(ValueError, match="load_ledger"):
+        ledger.as_of("p1", date(2025, 3, 30))
+    with pytest.raises(ValueError):
+        ledger.snapshot(datetime(2025, 3, 31, 23, 59, tzinfo=timezone.utc))
+    # o último dia antes do checkpoint termina exatamente em base_time: ainda vale
+    assert ledger.as_of("p1", date(2025, 3, 31)) == pytest.approx(plain_balance(rows, "p1", base_time))
+
+
+@pytest.fixture
+def client():
+    rows = movements()
+    totals = {pid: plain_balance(rows, pid, pd.Timestamp.max.tz_localize("UTC")) for pid in PRODUCTS}
+    client = MemoryClient({
+        "products": [{"id": pid, "name": f"Produto {pid}"} for pid in PRODUCTS],
+        "stock_movements": [{"id": f"m{i}", **r} for i, r in enumerate(rows)],
+        # p2 com drift de +4 (contador alterado sem movimento), p3 com -1
+        "inventory": [{"id": "i1", "product_id": "p1", "quantity": totals["p1"]},
+                      {"id": "i2", "product_id": "p2", "quantity": totals["p2"] + 4.0},
+                      {"id": "i3", "product_id": "p3", "quantity": -1.0}],
+        "stock_checkpoints": [],
+    }, max_rows=None)
+    db.use_client(client)
+    yield client
+    db.use_client(None)
+
+
+def test_load_ledger_from_saved_checkpoints(client):
+    rows = movements()
+    full = load_ledger(use_checkpoints=False)
+    saved = save_checkpoints(full, until=datetime(2025, 6, 10, tzinfo=timezone.utc))
+    assert saved == len(client.tables["stock_checkpoints"]) > 0
+
+    ledger = load_ledger()
+    assert ledger.base_time == pd.Timestamp("2025-06-01T00:00:00+00:00")
+    assert len(ledger) == sum(pd.Timestamp(r["created_at"]) >= ledger.base_time for r in rows)
+    assert ledger.totals().to_dict() == pytest.approx(full.totals().to_dict())
+
+    # data antes do último checkpoint: load_ledger(until=...) parte de um checkpoint anterior
+    when = date(2025, 4, 20)
+    older = load_ledger(until=when)
+    assert older.base_time == pd.Timestamp("2025-04-01T00:00:00+00:00")
+    assert older.as_of("p1", when) == pytest.approx(plain_balance(rows, "p1", cutoff(when)))
+
+
+def test_reconcile_reports_only_products_with_drift(client):
+    df = reconcile(load_ledger(use_checkpoints=False))
+    assert df[["product_id", "name"]].values.tolist() == [["p2", "Produto p2"], ["p3", "Produto p3"]]
+    assert df["drift"].tolist() == pytest.approx([4.0, -1.0])
+    assert (df["inventory"] - df["ledger"]).tolist() == pytest.approx(df["drift"].tolist())
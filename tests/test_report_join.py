@@ -0,0 +1,144 @@
+"""
+Join vetorizado do relatório (utils.reports.build_report_frame) contra o laço
+antigo, entrega a entrega (copiado de benchmarks/bench_report_join.py).
+
+Uso:
+    pytest tests
+"""
+import pandas as pd
+import pytest
+
+from utils.reports import REPORT_COLUMNS, DELIVERY_COLUMNS, build_report_frame
+
+
+def build_report_rows_legacy(deliveries, families, dims):
+    """Implementação anterior (laço Python por entrega), para comparação."""
+    fam_map = {f["id"]: f for f in families}
+    leader_map = {l["id"]: l for l in dims["leaders"]}
+    basket_map = {b["id"]: b for b in dims["baskets"]}
+    cell_map = {c["id"]: c for c in dims["cells"]}
+    super_map = {s["id"]: s for s in dims["supers"]}
+
+    rows = []
+    for d in deliveries:
+        fam = fam_map.get(d["family_id"])
+        leader = leader_map.get(d["leader_id"])
+        basket = basket_map.get(d["basket_type_id"])
+        cell = None
+        if fam and fam.get("cell_id"):
+            cell = cell_map.get(fam["cell_id"])
+        supervisor = None
+        if cell and cell.get("supervisor_id"):
+            supervisor = super_map.get(cell["supervisor_id"])
+        if not supervisor and leader and leader.get("supervisor_id"):
+            supervisor = super_map.get(leader["supervisor_id"])
+        rows.append({
+            "Data": d["delivered_at"],
+            "Representante": fam["representative_name"] if fam else "-",
+            "Telefone Representante": fam["representative_phone"] if fam else "-",
+            "Célula": cell["cell_name"] if cell else "-",
+            "Rede da Célula": cell["network_name"] if cell else "-",
+            "Supervisor": supervisor["name"] if supervisor else "-",
+            "Telefone Supervisor": supervisor["phone"] if supervisor else "-",
+            "Líder": leader["name"] if leader else "-",
+            "Telefone Líder": leader["phone"] if leader else "-",
+            "Rede do Líder": leader["network_name"] if leader else "-",
+            "Cesta": basket["name"] if basket else "-",
+            "Quantidade": d["quantity"]
+        })
+    return pd.DataFrame(rows, columns=REPORT_COLUMNS)
+
+
+DIMS = {
+    "supers": [
+        {"id": "s1", "name": "Supervisor 1", "phone": "21990000001"},
+        {"id": "s2", "name": "Supervisor 2", "phone": "21990000002"},
+    ],
+    "cells": [
+        {"id": "c1", "cell_name": "Célula 1", "network_name": "Rede A", "supervisor_id": "s1"},
+        {"id": "c2", "cell_name": "Célula 2", "network_name": "Rede B", "supervisor_id": None},
+        {"id": "c3", "cell_name": "Célula 3", "network_name": "Rede B", "supervisor_id": "s-apagado"},
+    ],
+    "leaders": [
+        {"id": "l1", "name": "Líder 1", "phone": "21980000001", "network_name": "Rede A", "supervisor_id": "s2"},
+        {"id": "l2", "name": "Líder 2", "phone": "21980000002", "network_name": "Rede B", "supervisor_id": None},
+    ],
+    "baskets": [
+        {"id": "b1", "name": "Cesta Pequena"},
+        {"id": "b2", "name": "Cesta Grande"},
+    ],
+}
+
+FAMILIES = [
+    {"id": "f1", "representative_name": "Família 1", "representative_phone": "21970000001", "cell_id": "c1"},
+    {"id": "f2", "representative_name": "Família 2", "representative_phone": "21970000002", "cell_id": "c2"},
+    {"id": "f3", "representative_name": "Família 3", "representative_phone": "21970000003", "cell_id": None},
+    {"id": "f4", "representative_name": "Família 4", "representative_phone": "21970000004", "cell_id": "c-apagada"},
+    {"id": "f5", "representative_name": "Família 5", "representative_phone": "21970000005", "cell_id": "c3"},
+    {"id": "f6", "representative_name": "Família 6", "representative_phone": None, "cell_id": "c1"},
+]
+
+
+def delivery(n, family_id, leader_id, basket_type_id, quantity=1):
+    return {"id": f"d{n}", "delivered_at": f"2025-03-{n:02d}T12:00:00+00:00", "family_id": family_id,
+            "leader_id": leader_id, "basket_type_id": basket_type_id, "quantity": quantity}
+
+
+CASES = {
+    "completa": [delivery(1, "f1", "l1", "b1", 2)],
+    "sem família": [delivery(2, None, "l1", "b1")],
+    "família apagada": [delivery(3, "f-apagada", "l2", "b2")],
+    "família sem célula": [delivery(4, "f3", "l1", "b1")],
+    "célula apagada": [delivery(5, "f4", "l1", "b2")],
+    "célula sem supervisor (fallback líder)": [delivery(6, "f2", "l1", "b1")],
+    "célula sem supervisor, líder sem supervisor": [delivery(7, "f2", "l2", "b1")],
+    "supervisor da célula apagado (fallback líder)": [delivery(8, "f5", "l1", "b1")],
+    "família sem telefone": [delivery(13, "f6", "l2", "b2")],
+    "sem líder": [delivery(9, "f1", None, "b1")],
+    "líder apagado": [delivery(10, "f2", "l-apagado", "b1")],
+    "sem cesta / cesta apagada": [delivery(11, "f1", "l1", None), delivery(12, "f1", "l1", "b-apagada")],
+}
+
+
+def assert_same(deliveries, families=FAMILIES, dims=DIMS):
+    expected = build_report_rows_legacy(deliveries, families, dims)
+    got = build_report_frame(pd.DataFrame(deliveries, columns=DELIVERY_COLUMNS), families, dims)
+    pd.testing.assert_frame_equal(got.reset_index(drop=True), expected, check_dtype=False)
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_same_as_legacy_loop(name):
+    assert_same(CASES[name])
+
+
+def test_all_cases_together_keep_delivery_order():
+    deliveries = [d for rows in CASES.values() for d in rows][::-1]
+    assert_same(deliveries)
+
+
+def test_list_of_dicts_input():
+    deliveries = [d for rows in CASES.values() for d in rows]
+    got = build_report_frame(deliveries, FAMILIES, DIMS)
+    pd.testing.assert_frame_equal(got, build_report_rows_legacy(deliveries, FAMILIES, DIMS), check_dtype=False)
+
+
+def test_missing_ids_become_dash():
+    row = build_report_frame([delivery(1, "f-apagada", "l-apagado", "b-apagada")], FAMILIES, DIMS).iloc[0]
+    assert (row.drop(["Data", "Quantidade"]) == "-").all()
+
+
+def test_duplicated_dimension_id_uses_last():
+    dims = {**DIMS, "baskets": [*DIMS["baskets"], {"id": "b1", "name": "Cesta Renomeada"}]}
+    assert_same([delivery(1, "f1", "l1", "b1")], dims=dims)
+
+
+@pytest.mark.parametrize("deliveries", [[], pd.DataFrame(columns=DELIVERY_COLUMNS)])
+def test_empty(deliveries):
+    got = build_report_frame(deliveries, FAMILIES, DIMS)
+    assert got.empty
+    assert list(got.columns) == REPORT_COLUMNS
+
+
+def test_empty_dimensions():
+    deliveries = [delivery(1, "f1", "l1", "b1")]
+    assert_same(deliveries, families=[], dims={"leaders": [], "baskets": [], "cells": [], "supers": []})
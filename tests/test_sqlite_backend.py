@@ -0,0 +1,108 @@
+"""
+Journal do banco local (utils.sqlite_backend) e o sync com o Supabase
+(MemoryClient no lugar do servidor).
+
+Uso:
+    pytest tests
+"""
+import pytest
+
+from utils.local_backend import MemoryClient
+from utils.sqlite_backend import SQLiteClient, sync, _replay_rpcs
+
+SEED = {
+    "cell_leaders": [{"id": "l1", "name": "Líder 1", "phone": "21980000001", "network_name": "Rede A"}],
+    "families": [{"id": "f1", "representative_name": "Família 1", "representative_phone": "21970000001"}],
+    "products": [{"id": "p1", "name": "Arroz"}, {"id": "p2", "name": "Feijão"}],
+    "inventory": [
+        {"id": "i1", "product_id": "p1", "quantity": 100.0},
+        {"id": "i2", "product_id": "p2", "quantity": 100.0},
+    ],
+    "basket_types": [{"id": "b1", "name": "Cesta Básica"}],
+    "basket_type_items": [
+        {"id": "bi1", "basket_type_id": "b1", "product_id": "p1", "quantity_required": 2.0},
+        {"id": "bi2", "basket_type_id": "b1", "product_id": "p2", "quantity_required": 1.0},
+    ],
+}
+
+
+def delivery_params(key, quantity=1):
+    return {"p_idempotency_key": key, "p_family_id": "f1", "p_leader_id": "l1",
+            "p_basket_type_id": "b1", "p_quantity": quantity}
+
+
+@pytest.fixture
+def local():
+    client = SQLiteClient(":memory:")
+    for table, rows in SEED.items():
+        client.load_rows(table, rows)
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def remote():
+    return MemoryClient(SEED)
+
+
+def stock(client):
+    return {r["product_id"]: float(r["quantity"]) for r in client.table("inventory").select("*").execute().data}
+
+
+def test_journal_only_records_the_outer_call(local):
+    local.rpc("register_delivery_tx", delivery_params("k1")).execute()
+    local.rpc("operation_dates_version").execute()  # só leitura: fica fora do journal
+
+    pending = local.pending()
+    assert [(e["kind"], e["target"]) for e in pending] == [("rpc", "register_delivery_tx")]
+    # as escritas de dentro da RPC (entrega, itens, estoque, movimentos) não viram entradas próprias
+    assert len(local.table("stock_movements").select("*").execute().data) == 2
+
+    local.table("products").insert({"id": "p3", "name": "Óleo"}).execute()
+    assert [(e["kind"], e["target"]) for e in local.pending()][1:] == [("rows", "products")]
+
+
+def test_journal_fixes_date_and_key_of_the_call(local):
+    local.rpc("apply_stock_movement", {"p_product_id": "p1", "p_qty_change": 5.0}).execute()
+    local.rpc("register_delivery_tx", delivery_params("k1")).execute()
+
+    move, delivery = [e["payload"] for e in local.pending()]
+    assert move["p_idempotency_key"] and move["p_created_at"]
+    assert delivery["p_idempotency_key"] == "k1"
+    assert delivery["p_delivered_at"] == delivery["p_created_at"]
+    row = local.table("deliveries").select("*").execute().data[0]
+    assert row["delivered_at"] == delivery["p_delivered_at"]
+
+
+def test_sync_keeps_original_dates_and_keys(local, remote):
+    local.rpc("register_delivery_tx", delivery_params("k1", quantity=2)).execute()
+    local.rpc("apply_stock_movement", {"p_product_id": "p2", "p_qty_change": 10.0}).execute()
+    local.rpc("checkout_basket_tx", {"p_idempotency_key": "k2", "p_basket_type_id": "b1", "p_quantity": 1}).execute()
+
+    assert sync(local, remote, log=lambda *_: None) == 3
+    assert local.pending() == []
+
+    def dates(client, table, col):
+        return sorted(r[col] for r in client.table(table).select("*").execute().data)
+
+    assert dates(remote, "deliveries", "delivered_at") == dates(local, "deliveries", "delivered_at")
+    assert dates(remote, "deliveries", "created_at") == dates(local, "deliveries", "created_at")
+    assert dates(remote, "stock_movements", "created_at") == dates(local, "stock_movements", "created_at")
+    assert dates(remote, "operation_keys", "key") == dates(local, "operation_keys", "key")
+    assert stock(remote) == stock(local) == {"p1": 94.0, "p2": 107.0}
+
+
+def test_replaying_the_same_batch_twice_is_a_noop(local, remote):
+    local.rpc("register_delivery_tx", delivery_params("k1")).execute()
+    local.rpc("apply_stock_movement", {"p_product_id": "p1", "p_qty_change": -3.0}).execute()
+    entries = local.pending()
+
+    _replay_rpcs(remote, entries)
+    before = stock(remote)
+    counts = {t: len(remote.tables.get(t, [])) for t in ("deliveries", "delivery_items", "stock_movements")}
+
+    # sync interrompido depois do envio e antes do mark_synced: o bloco vai de novo
+    _replay_rpcs(remote, entries)
+    assert stock(remote) == before == {"p1": 95.0, "p2": 99.0}
+    assert {t: len(remote.tables.get(t, [])) for t in counts} == counts
+    assert counts["deliveries"] == 1
@@ -0,0 +1,380 @@
+"""
+Modo analítico dos Relatórios: filtros, totais e exportação em SQL (DuckDB)
+sobre uma cópia local das tabelas, em vez de pandas sobre o período inteiro.
+
+Cópia local (o DuckDB lê tudo em memória, sem copiar de novo):
+- deliveries: arquivo Arrow do utils.delivery_cache (sync incremental)
+- delivery_items: itens.arrow na mesma pasta, novos pela marca d'água de
+  created_at (itens só nascem com a entrega; os de entregas apagadas somem
+  no join) + cópia completa a cada DELIVERY_CACHE_FULL_HOURS
+- families, cells, cell_leaders, supervisors, basket_types (e products, para
+  o nome dos itens): tabelas pequenas, do cache do banco
+A view report (mesmo join de migrations/0003 e nomes de REPORT_COLUMNS) é a
+base das consultas. A exportação lê a consulta em lotes de EXPORT_CHUNK_ROWS
+direto para o CSV / Excel, sem montar o relatório inteiro em pandas.
+
+Variáveis de ambiente:
+- DUCKDB_ANALYTICS=1           liga o modo nos Relatórios (padrão: desligado)
+- ANALYTICS_PREVIEW_ROWS=1000  entregas mostradas na tela (a exportação traz todas)
+Precisa do DuckDB (opcional): pip install -r requirements-analytics.txt
+
+Uso:
+    python -m utils.analytics snapshot
+    python -m utils.analytics sql "select \"Célula\", sum(\"Quantidade\") from report group by 1"
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from utils import delivery_cache
+from utils.db import iter_table_frames, fetch_many, table_version
+from utils.delivery_cube import LABEL_COLUMNS, SUMMARY_COLUMNS
+from utils.reports import (REPORT_COLUMNS, FILTER_COLUMNS, EXPORT_CHUNK_ROWS, FAMILY_COLUMNS, compact_report,
+                           period_cache, column_width, export_csv_batches, export_excel_batches, _dim)
+
+ENABLED = os.getenv("DUCKDB_ANALYTICS", "").lower() in ("1", "true", "yes", "on")
+PREVIEW_ROWS = int(os.getenv("ANALYTICS_PREVIEW_ROWS", "1000"))
+
+ITEM_COLUMNS = ["id", "delivery_id", "product_id", "qty_delivered", "created_at"]
+ITEM_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("delivery_id", pa.string()),
+    ("product_id", pa.string()),
+    ("qty_delivered", pa.float64()),
+    ("created_at", pa.timestamp("us", tz="UTC")),
+])
+
+# nome na consulta -> (tabela no banco, colunas); ids e textos
+DIMENSIONS = {
+    "families": ("families", FAMILY_COLUMNS),
+    "cells": ("cells", ["id", "cell_name", "network_name", "supervisor_id"]),
+    "cell_leaders": ("cell_leaders", ["id", "name", "phone", "network_name", "supervisor_id"]),
+    "supervisors": ("supervisors", ["id", "name", "phone"]),
+    "basket_types": ("basket_types", ["id", "name"]),
+    "products": ("products", ["id", "name", "unit"]),
+}
+
+# de load_dimensions (já carregadas pela página) -> nome na consulta
+_FROM_DIMS = {"cells": "cells", "leaders": "cell_leaders", "supers": "supervisors", "baskets": "basket_types"}
+
+REPORT_VIEW = """
+create or replace temp view report as
+select
+    d.id,
+    d.delivered_at::timestamp as "Data",
+    coalesce(f.representative_name, '-') as "Representante",
+    coalesce(f.representative_phone, '-') as "Telefone Representante",
+    coalesce(c.cell_name, '-') as "Célula",
+    coalesce(c.network_name, '-') as "Rede da Célula",
+    coalesce(case when cs.id is not null then cs.name else ls.name end, '-') as "Supervisor",
+    coalesce(case when cs.id is not null then cs.phone else ls.phone end, '-') as "Telefone Supervisor",
+    coalesce(l.name, '-') as "Líder",
+    coalesce(l.phone, '-') as "Telefone Líder",
+    coalesce(l.network_name, '-') as "Rede do Líder",
+    coalesce(b.name, '-') as "Cesta",
+    d.quantity as "Quantidade"
+from deliveries d
+left join families f on f.id = d.family_id
+left join cells c on c.id = f.cell_id
+left join supervisors cs on cs.id = c.supervisor_id
+left join cell_leaders l on l.id = d.leader_id
+left join supervisors ls on ls.id = l.supervisor_id
+left join basket_types b on b.id = d.basket_type_id
+"""
+
+
+def _duckdb():
+    try:
+        import duckdb
+        return duckdb
+    except ImportError:
+        raise RuntimeError("Instale o DuckDB para o modo analítico: pip install -r requirements-analytics.txt") from None
+
+
+def _q(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+# ==========================
+# CÓPIA LOCAL DOS ITENS
+# ==========================
+class ItemsSnapshot:
+    """delivery_items em Arrow (itens.arrow + itens.json), na pasta do cache das entregas."""
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory or delivery_cache.CACHE_DIR)
+        self.path = self.directory / "itens.arrow"
+        self.meta_path = self.directory / "itens.json"
+
+    def meta(self):
+        if not self.meta_path.exists():
+            return {}
+        return json.loads(self.meta_path.read_text(encoding="utf-8"))
+
+    def table(self):
+        if not self.path.exists():
+            return ITEM_SCHEMA.empty_table()
+        with pa.memory_map(str(self.path), "r") as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def write(self, df, **meta):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pandas(df[ITEM_COLUMNS], schema=ITEM_SCHEMA, preserve_index=False).combine_chunks()
+        tmp = self.path.with_suffix(".arrow.tmp")
+        with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, ITEM_SCHEMA) as writer:
+            writer.write_table(table)
+        os.replace(tmp, self.path)
+
+        meta = {**self.meta(), **meta, "rows": len(df),
+                "created_at": delivery_cache._iso(df["created_at"].max()) if len(df) else None}
+        tmp = self.meta_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        os.replace(tmp, self.meta_path)
+
+
+def _fetch_items(filters=None, key="id"):
+    frames = list(iter_table_frames("delivery_items", filters, columns=ITEM_COLUMNS, key=key))
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=ITEM_COLUMNS)
+    df["created_at"] = pd.to_datetime(df["created_at"], utc=True, format="ISO8601").dt.as_unit("us")
+    df["qty_delivered"] = df["qty_delivered"].astype(float)
+    return df
+
+
+def sync_items(snapshot=None, full=False):
+    """Atualiza itens.arrow (ver docstring do módulo). Retorna {"full", "new", "rows"}."""
+    snapshot = snapshot or ItemsSnapshot()
+    meta = snapshot.meta()
+    now = datetime.now(timezone.utc)
+
+    full_at = meta.get("full_at")
+    stale = full_at is None or now - datetime.fromisoformat(full_at) > timedelta(hours=delivery_cache.FULL_SYNC_HOURS)
+    if full or stale or not snapshot.path.exists() or meta.get("source") != delivery_cache._source():
+        df = _fetch_items()
+        snapshot.write(df, source=delivery_cache._source(), full_at=now.isoformat())
+        return {"full": True, "new": len(df), "rows": len(df)}
+
+    # sem marca d'água (cópia vazia): busca tudo
+    since = meta.get("created_at") and datetime.fromisoformat(meta["created_at"]) - delivery_cache.SYNC_MARGIN
+    new = _fetch_items({"created_at__gt": since.isoformat()} if since else None, key="created_at")
+    local = snapshot.table().to_pandas()
+    # ⚠️ a margem sempre traz de volta os últimos itens: só regrava se vier id novo
+    if not new.empty and not new["id"].isin(local["id"]).all():
+        local = pd.concat([local[~local["id"].isin(new["id"])], new], ignore_index=True)
+        snapshot.write(local)
+    return {"full": False, "new": len(new), "rows": len(local)}
+
+
+def snapshot(full=False):
+    """Deixa a cópia local em dia (entregas e itens, respeitando SYNC_SECONDS). Retorna os dois arquivos."""
+    cache = delivery_cache.DeliveryCache()
+    items = ItemsSnapshot(cache.directory)
+    delivery_cache.throttled(cache.directory, ("deliveries",), lambda: delivery_cache.sync(cache, full=full),
+                             force=full)
+    delivery_cache.throttled((items.directory, "itens"), ("delivery_items",), lambda: sync_items(items, full=full),
+                             force=full)
+    return cache, items
+
+
+# ==========================
+# CONSULTAS
+# ==========================
+def _arrow(rows, columns):
+    """Linhas de uma dimensão -> tabela Arrow só de texto (id repetido: vale o último, como no join do app)."""
+    df = _dim(rows, columns[1:])
+    return pa.Table.from_pandas(df.astype(object).where(df.notna(), None),
+                                schema=pa.schema([(c, pa.string()) for c in columns]), preserve_index=False)
+
+
+_con_lock = threading.RLock()
+_con = {}  # "version", "sources", "con"
+
+
+def connect(dims=None):
+    """
+    Conexão DuckDB (em memória) com a cópia local registrada e a view report.
+    dims: as de load_dimensions (evita buscar de novo); famílias e produtos vêm do cache do banco.
+    ✅ Reaproveitada enquanto a cópia local (metadados dos arquivos) e as
+    linhas das dimensões não mudam: registrar tudo de novo custa mais que comparar.
+    ⚠️ Uma conexão para todo o processo: use e leia o resultado com _con_lock.
+    """
+    duckdb = _duckdb()
+    deliveries, items = snapshot()
+    version = (deliveries.meta(), items.meta())
+
+    given = {_FROM_DIMS[k]: v for k, v in (dims or {}).items() if k in _FROM_DIMS}
+    # sem o valor da dimensão na coluna pedida (ex: phone fora de load_dimensions): busca
+    missing = {name: (table, {"columns": columns}) for name, (table, columns) in DIMENSIONS.items()
+               if given.get(name) is None or (given[name] and not set(columns) <= set(given[name][0]))}
+    sources = {**given, **fetch_many(missing)} if missing else given
+
+    with _con_lock:
+        if _con.get("version") == version and all(_con["sources"][n] == sources[n] for n in DIMENSIONS):
+            return _con["con"]
+        con = duckdb.connect()
+        # ✅ datas em UTC, como o dia (delivered_at::date) do relatório e do cubo
+        con.execute("set TimeZone = 'UTC'")
+        con.register("deliveries", deliveries.table())
+        con.register("delivery_items", items.table())
+        for name, (table, columns) in DIMENSIONS.items():
+            con.register(name, _arrow(sources[name], columns))
+        con.execute(REPORT_VIEW)
+        if _con.get("con") is not None:
+            _con["con"].close()
+        _con.update(version=version, sources=sources, con=con)
+        return con
+
+
+def _where(start, end, filters, prefix=""):
+    """Período (datas inclusive, UTC) + filtros da tela (nome exibido) -> (sql, parâmetros)."""
+    sql = [f'{prefix}"Data" >= ?', f'{prefix}"Data" < ?']
+    params = [datetime.combine(start, datetime.min.time()), datetime.combine(end + timedelta(days=1),
+                                                                              datetime.min.time())]
+    for name, value in filters.items():
+        if value is not None:
+            sql.append(f"{prefix}{_q(FILTER_COLUMNS[name])} = ?")
+            params.append(value)
+    return " and ".join(sql), params
+
+
+def _chosen(filters):
+    return tuple(sorted((k, v) for k, v in filters.items() if v is not None))
+
+
+def load_cube(start, end, dims, **filters):
+    """
+    Mesmo cubo rotulado de utils.delivery_cube (SUMMARY_COLUMNS), já filtrado,
+    agregado em SQL: serve para render_delivery_summary / render_delivery_rollups.
+    """
+    def build():
+        where, params = _where(start, end, filters)
+        labels = ", ".join(_q(c) for c in LABEL_COLUMNS)
+        with _con_lock:
+            cube = connect(dims).execute(f"""
+                select "Data"::date as "Dia", {labels}, count(*) as "Entregas", sum("Quantidade") as "Cestas"
+                  from report where {where}
+                 group by all order by "Dia"
+            """, params).df()
+        cube["Dia"] = pd.to_datetime(cube["Dia"]).astype("datetime64[ns]")
+        return compact_report(cube.astype({"Entregas": "int64", "Cestas": "int64"})[SUMMARY_COLUMNS])
+
+    return period_cache("sql_cube", start, end, build, extra=_chosen(filters))
+
+
+def summary(start, end, dims, **filters):
+    """
+    Retorna {"deliveries", "baskets", "families", "stamp"} do período/filtros
+    numa consulta. stamp: nº de linhas + soma de um hash de cada linha
+    (carimbo dos dados para o cache de exportação).
+    """
+    def build():
+        where, params = _where(start, end, filters)
+        row_hash = "hash(" + ", ".join(_q(c) for c in REPORT_COLUMNS) + ")"
+        with _con_lock:
+            n, baskets, families, stamp = connect(dims).execute(f"""
+                select count(*), coalesce(sum("Quantidade"), 0), count(distinct "Telefone Representante"),
+                       coalesce(sum({row_hash}::hugeint), 0)::varchar
+                  from report where {where}
+            """, params).fetchone()
+        return {"deliveries": int(n), "baskets": int(baskets), "families": int(families), "stamp": f"{n}:{stamp}"}
+
+    return period_cache("sql_summary", start, end, build, extra=_chosen(filters))
+
+
+def family_count(start, end, dims, **filters):
+    """Famílias distintas atendidas (telefones distintos, "-" = sem família), como delivery_cube.family_count."""
+    return summary(start, end, dims, **filters)["families"]
+
+
+def item_totals(start, end, dims, **filters):
+    """Produtos entregues no período/filtros: Produto, Unidade, Quantidade, Entregas (maiores primeiro)."""
+    def build():
+        where, params = _where(start, end, filters, prefix="r.")
+        with _con_lock:
+            return connect(dims).execute(f"""
+                select coalesce(p.name, '-') as "Produto", coalesce(p.unit, '-') as "Unidade",
+                       sum(i.qty_delivered) as "Quantidade", count(distinct i.delivery_id) as "Entregas"
+                  from delivery_items i
+                  join report r on r.id = i.delivery_id
+                  left join products p on p.id = i.product_id
+                 where {where}
+                 group by all order by "Quantidade" desc, "Produto"
+            """, params).df()
+
+    chosen = (_chosen(filters), table_version("delivery_items"))
+    return period_cache("sql_items", start, end, build, extra=chosen)
+
+
+def load_report(start, end, dims, limit=None, newest_first=False, **filters):
+    """Relatório (REPORT_COLUMNS) do período/filtros, ordenado por Data; limit: só as primeiras linhas."""
+    where, params = _where(start, end, filters)
+    columns = ", ".join(_q(c) for c in REPORT_COLUMNS)
+    order = '"Data" desc, id desc' if newest_first else '"Data", id'
+    sql = f"select {columns} from report where {where} order by {order}"
+    if limit is not None:
+        sql += f" limit {int(limit)}"
+    with _con_lock:
+        df = connect(dims).execute(sql, params).df()
+    df["Data"] = df["Data"].astype("datetime64[ns]")
+    return compact_report(df)
+
+
+def export_key(start, end, dims, **filters):
+    """Chave do cache de exportação (utils.export_cache): filtros + carimbo dos dados, sem ler o relatório."""
+    from utils.export_cache import filters_fingerprint
+    return (filters_fingerprint({"start": start, "end": end, **filters}),
+            summary(start, end, dims, **filters)["stamp"])
+
+
+def export(kind, start, end, dims, **filters):
+    """
+    CSV ("csv") ou Excel ("xlsx") do relatório, igual ao export_csv /
+    export_excel_pretty do relatório em pandas. A consulta é lida em lotes
+    de EXPORT_CHUNK_ROWS direto para o arquivo.
+    """
+    where, params = _where(start, end, filters)
+    # ⚠️ o leitor é consumido dentro do lock: outra consulta na conexão o encerraria
+    with _con_lock:
+        con = connect(dims)
+        if kind == "xlsx":
+            # o Excel precisa do nº de linhas e das larguras antes da primeira linha
+            longest = ", ".join(f"coalesce(max(length({_q(c)}::varchar)), 0)" for c in REPORT_COLUMNS)
+            rows, *lengths = con.execute(f"select count(*), {longest} from report where {where}", params).fetchone()
+
+        # ⚠️ outro execute na mesma conexão encerra o leitor: ele vem por último
+        columns = ", ".join(_q(c) for c in REPORT_COLUMNS)
+        reader = con.execute(f'select {columns} from report where {where} order by "Data", id',
+                             params).fetch_record_batch(EXPORT_CHUNK_ROWS)
+        frames = (batch.to_pandas() for batch in reader)
+        if kind == "csv":
+            return export_csv_batches(REPORT_COLUMNS, frames)
+        widths = [column_width(n, c) for n, c in zip(lengths, REPORT_COLUMNS)]
+        return export_excel_batches(REPORT_COLUMNS, frames, rows, widths)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Modo analítico (DuckDB) dos Relatórios")
+    parser.add_argument("command", choices=["snapshot", "sql"])
+    parser.add_argument("query", nargs="?", help="SQL sobre a view report e as tabelas da cópia local")
+    parser.add_argument("--full", action="store_true", help="copia tudo de novo")
+    args = parser.parse_args(argv)
+
+    if args.command == "snapshot":
+        deliveries, items = snapshot(full=args.full)
+        print(f"✅ {deliveries.meta().get('rows')} entregas e {items.meta().get('rows')} itens em {deliveries.directory}")
+        return 0
+    if not args.query:
+        parser.error("informe a consulta")
+    with pd.option_context("display.max_rows", 50, "display.width", 200), _con_lock:
+        print(connect().execute(args.query).df())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,144 +1,256 @@
-import math
+import threading
+import numpy as np
 from utils.db import fetch_table
 
 
-def get_inventory_map():
-    inv = fetch_table("inventory")
+INVENTORY_COLUMNS = ["product_id", "quantity"]
+RECIPE_COLUMNS = ["basket_type_id", "product_id", "quantity_required"]
+
+# ✅ Disponibilidade já calculada (por processo): só recalcula as cestas cujo
+# estoque ou receita mudou desde o último cálculo
+_avail_lock = threading.Lock()
+_avail_results = {}      # basket_type_id -> resultado de compute_availability
+_avail_recipes = {}      # basket_type_id -> receita usada no cálculo
+_avail_stock = {}        # product_id -> estoque usado no cálculo
+_baskets_by_product = {}  # product_id -> {basket_type_id} (índice reverso)
+
+
+def inventory_map(inv):
     return {x["product_id"]: float(x["quantity"]) for x in inv}
 
 
-def compute_mountable_for_basket(basket_type_id):
+def get_inventory_map():
+    return inventory_map(fetch_table("inventory", columns=INVENTORY_COLUMNS))
+
+
+def load_recipes(basket_type_ids=None):
     """
-    Mantido para compatibilidade com páginas antigas.
-    Retorna:
-    - mountable (int)
-    - limiting_product_id (uuid)
+    Carrega as receitas (basket_type_items) numa única leitura.
+    Retorna dict {basket_type_id: [itens na ordem do banco]}.
     """
-    items = fetch_table("basket_type_items", {"basket_type_id": basket_type_id})
-    inv_map = get_inventory_map()
+    if basket_type_ids is not None and len(basket_type_ids) == 1:
+        bid = list(basket_type_ids)[0]
+        items = fetch_table("basket_type_items", {"basket_type_id": bid}, columns=RECIPE_COLUMNS)
+    else:
+        items = fetch_table("basket_type_items", columns=RECIPE_COLUMNS)
+    return group_recipes(items, basket_type_ids)
 
-    if not items:
-        return 0, None
-
-    possible = []
-    limiting_product = None
-    limiting_value = None
 
+def group_recipes(items, basket_type_ids=None):
+    """Agrupa linhas de basket_type_items em {basket_type_id: [itens]}."""
+    wanted = set(basket_type_ids) if basket_type_ids is not None else None
+    recipes = {bid: [] for bid in basket_type_ids} if basket_type_ids is not None else {}
     for it in items:
-        pid = it["product_id"]
-        req = float(it["quantity_required"])
-        stock = inv_map.get(pid, 0.0)
-        if req <= 0:
+        bid = it["basket_type_id"]
+        if wanted is not None and bid not in wanted:
             continue
-        val = stock / req
-        possible.append(val)
+        recipes.setdefault(bid, []).append(it)
+    return recipes
 
-        if limiting_value is None or val < limiting_value:
-            limiting_value = val
-            limiting_product = pid
 
-    mountable = math.floor(min(possible)) if possible else 0
-    return mountable, limiting_product
+def compute_availability(basket_type_ids=None, recipes=None, inv_map=None):
+    """
+    Calcula a disponibilidade de TODAS as cestas numa passada NumPy.
 
+    Monta a matriz de receita R (cestas x produtos) e o vetor de estoque S:
+    - completas = floor(min(S / R)) por linha (só onde R > 0)
+    - sobra = S - completas * R
+    - falta p/ +1 = R - sobra onde sobra < R
 
-def analyze_basket(basket_type_id):
-    """
-    Mantido para outras telas (Tipos de Cesta).
-    Retorna:
-    - completas: número de cestas completas montáveis
-    - faltas_proxima: dict {produto_id: falta} para montar +1 cesta
-    - checklist: lista de dicts com status de cada item
+    Empates (limitante / falta p/ +1) ficam com o menor product_id, então o
+    resultado de uma cesta não depende de quais outras entraram no cálculo.
+
+    Retorna dict {basket_type_id: {
+        "mountable": int,
+        "limiting_product_id": produto com menor razão estoque/receita,
+        "next_product_id": item com maior falta para +1 cesta (ou None),
+        "next_missing": quanto falta desse item,
+        "missing_for_next": {product_id: falta},
+        "checklist": [status por item, na ordem da receita]
+    }}
     """
-    items = fetch_table("basket_type_items", {"basket_type_id": basket_type_id})
-    inv_map = get_inventory_map()
+    if recipes is None:
+        recipes = load_recipes(basket_type_ids)
+    if inv_map is None:
+        inv_map = get_inventory_map()
 
-    if not items:
-        return 0, {}, []
+    basket_ids = list(recipes.keys())
+    product_ids = sorted({it["product_id"] for items in recipes.values() for it in items})
+    col_of = {pid: j for j, pid in enumerate(product_ids)}
 
-    # 1) calcular completas
-    ratios = []
-    for it in items:
-        pid = it["product_id"]
-        req = float(it["quantity_required"])
-        stock = inv_map.get(pid, 0.0)
-        ratios.append(stock / req)
+    if not basket_ids:
+        return {}
 
-    completas = math.floor(min(ratios)) if ratios else 0
+    R = np.zeros((len(basket_ids), len(product_ids)))
+    for i, bid in enumerate(basket_ids):
+        for it in recipes[bid]:
+            R[i, col_of[it["product_id"]]] = float(it["quantity_required"])
+    S = np.array([inv_map.get(pid, 0.0) for pid in product_ids], dtype=float)
 
-    # 2) calcular sobras e faltas
-    faltas_proxima = {}
-    checklist = []
+    used_cols = R > 0
+    has_items = used_cols.any(axis=1)
 
-    for it in items:
-        pid = it["product_id"]
-        req = float(it["quantity_required"])
-        stock = inv_map.get(pid, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratios = np.where(used_cols, S / np.where(used_cols, R, 1.0), np.inf)
 
-        usado = completas * req
-        sobra = stock - usado
+    min_ratio = ratios.min(axis=1) if product_ids else np.full(len(basket_ids), np.inf)
+    mountable = np.where(has_items, np.floor(np.where(has_items, min_ratio, 0.0)), 0).astype(int)
+    limiting_col = ratios.argmin(axis=1) if product_ids else np.zeros(len(basket_ids), dtype=int)
 
-        if sobra < req:
-            falta = req - sobra
-            faltas_proxima[pid] = float(falta)
+    remaining = S[None, :] - mountable[:, None] * R
+    missing = np.where(used_cols & (remaining < R), R - remaining, 0.0)
+    next_col = missing.argmax(axis=1) if product_ids else np.zeros(len(basket_ids), dtype=int)
+    next_missing = missing.max(axis=1) if product_ids else np.zeros(len(basket_ids))
 
-        checklist.append({
-            "product_id": pid,
-            "required": req,
-            "stock": stock,
-            "used_for_full": usado,
-            "remaining": sobra,
-            "ok_for_next": sobra >= req,
-            "missing_for_next": max(0.0, req - sobra)
-        })
+    result = {}
+    for i, bid in enumerate(basket_ids):
+        checklist = []
+        missing_for_next = {}
+        for it in recipes[bid]:
+            j = col_of[it["product_id"]]
+            req = float(it["quantity_required"])
+            sobra = float(remaining[i, j])
+            if sobra < req:
+                missing_for_next[it["product_id"]] = float(req - sobra)
+            checklist.append({
+                "product_id": it["product_id"],
+                "required": req,
+                "stock": float(S[j]),
+                "used_for_full": float(mountable[i] * req),
+                "remaining": sobra,
+                "ok_for_next": sobra >= req,
+                "missing_for_next": max(0.0, req - sobra)
+            })
 
-    return completas, faltas_proxima, checklist
+        has = bool(has_items[i])
+        result[bid] = {
+            "mountable": int(mountable[i]) if has else 0,
+            "limiting_product_id": product_ids[limiting_col[i]] if has else None,
+            "next_product_id": product_ids[next_col[i]] if has and next_missing[i] > 0 else None,
+            "next_missing": float(next_missing[i]) if has else 0.0,
+            "missing_for_next": missing_for_next,
+            "checklist": checklist
+        }
 
+    return result
 
-def basket_summary(basket_type_id):
+
+def baskets_by_product(recipes):
+    """Índice reverso das receitas: {product_id: {basket_type_id}}."""
+    index = {}
+    for bid, items in recipes.items():
+        for it in items:
+            index.setdefault(it["product_id"], set()).add(bid)
+    return index
+
+
+def _recipe_fingerprint(items):
+    return tuple((it["product_id"], float(it["quantity_required"])) for it in items)
+
+
+def cached_availability(basket_type_ids=None, recipes=None, inv_map=None):
     """
-    FUNÇÃO NOVA PARA O DASHBOARD:
+    Mesmo resultado de compute_availability, mas incremental:
+    - compara o estoque com o do último cálculo e, pelo índice reverso
+      produto -> cestas, recalcula só as cestas que usam produtos que mudaram
+    - cesta nova ou com receita alterada também é recalculada
+    Qualquer escrita no estoque (add_stock, entregas, outro usuário) aparece
+    no inventory lido, então não precisa de aviso de quem escreveu.
+    ⚠️ Os dicts retornados são compartilhados: só leitura.
+    """
+    if recipes is None:
+        recipes = load_recipes(basket_type_ids)
+    if inv_map is None:
+        inv_map = get_inventory_map()
+
+    with _avail_lock:
+        dirty = set()
+        for bid, items in recipes.items():
+            fp = _recipe_fingerprint(items)
+            if _avail_recipes.get(bid) != fp or bid not in _avail_results:
+                for pid, _ in _avail_recipes.get(bid, ()):
+                    _baskets_by_product.get(pid, set()).discard(bid)
+                for pid, _ in fp:
+                    _baskets_by_product.setdefault(pid, set()).add(bid)
+                _avail_recipes[bid] = fp
+                dirty.add(bid)
+
+        for pid in set(inv_map) | set(_avail_stock):
+            if inv_map.get(pid, 0.0) != _avail_stock.get(pid, 0.0):
+                dirty |= _baskets_by_product.get(pid, set())
+        _avail_stock.clear()
+        _avail_stock.update(inv_map)
+
+        # cestas afetadas que não foram pedidas agora: saem do cache (recalcula quando pedirem)
+        for bid in dirty - set(recipes):
+            _avail_results.pop(bid, None)
+
+        todo = {bid: recipes[bid] for bid in recipes if bid in dirty}
+        if todo:
+            _avail_results.update(compute_availability(recipes=todo, inv_map=inv_map))
+        return {bid: _avail_results[bid] for bid in recipes}
+
+
+def clear_availability_cache():
+    with _avail_lock:
+        _avail_results.clear()
+        _avail_recipes.clear()
+        _avail_stock.clear()
+        _baskets_by_product.clear()
+
+
+def compute_mountable_for_basket(basket_type_id):
+    """
+    Mantido para compatibilidade com páginas antigas.
     Retorna:
-    - completas (int) => quantas cestas disponíveis (montáveis)
-    - limitante_nome (str) => item que trava a próxima cesta
-    - falta_para_mais_1 (float) => quanto falta do item limitante
+    - mountable (int)
+    - limiting_product_id (uuid)
     """
-    items = fetch_table("basket_type_items", {"basket_type_id": basket_type_id})
-    products = fetch_table("products")
-    prod_map = {p["id"]: p["name"] for p in products}
+    r = compute_availability([basket_type_id])[basket_type_id]
+    return r["mountable"], r["limiting_product_id"]
+
 
-    inv_map = get_inventory_map()
+def analyze_basket(basket_type_id):
+    """
+    Mantido para outras telas (Tipos de Cesta).
+    Retorna:
+    - completas: número de cestas completas montáveis
+    - faltas_proxima: dict {produto_id: falta} para montar +1 cesta
+    - checklist: lista de dicts com status de cada item
+    """
+    r = compute_availability([basket_type_id])[basket_type_id]
+    return r["mountable"], r["missing_for_next"], r["checklist"]
 
-    if not items:
-        return 0, "-", 0
 
-    # calcular completas
-    ratios = []
-    for it in items:
-        pid = it["product_id"]
-        req = float(it["quantity_required"])
-        stock = inv_map.get(pid, 0.0)
-        ratios.append(stock / req)
+def basket_summaries(basket_type_ids, recipes=None, inv_map=None, products=None):
+    """
+    Resumo de várias cestas de uma vez (Dashboard).
+    - recipes / inv_map / products: já carregados pela página (ex: fetch_many)
+    Retorna dict {basket_type_id: (completas, limitante_nome, falta_para_mais_1)}
+    """
+    availability = cached_availability(basket_type_ids, recipes, inv_map)
+    if products is None:
+        products = fetch_table("products", columns=["id", "name"])
+    prod_map = {p["id"]: p["name"] for p in products}
 
-    completas = math.floor(min(ratios)) if ratios else 0
+    out = {}
+    for bid in basket_type_ids:
+        r = availability.get(bid)
+        if not r or not r["checklist"]:
+            out[bid] = (0, "-", 0)
+            continue
+        pid = r["next_product_id"]
+        nome = prod_map.get(pid, "-") if pid else "-"
+        out[bid] = (r["mountable"], nome, round(r["next_missing"], 2))
+    return out
 
-    # calcular faltante apenas do ITEM LIMITANTE (para +1 cesta)
-    limitante_pid = None
-    limitante_falta = 0
 
-    for it in items:
-        pid = it["product_id"]
-        req = float(it["quantity_required"])
-        stock = inv_map.get(pid, 0.0)
-
-        usado = completas * req
-        sobra = stock - usado
-
-        if sobra < req:
-            falta = req - sobra
-            # pega o maior faltante (mais crítico)
-            if falta > limitante_falta:
-                limitante_falta = falta
-                limitante_pid = pid
-
-    limitante_nome = prod_map.get(limitante_pid, "-") if limitante_pid else "-"
-    return completas, limitante_nome, round(limitante_falta, 2)
+def basket_summary(basket_type_id):
+    """
+    FUNÇÃO NOVA PARA O DASHBOARD:
+    Retorna:
+    - completas (int) => quantas cestas disponíveis (montáveis)
+    - limitante_nome (str) => item que trava a próxima cesta
+    - falta_para_mais_1 (float) => quanto falta do item limitante
+    """
+    return basket_summaries([basket_type_id])[basket_type_id]
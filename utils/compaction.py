@@ -0,0 +1,251 @@
+"""
+Compactação do histórico de estoque (stock_movements).
+
+Movimentos mais antigos que o horizonte (STOCK_COMPACT_HORIZON_DAYS, meses
+inteiros) viram 1 linha por produto e mês (movement_type 'compactado'):
+1. os movimentos originais são lidos e, um mês por vez, gravados num arquivo
+   .jsonl.gz (STOCK_ARCHIVE_DIR), que é relido e conferido antes de qualquer escrita
+2. compact_stock_movements (migrations/0010) troca os originais do mês pelos
+   resumos numa transação; o saldo de cada produto não muda. Só os ids do
+   arquivo são apagados, e se o banco não tiver exatamente esses movimentos
+   a função levanta erro e nada muda
+3. a linha de resumo fica no último instante do mês: os checkpoints do
+   ledger (saldo antes do início de cada mês) continuam valendo
+
+⚠️ Depois da compactação o saldo "na data D" (utils.ledger) dentro de um mês
+compactado vale o saldo do início do mês; fora deles, nada muda.
+
+verify() prova a consistência: resumos = soma do arquivo (produto x mês),
+checkpoints = saldo do ledger compactado, e mostra o drift do inventory.
+
+Uso:
+    python -m utils.compaction run [--horizon-days 365] [--dry-run]
+    python -m utils.compaction verify
+"""
+import argparse
+import glob
+import gzip
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from utils.db import call_rpc, delete_rows, fetch_table, insert_rows, iter_table, MigrationMissing
+from utils.ledger import load_ledger, reconcile
+
+HORIZON_DAYS = int(os.getenv("STOCK_COMPACT_HORIZON_DAYS", "365"))
+ARCHIVE_DIR = os.getenv("STOCK_ARCHIVE_DIR", "archive")
+
+SUMMARY_TYPE = "compactado"
+MOVEMENT_COLUMNS = ["id", "product_id", "qty_change", "movement_type", "reference", "created_at"]
+
+
+def compaction_cutoff(horizon_days=None, now=None):
+    """Início do mês de (agora - horizonte): só meses inteiros são compactados."""
+    now = pd.Timestamp(now or datetime.now(timezone.utc))
+    now = now.tz_localize("UTC") if now.tzinfo is None else now.tz_convert("UTC")
+    limit = now - pd.Timedelta(days=HORIZON_DAYS if horizon_days is None else horizon_days)
+    return limit.normalize().replace(day=1)
+
+
+def _old_movements(before):
+    return list(iter_table(
+        "stock_movements",
+        {"created_at__lt": before.isoformat(), "movement_type__neq": SUMMARY_TYPE},
+        columns=MOVEMENT_COLUMNS,
+        key="created_at"
+    ))
+
+
+def summarize(rows):
+    """
+    Resumo por produto e mês UTC (mesma regra das migrations 0005/0010).
+    Retorna DataFrame (product_id, month, qty, movements).
+    """
+    if not rows:
+        return pd.DataFrame(columns=["product_id", "month", "qty", "movements"])
+    df = pd.DataFrame(rows, columns=["product_id", "qty_change", "created_at"])
+    df["month"] = pd.to_datetime(df["created_at"], utc=True, format="ISO8601").dt.strftime("%Y-%m")
+    out = df.astype({"qty_change": float}).groupby(["product_id", "month"], sort=True)["qty_change"] \
+        .agg(qty="sum", movements="count").reset_index()
+    return out
+
+
+def _by_month(rows):
+    """Movimentos por mês UTC, em ordem: [(início do mês seguinte, linhas do mês)]."""
+    months = pd.to_datetime([r["created_at"] for r in rows], utc=True, format="ISO8601").strftime("%Y-%m")
+    groups = {}
+    for month, r in zip(months, rows):
+        groups.setdefault(month, []).append(r)
+    return [(pd.Timestamp(f"{m}-01", tz="UTC") + pd.offsets.MonthBegin(1), groups[m]) for m in sorted(groups)]
+
+
+def write_archive(rows, before, archive_dir=None):
+    """
+    Grava os movimentos em <archive_dir>/stock_movements_antes_<data>_<agora>.jsonl.gz,
+    relê e confere (quantidade de linhas e soma) antes de devolver o caminho.
+    """
+    archive_dir = archive_dir or ARCHIVE_DIR
+    os.makedirs(archive_dir, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    path = os.path.join(archive_dir, f"stock_movements_antes_{before.date().isoformat()}_{stamp}.jsonl.gz")
+
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for r in rows:
+            f.write(json.dumps(r, default=str, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+    back = read_archive(path)
+    total = sum(float(r["qty_change"]) for r in rows)
+    if len(back) != len(rows) or abs(sum(float(r["qty_change"]) for r in back) - total) > 1e-6:
+        raise RuntimeError(f"Arquivo {path} não confere com os movimentos lidos: nada foi compactado.")
+    return path
+
+
+def read_archive(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compact(horizon_days=None, archive_dir=None, dry_run=False, now=None):
+    """
+    Compacta os movimentos anteriores ao corte (ver compaction_cutoff), um mês
+    por vez: cada mês tem seu arquivo e 1 chamada ao banco, então o request não
+    cresce com o histórico. Se um mês falhar, os anteriores já ficam compactados
+    e o próximo run continua de onde parou.
+    Retorna {"before", "archived", "summaries", "archives"}.
+    """
+    before = compaction_cutoff(horizon_days, now)
+    rows = _old_movements(before)
+    result = {"before": before.isoformat(), "archived": len(rows), "summaries": len(summarize(rows)), "archives": []}
+    if dry_run or not rows:
+        return result
+
+    result["summaries"] = 0
+    use_rpc = True
+    for month_end, batch in _by_month(rows):
+        result["archives"].append(write_archive(batch, month_end, archive_dir))
+        done = None
+        if use_rpc:
+            try:
+                # ✅ apaga só o que está no arquivo; contagem diferente = erro e rollback no banco
+                done = call_rpc("compact_stock_movements",
+                                {"p_before": month_end.isoformat(), "p_ids": [r["id"] for r in batch],
+                                 "p_expected": len(batch)},
+                                touches=("stock_movements",))
+            except MigrationMissing:
+                use_rpc = False
+        if done is None:
+            done = _compact_client_side(batch)
+        result["summaries"] += done["summaries"]
+    return result
+
+
+def _compact_client_side(rows):
+    """
+    ⚠️ Caminho antigo (sem a migration 0010): insere os resumos e depois apaga
+    os originais, sem transação. Se falhar no meio, verify mostra a diferença.
+    """
+    summary = summarize(rows)
+    month_end = (pd.to_datetime(summary["month"] + "-01", utc=True) + pd.offsets.MonthBegin(1)
+                 - pd.Timedelta(1, "us"))
+    insert_rows("stock_movements", [
+        {
+            "product_id": r.product_id,
+            "qty_change": float(r.qty),
+            "movement_type": SUMMARY_TYPE,
+            "reference": f"Compactação {r.month}: {r.movements} movimentos",
+            "created_at": end.isoformat()
+        }
+        for r, end in zip(summary.itertuples(index=False), month_end)
+    ])
+    delete_rows("stock_movements", [r["id"] for r in rows])
+    return {"archived": len(rows), "summaries": len(summary)}
+
+
+def verify(archive_dir=None, tolerance=1e-6):
+    """
+    Confere a compactação:
+    - resumos no banco = soma dos arquivos, por produto e mês
+    - cada checkpoint (stock_checkpoints) = saldo do ledger atual naquele instante
+    - drift do inventory contra o ledger (informativo: não é causado pela compactação)
+    Retorna {"ok", "archive_rows", "summary_mismatches", "checkpoint_mismatches", "drift", "movements"}.
+    """
+    archive_dir = archive_dir or ARCHIVE_DIR
+    # um movimento pode estar em 2 arquivos (run repetido depois de uma falha no envio): conta 1 vez
+    paths = sorted(glob.glob(os.path.join(archive_dir, "stock_movements_antes_*.jsonl.gz")))
+    archived = list({r["id"]: r for path in paths for r in read_archive(path)}.values())
+
+    summaries = fetch_table("stock_movements", {"movement_type": SUMMARY_TYPE},
+                            columns=["product_id", "qty_change", "created_at"], use_cache=False)
+    expected = summarize(archived).set_index(["product_id", "month"])["qty"]
+    found = summarize(summaries).set_index(["product_id", "month"])["qty"]
+    cmp = pd.concat({"arquivo": expected, "banco": found}, axis=1).fillna(0.0)
+    summary_mismatches = cmp[(cmp["arquivo"] - cmp["banco"]).abs() > tolerance].reset_index()
+
+    ledger = load_ledger(use_checkpoints=False)
+    try:
+        checkpoints = fetch_table("stock_checkpoints", columns=["product_id", "as_of", "quantity"], use_cache=False)
+    except MigrationMissing:
+        checkpoints = []
+    bad = []
+    for as_of, group in pd.DataFrame(checkpoints, columns=["product_id", "as_of", "quantity"]).groupby("as_of"):
+        # checkpoint = saldo ANTES de as_of
+        balance = ledger.snapshot(pd.Timestamp(as_of).tz_convert("UTC") - pd.Timedelta(1, "us"))
+        for r in group.itertuples(index=False):
+            actual = float(balance.get(r.product_id, 0.0))
+            if abs(actual - float(r.quantity)) > tolerance:
+                bad.append({"product_id": r.product_id, "as_of": as_of, "checkpoint": float(r.quantity),
+                            "ledger": actual})
+    checkpoint_mismatches = pd.DataFrame(bad, columns=["product_id", "as_of", "checkpoint", "ledger"])
+
+    return {
+        "ok": summary_mismatches.empty and checkpoint_mismatches.empty,
+        "archive_rows": len(archived),
+        "movements": len(ledger),
+        "summary_mismatches": summary_mismatches,
+        "checkpoint_mismatches": checkpoint_mismatches,
+        "drift": reconcile(ledger),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compactação do histórico de estoque")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="compacta os movimentos antigos")
+    run.add_argument("--horizon-days", type=int, default=HORIZON_DAYS)
+    run.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    run.add_argument("--dry-run", action="store_true", help="só mostra o que seria compactado")
+    ver = sub.add_parser("verify", help="confere resumos, checkpoints e totais")
+    ver.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        r = compact(args.horizon_days, args.archive_dir, dry_run=args.dry_run)
+        if args.dry_run:
+            print(f"Antes de {r['before']}: {r['archived']} movimentos virariam {r['summaries']} resumos.")
+        elif not r["archived"]:
+            print(f"✅ Nada para compactar antes de {r['before']}.")
+        else:
+            print(f"✅ {r['archived']} movimentos → {r['summaries']} resumos "
+                  f"({len(r['archives'])} arquivo(s) em {args.archive_dir}).")
+        return 0
+
+    r = verify(args.archive_dir)
+    print(f"{r['archive_rows']} movimentos arquivados, {r['movements']} no banco.")
+    if not r["summary_mismatches"].empty:
+        print("❌ Resumos diferentes do arquivo:")
+        print(r["summary_mismatches"].to_string(index=False))
+    if not r["checkpoint_mismatches"].empty:
+        print("❌ Checkpoints diferentes do ledger:")
+        print(r["checkpoint_mismatches"].head(30).to_string(index=False))
+    print(f"{len(r['drift'])} produto(s) com drift inventory x ledger.")
+    print("✅ Compactação consistente." if r["ok"] else "❌ Compactação inconsistente.")
+    return 0 if r["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
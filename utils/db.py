@@ -1,10 +1,96 @@
+import contextvars
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from supabase import create_client
 import streamlit as st
 from dotenv import load_dotenv
+from utils import querylog
 
 load_dotenv()
 
+# ✅ Cache de leitura (compartilhado entre reruns e sessões do mesmo processo)
+CACHE_TTL_SECONDS = float(os.getenv("DB_CACHE_TTL", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("DB_CACHE_MAX_ENTRIES", "256"))
+
+# ✅ PostgREST corta respostas em max-rows (1000 no Supabase): lemos em páginas
+#    ⚠️ PAGE_SIZE não pode passar do max-rows (página cortada parece a última)
+PAGE_SIZE = int(os.getenv("DB_PAGE_SIZE", "1000"))
+
+# ✅ Filtros "in" com muitos ids viram vários requests (a URL tem limite de tamanho)
+IN_CHUNK_SIZE = int(os.getenv("DB_IN_CHUNK_SIZE", "200"))
+
+# ✅ Escritas em lote: linhas por request (evita payloads gigantes)
+BULK_CHUNK_SIZE = int(os.getenv("DB_BULK_CHUNK_SIZE", "500"))
+
+# ✅ Backend do banco: "supabase" (padrão), "memory" (utils.local_backend, sem rede)
+#    ou "sqlite" (utils.sqlite_backend, arquivo local com sync posterior)
+DB_BACKEND = os.getenv("DB_BACKEND", "supabase").strip().lower()
+# ✅ Latência simulada por request (ms), em qualquer backend: mede o app como se fosse pela rede
+DB_LATENCY_MS = float(os.getenv("DB_LATENCY_MS", "0"))
+DB_LATENCY_JITTER_MS = float(os.getenv("DB_LATENCY_JITTER_MS", "0"))
+
+# ✅ Leituras independentes em paralelo (fetch_many): máximo de requests simultâneos
+MAX_PARALLEL_READS = int(os.getenv("DB_MAX_PARALLEL_READS", "8"))
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_generation = {}
+
+# ✅ Cliente alternativo (ex: utils.local_backend.MemoryClient) para rodar offline
+_client_override = None
+_missing_objects = set()
+
+# Erros de "não existe": função/tabela fora do schema cache do PostgREST,
+# ou undefined_table / undefined_function vindos direto do Postgres
+_MISSING_CODES = {"PGRST202", "PGRST205", "42P01", "42883"}
+
+# ✅ Views de migrations/: escrever numa tabela base invalida o cache da view
+VIEW_DEPENDENCIES = {
+    "delivery_report": ("deliveries", "families", "cells", "cell_leaders", "supervisors", "basket_types"),
+    # tabela mantida por triggers (migrations/0006): muda junto com as entregas
+    "delivery_cube": ("deliveries", "families"),
+}
+
+
+class MigrationMissing(Exception):
+    """A função/view de migrations/ ainda não foi instalada no banco."""
+
+
+def _params(**kwargs):
+    """Descrição da chamada para o querylog (só o que foi informado)."""
+    return {k: v for k, v in kwargs.items() if v not in (None, False, {}, [])}
+
+
+def _execute(q, table, op, params=None, sent=None):
+    """Executa a query e, com o querylog ligado, registra tempo/linhas/bytes."""
+    if querylog.current() is None:
+        return q.execute().data
+    started = time.perf_counter()
+    try:
+        data = q.execute().data
+    except Exception as e:
+        querylog.record(table, op, params, elapsed=time.perf_counter() - started, sent=sent, error=repr(e))
+        raise
+    querylog.record(table, op, params, data, time.perf_counter() - started, sent)
+    return data
+
+
+def _run(q, name, op="select", params=None):
+    """Executa a query; converte "objeto não existe" em MigrationMissing."""
+    if name in _missing_objects:
+        raise MigrationMissing(name)
+    try:
+        return _execute(q, name, op, params)
+    except Exception as e:
+        if getattr(e, "code", None) in _MISSING_CODES:
+            _missing_objects.add(name)
+            raise MigrationMissing(name) from e
+        raise
+
+
 @st.cache_resource
 def get_supabase():
     url = os.getenv("SUPABASE_URL")
@@ -17,33 +103,465 @@ def get_supabase():
     return create_client(url, key)
 
 
-def fetch_table(table, filters=None, order=None):
-    supabase = get_supabase()
-    q = supabase.table(table).select("*")
-    if filters:
-        for k, v in filters.items():
-            q = q.eq(k, v)
-    if order:
-        q = q.order(order)
-    return q.execute().data
+def create_backend(backend=None, latency_ms=None, jitter_ms=None):
+    """
+    Cria um cliente do banco (sem cache, serve fora do Streamlit):
+    - backend: "supabase" (SUPABASE_URL / SUPABASE_KEY), "memory"
+      (MemoryClient; DB_MEMORY_DATA aponta um JSON {tabela: [linhas]} inicial)
+      ou "sqlite" (SQLiteClient no arquivo DB_SQLITE_PATH, com journal para sync)
+    - latency_ms / jitter_ms: > 0 embrulha o cliente num LatencyClient
+    Os padrões vêm de DB_BACKEND, DB_LATENCY_MS e DB_LATENCY_JITTER_MS.
+    """
+    from utils.local_backend import LatencyClient, MemoryClient, load_tables
+
+    backend = (backend or DB_BACKEND).strip().lower()
+    latency_ms = DB_LATENCY_MS if latency_ms is None else latency_ms
+    jitter_ms = DB_LATENCY_JITTER_MS if jitter_ms is None else jitter_ms
+
+    if backend == "supabase":
+        url = os.getenv("SUPABASE_URL")
+        key = os.getenv("SUPABASE_KEY")
+        if not url or not key:
+            raise RuntimeError("Configure SUPABASE_URL e SUPABASE_KEY (ou use DB_BACKEND=memory).")
+        client = create_client(url, key)
+    elif backend == "memory":
+        data_path = os.getenv("DB_MEMORY_DATA")
+        client = MemoryClient(load_tables(data_path) if data_path else None)
+    elif backend == "sqlite":
+        from utils.sqlite_backend import SQLiteClient
+        client = SQLiteClient(os.getenv("DB_SQLITE_PATH", "estoque_local.db"))
+    else:
+        raise ValueError(f"DB_BACKEND desconhecido: {backend!r} (use supabase, memory ou sqlite)")
+
+    if latency_ms > 0:
+        client = LatencyClient(client, latency_ms, jitter_ms)
+    return client
+
+
+@st.cache_resource
+def _get_backend():
+    # um cliente por processo: no backend memory os dados sobrevivem aos reruns
+    if DB_BACKEND == "supabase":
+        client = get_supabase()
+        if DB_LATENCY_MS > 0:
+            from utils.local_backend import LatencyClient
+            client = LatencyClient(client, DB_LATENCY_MS, DB_LATENCY_JITTER_MS)
+        return client
+    return create_backend()
+
+
+def use_client(client):
+    """
+    Troca o cliente do banco (None volta para o Supabase).
+    Usado para testes/benchmarks com utils.local_backend.
+    """
+    global _client_override
+    _client_override = client
+    clear_cache()
+
+
+def get_client():
+    if _client_override is not None:
+        return _client_override
+    return _get_backend()
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def _cache_key(table, filters, order, columns=None, limit=None, offset=None, desc=False):
+    return (table, _freeze(filters or {}), order, _freeze(columns), limit, offset, desc)
+
+
+# Filtros: {"coluna": v} é igualdade; {"coluna__op": v} usa outro operador.
+# Ex: {"delivered_at__gte": "2024-01-01", "name__ilike": "%arroz%", "id__in": [...]}
+_FILTER_OPS = {
+    "eq": "eq",
+    "neq": "neq",
+    "gt": "gt",
+    "gte": "gte",
+    "lt": "lt",
+    "lte": "lte",
+    "like": "like",
+    "ilike": "ilike",
+    "in": "in_",
+    "is": "is_",
+}
+
+
+def _apply_filters(q, filters):
+    for k, v in (filters or {}).items():
+        column, _, op = k.partition("__")
+        method = _FILTER_OPS.get(op or "eq")
+        if method is None:
+            raise ValueError(f"Filtro desconhecido: {k}")
+        q = getattr(q, method)(column, v)
+    return q
+
+
+def _cache_get(key):
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at < time.monotonic():
+            del _cache[key]
+            return None
+        _cache.move_to_end(key)
+        return data
+
+
+def _cache_put(key, data, generation):
+    if CACHE_TTL_SECONDS <= 0 or CACHE_MAX_ENTRIES <= 0:
+        return
+    with _cache_lock:
+        # ✅ houve escrita na tabela durante a leitura: não guarda dado velho
+        if _generation.get(key[0], 0) != generation:
+            return
+        _cache[key] = (time.monotonic() + CACHE_TTL_SECONDS, data)
+        _cache.move_to_end(key)
+        # ✅ cache cheio: descarta as entradas usadas há mais tempo
+        while len(_cache) > CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+
+def invalidate_table(table):
+    """
+    Remove do cache todas as leituras da tabela (qualquer filtro/ordem).
+    Chamado automaticamente por insert_row / update_row / delete_row.
+    """
+    names = {table} | {v for v, deps in VIEW_DEPENDENCIES.items() if table in deps}
+    with _cache_lock:
+        for name in names:
+            _generation[name] = _generation.get(name, 0) + 1
+        for key in [k for k in _cache if k[0] in names]:
+            del _cache[key]
+
+
+def table_version(*tables):
+    """
+    Contador de escritas feitas por este processo em cada tabela (muda a cada
+    invalidate_table). Serve de chave para caches montados em cima das leituras.
+    """
+    with _cache_lock:
+        return tuple(_generation.get(t, 0) for t in tables)
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+        _missing_objects.clear()
+
+
+def fetch_table(table, filters=None, order=None, columns=None, limit=None, offset=None, desc=False,
+                use_cache=True):
+    """
+    Lê uma tabela com cache read-through.
+    - filters: {"coluna": valor} ou {"coluna__gte": valor} (ver _FILTER_OPS)
+    - columns: lista de colunas (padrão: todas)
+    - order / desc / limit / offset: ordenação e paginação feitas no banco
+    - use_cache=False força ida ao banco (ex: leitura antes de escrita)
+    Retorna sempre cópias dos registros, então o chamador pode alterá-los.
+    """
+    key = _cache_key(table, filters, order, columns, limit, offset, desc)
+
+    data = _cache_get(key) if use_cache else None
+    if data is None:
+        generation = _generation.get(table, 0)
+        data = _select(table, filters, order, columns, limit, offset, desc)
+        _cache_put(key, data, generation)
+    else:
+        querylog.record(table, "select", _params(filters=filters, order=order, columns=columns, limit=limit,
+                                                 offset=offset, desc=desc), data, cached=True)
+
+    return [dict(r) for r in data]
+
+
+def fetch_many(reads):
+    """
+    Faz várias leituras independentes ao mesmo tempo (uma thread por request),
+    então a página espera ~1 ida ao banco em vez da soma de todas.
+    - reads: {nome: "tabela"} ou {nome: ("tabela", {kwargs do fetch_table})}
+    Retorna {nome: linhas}, igual a chamar fetch_table para cada item.
+
+    Ex: fetch_many({
+            "baskets": ("basket_types", {"order": "name", "columns": ["id", "name"]}),
+            "products": "products",
+        })
+    """
+    calls = {}
+    for name, spec in reads.items():
+        table, kwargs = (spec, {}) if isinstance(spec, str) else spec
+        calls[name] = (table, dict(kwargs))
+
+    results = {}
+    misses = {}
+    for name, (table, kwargs) in calls.items():
+        use_cache = kwargs.pop("use_cache", True)
+        key = _cache_key(table, kwargs.get("filters"), kwargs.get("order"), kwargs.get("columns"),
+                         kwargs.get("limit"), kwargs.get("offset"), kwargs.get("desc", False))
+        data = _cache_get(key) if use_cache else None
+        if data is not None:
+            querylog.record(table, "select", _params(**kwargs), data, cached=True)
+            results[name] = data
+        else:
+            # leituras iguais no mesmo lote vão ao banco uma vez só
+            misses.setdefault(key, []).append(name)
+
+    if misses:
+        # ✅ cliente e gerações resolvidos aqui: as threads não tocam no contexto do Streamlit
+        client = get_client()
+        generations = {key: _generation.get(key[0], 0) for key in misses}
+
+        def run(key):
+            table, kwargs = calls[misses[key][0]]
+            return _select(table, kwargs.get("filters"), kwargs.get("order"), kwargs.get("columns"),
+                           kwargs.get("limit"), kwargs.get("offset"), kwargs.get("desc", False), client=client)
+
+        workers = max(1, min(MAX_PARALLEL_READS, len(misses)))
+        if workers == 1:
+            fetched = {key: run(key) for key in misses}
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                # cada thread leva uma cópia do contexto (querylog do rerun)
+                futures = {key: pool.submit(contextvars.copy_context().run, run, key) for key in misses}
+                fetched = {key: f.result() for key, f in futures.items()}
+            querylog.refresh()
+
+        for key, names in misses.items():
+            _cache_put(key, fetched[key], generations[key])
+            for name in names:
+                results[name] = fetched[key]
+
+    return {name: [dict(r) for r in results[name]] for name in reads}
+
+
+def _select(table, filters, order, columns, limit, offset, desc, client=None):
+    """
+    Executa o SELECT. Sem limit, lê página a página (PAGE_SIZE) até acabar,
+    para nunca devolver dado truncado pelo max-rows do PostgREST.
+    """
+    supabase = client or get_client()
+    start = offset or 0
+    wanted = limit
+    out = []
+    while True:
+        page = PAGE_SIZE if wanted is None else min(PAGE_SIZE, wanted - len(out))
+        q = supabase.table(table).select(",".join(columns) if columns else "*")
+        q = _apply_filters(q, filters)
+        if order:
+            q = q.order(order, desc=desc)
+        if (wanted is None or wanted > PAGE_SIZE) and order != "id":
+            # ordem total garante páginas estáveis
+            q = q.order("id")
+        q = q.limit(page)
+        if start:
+            q = q.offset(start)
+        data = _run(q, table, params=_params(filters=filters, order=order, columns=columns, limit=page,
+                                             offset=start, desc=desc))
+        out.extend(data)
+        start += len(data)
+        if len(data) < page or (wanted is not None and len(out) >= wanted):
+            return out
+
+
+def fetch_by_ids(table, ids, columns=None, id_column="id"):
+    """
+    Busca as linhas cujo id_column está em ids, em blocos de IN_CHUNK_SIZE.
+    Útil para trazer só as linhas de dimensão referenciadas por outra consulta.
+    """
+    ids = sorted({i for i in ids if i is not None})
+    out = []
+    for chunk in _chunks(ids, IN_CHUNK_SIZE):
+        out.extend(fetch_table(table, {f"{id_column}__in": chunk}, columns=columns))
+    return out
+
+
+def _pgrst_value(value):
+    """Valor entre aspas para filtros lógicos do PostgREST (or=(...))."""
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _iter_pages(table, filters=None, columns=None, key="id", page_size=None):
+    # ⚠️ nunca pedir mais que page_size: acima do max-rows a página volta cortada
+    page_size = page_size or PAGE_SIZE
+    if columns:
+        columns = list(columns) + [c for c in (key, "id") if c not in columns]
+    supabase = get_client()
+    last = None
+    while True:
+        q = supabase.table(table).select(",".join(columns) if columns else "*")
+        q = _apply_filters(q, filters)
+        if key == "id":
+            if last is not None:
+                q = q.gt("id", last[1])
+            q = q.order("id")
+        else:
+            # keyset pela tupla (key, id): empates no key continuam pelo id
+            if last is not None:
+                k, i = _pgrst_value(last[0]), _pgrst_value(last[1])
+                q = q.or_(f"{key}.gt.{k},and({key}.eq.{k},id.gt.{i})")
+            q = q.order(key).order("id")
+        data = _run(q.limit(page_size), table,
+                    params=_params(filters=filters, columns=columns, key=key, after=last))
+        if data:
+            yield data
+        if len(data) < page_size:
+            return
+        last = (data[-1][key], data[-1]["id"])
+
+
+def iter_table(table, filters=None, columns=None, key="id", page_size=None):
+    """
+    Percorre uma tabela grande em páginas por keyset na tupla (key, id)
+    (WHERE (key, id) > última ORDER BY key, id), sem OFFSET e sem cache:
+    a memória fica limitada a uma página.
+    - key: coluna de ordenação (id, created_at, delivered_at...), sem nulls
+    - filters/columns: iguais ao fetch_table
+    Gera um dict por linha.
+    """
+    for page in _iter_pages(table, filters, columns, key, page_size):
+        yield from page
+
+
+def iter_table_frames(table, filters=None, columns=None, key="id", page_size=None):
+    """Igual ao iter_table, mas gera um DataFrame por página."""
+    import pandas as pd
+
+    for page in _iter_pages(table, filters, columns, key, page_size):
+        yield pd.DataFrame(page)
 
 
 def insert_row(table, data):
-    supabase = get_supabase()
-    return supabase.table(table).insert(data).execute().data
+    supabase = get_client()
+    try:
+        return _execute(supabase.table(table).insert(data), table, "insert", sent=data)
+    finally:
+        invalidate_table(table)
 
 
 def update_row(table, match, data):
-    supabase = get_supabase()
-    q = supabase.table(table).update(data)
-    for k, v in match.items():
-        q = q.eq(k, v)
-    return q.execute().data
+    supabase = get_client()
+    q = _apply_filters(supabase.table(table).update(data), match)
+    try:
+        return _execute(q, table, "update", _params(filters=match), sent=data)
+    finally:
+        invalidate_table(table)
 
 
 def delete_row(table, match):
-    supabase = get_supabase()
-    q = supabase.table(table).delete()
-    for k, v in match.items():
-        q = q.eq(k, v)
-    return q.execute().data
+    supabase = get_client()
+    q = _apply_filters(supabase.table(table).delete(), match)
+    try:
+        return _execute(q, table, "delete", _params(filters=match))
+    finally:
+        invalidate_table(table)
+
+
+def _chunks(items, size):
+    size = max(1, int(size or BULK_CHUNK_SIZE))
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def insert_rows(table, rows, chunk_size=None):
+    """
+    Insere várias linhas com 1 request por bloco (chunk_size, padrão DB_BULK_CHUNK_SIZE).
+    Retorna as linhas inseridas.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+
+    supabase = get_client()
+    out = []
+    try:
+        for chunk in _chunks(rows, chunk_size):
+            out.extend(_execute(supabase.table(table).insert(chunk), table, "insert", sent=chunk))
+    finally:
+        invalidate_table(table)
+    return out
+
+
+def upsert_rows(table, rows, on_conflict="id", chunk_size=None):
+    """
+    INSERT ... ON CONFLICT (on_conflict) DO UPDATE, em blocos.
+    Mande as linhas completas: colunas ausentes viram null em linhas novas.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+
+    supabase = get_client()
+    out = []
+    try:
+        for chunk in _chunks(rows, chunk_size):
+            q = supabase.table(table).upsert(chunk, on_conflict=on_conflict)
+            out.extend(_execute(q, table, "upsert", _params(on_conflict=on_conflict), sent=chunk))
+    finally:
+        invalidate_table(table)
+    return out
+
+
+def update_rows_by_id(table, rows, id_column="id", chunk_size=None):
+    """
+    Atualiza várias linhas: rows = [{"id": ..., "coluna": valor, ...}].
+    Linhas com os MESMOS valores vão num único UPDATE ... WHERE id IN (...);
+    valores diferentes custam 1 request cada (para isso prefira upsert_rows).
+    """
+    groups = {}
+    for r in rows:
+        values = {k: v for k, v in r.items() if k != id_column}
+        groups.setdefault(_freeze(values), (values, []))[1].append(r[id_column])
+
+    if not groups:
+        return []
+
+    supabase = get_client()
+    out = []
+    try:
+        for values, ids in groups.values():
+            for chunk in _chunks(ids, chunk_size):
+                q = supabase.table(table).update(values).in_(id_column, chunk)
+                out.extend(_execute(q, table, "update", _params(filters={f"{id_column}__in": chunk}), sent=values))
+    finally:
+        invalidate_table(table)
+    return out
+
+
+def delete_rows(table, ids, id_column="id", chunk_size=None):
+    """Apaga várias linhas pelo id: 1 DELETE ... WHERE id IN (...) por bloco."""
+    ids = list(ids)
+    if not ids:
+        return []
+
+    supabase = get_client()
+    out = []
+    try:
+        for chunk in _chunks(ids, chunk_size):
+            q = supabase.table(table).delete().in_(id_column, chunk)
+            out.extend(_execute(q, table, "delete", _params(filters={f"{id_column}__in": chunk})))
+    finally:
+        invalidate_table(table)
+    return out
+
+
+def call_rpc(fn, params=None, touches=(), client=None):
+    """
+    Chama uma função SQL (migrations/) via Supabase RPC.
+    - touches: tabelas que a função escreve (invalida o cache delas)
+    - client: cliente já resolvido (threads fora do contexto do Streamlit)
+    - levanta MigrationMissing se a função não existir no banco
+    """
+    supabase = client or get_client()
+    try:
+        return _run(supabase.rpc(fn, params or {}), fn, op="rpc", params=params)
+    finally:
+        for table in touches:
+            invalidate_table(table)
@@ -0,0 +1,432 @@
+"""
+Cache local (Arrow IPC) das entregas usadas nos Relatórios.
+
+Entregas antigas quase nunca mudam: em vez de baixar o período inteiro a
+cada visita, o app guarda uma cópia colunar das entregas e só busca o que
+mudou desde o último sync:
+1. novas: created_at ou delivered_at depois da marca d'água (menos
+   SYNC_MARGIN, por transações que ainda estavam abertas)
+2. editadas/apagadas: delivery_checksums (migrations/0007) devolve por mês
+   nº de entregas, cestas e a soma de um hash de cada linha; o arquivo guarda
+   os mesmos totais nos metadados. Mês diferente -> compara por dia -> só os
+   dias diferentes são relidos inteiros.
+   ⚠️ Só os meses a partir de DELIVERY_CACHE_CHECK_DAYS atrás são conferidos
+   a cada sync (o banco soma só essa janela, pelo índice de delivered_at); o
+   histórico inteiro é conferido a cada DELIVERY_CACHE_FULL_HOURS.
+   Sem a migration 0007: cópia completa a cada DELIVERY_CACHE_FULL_HOURS.
+
+Um arquivo por mês de delivered_at (entregas/AAAA-MM.arrow), ordenado e sem
+compressão: o sync só lê e regrava os meses que mudaram, e a leitura abre
+com memory map só os meses do período pedido.
+Nomes (família, célula, líder...) não ficam no arquivo: o join é feito na
+leitura (utils.reports), então editar um cadastro não deixa o cache velho.
+
+Variáveis de ambiente:
+- DELIVERY_CACHE=1                 liga o cache nos Relatórios (padrão: desligado)
+- DELIVERY_CACHE_DIR=pasta         padrão cache
+- DELIVERY_CACHE_SYNC_SECONDS=60   intervalo mínimo entre syncs (padrão: DB_CACHE_TTL)
+- DELIVERY_CACHE_CHECK_DAYS=60     janela conferida por checksum a cada sync
+- DELIVERY_CACHE_FULL_HOURS=24     conferência do histórico inteiro (sem a 0007: cópia completa)
+
+Uso:
+    python -m utils.delivery_cache status
+    python -m utils.delivery_cache sync [--full]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from utils.db import (call_rpc, iter_table_frames, table_version, MigrationMissing, CACHE_TTL_SECONDS,
+                      DB_BACKEND)
+from utils.local_backend import row_checksum
+
+ENABLED = os.getenv("DELIVERY_CACHE", "").lower() in ("1", "true", "yes", "on")
+CACHE_DIR = os.getenv("DELIVERY_CACHE_DIR", "cache")
+SYNC_SECONDS = float(os.getenv("DELIVERY_CACHE_SYNC_SECONDS", str(CACHE_TTL_SECONDS)))
+FULL_SYNC_HOURS = float(os.getenv("DELIVERY_CACHE_FULL_HOURS", "24"))
+CHECK_DAYS = int(os.getenv("DELIVERY_CACHE_CHECK_DAYS", "60"))
+
+# created_at = início da transação: uma entrega gravada agora pode ter created_at
+# um pouco antes da última marca d'água
+SYNC_MARGIN = timedelta(minutes=5)
+
+FETCH_COLUMNS = ["id", "delivered_at", "created_at", "family_id", "leader_id", "basket_type_id", "quantity"]
+CACHE_COLUMNS = [*FETCH_COLUMNS, "checksum"]
+
+_TS = pa.timestamp("us", tz="UTC")
+SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("delivered_at", _TS),
+    ("created_at", _TS),
+    ("family_id", pa.string()),
+    ("leader_id", pa.string()),
+    ("basket_type_id", pa.string()),
+    ("quantity", pa.int64()),
+    ("checksum", pa.int32()),
+])
+
+
+def _source():
+    """De onde vêm as entregas: trocar de banco invalida o arquivo."""
+    where = {
+        "supabase": os.getenv("SUPABASE_URL", ""),
+        "sqlite": os.getenv("DB_SQLITE_PATH", "estoque_local.db"),
+        "memory": os.getenv("DB_MEMORY_DATA", ""),
+    }.get(DB_BACKEND, "")
+    return f"{DB_BACKEND}:{where}"
+
+
+def _iso(ts):
+    return ts.isoformat() if ts is not None and not pd.isna(ts) else None
+
+
+def normalize(df):
+    """Linhas de deliveries (dicts ou DataFrame) -> DataFrame no formato do arquivo (com checksum)."""
+    df = pd.DataFrame(df).reindex(columns=FETCH_COLUMNS)
+    df["delivered_at"] = pd.to_datetime(df["delivered_at"], utc=True, format="ISO8601").dt.as_unit("us")
+    df["created_at"] = (pd.to_datetime(df["created_at"], utc=True, format="ISO8601").dt.as_unit("us")
+                        .fillna(df["delivered_at"]))
+    df["quantity"] = df["quantity"].astype(np.int64)
+    for col in ("id", "family_id", "leader_id", "basket_type_id"):
+        df[col] = df[col].astype(object).where(df[col].notna(), None)
+    df["checksum"] = np.array(
+        [row_checksum(*r) for r in df[["id", "family_id", "leader_id", "basket_type_id", "quantity"]]
+         .itertuples(index=False, name=None)],
+        dtype=np.int32
+    )
+    return df
+
+
+def _fetch(filters=None, key="id"):
+    frames = [normalize(page) for page in iter_table_frames("deliveries", filters, columns=FETCH_COLUMNS, key=key)]
+    return pd.concat(frames, ignore_index=True) if frames else normalize([])
+
+
+def _totals(df, unit):
+    """Nº de entregas, cestas e soma dos checksums por mês/dia (UTC), como delivery_checksums."""
+    days = df["delivered_at"].dt.tz_convert(None).to_numpy().astype("datetime64[D]")
+    period = days.astype("datetime64[M]").astype("datetime64[D]") if unit == "month" else days
+    out = pd.DataFrame({
+        "period": period,
+        "deliveries": 1,
+        "baskets": df["quantity"].to_numpy(),
+        "checksum": df["checksum"].to_numpy(dtype=np.int64),
+    })
+    return out.groupby("period")[["deliveries", "baskets", "checksum"]].sum()
+
+
+def _server_totals(unit, start=None, end=None):
+    params = {"p_unit": unit}
+    if start is not None:
+        params["p_start"] = f"{start}T00:00:00+00:00"
+    if end is not None:
+        params["p_end"] = f"{end}T00:00:00+00:00"
+    rows = call_rpc("delivery_checksums", params) or []
+    out = pd.DataFrame(rows, columns=["period", "deliveries", "baskets", "checksum"])
+    out["period"] = pd.to_datetime(out["period"]).to_numpy().astype("datetime64[D]")
+    return out.set_index("period")[["deliveries", "baskets", "checksum"]].astype(np.int64)
+
+
+def _month_totals(months, since=None):
+    """Totais por mês guardados nos metadados (a partir do mês since, "AAAA-MM"), no formato de _totals."""
+    keys = sorted(k for k in months if since is None or k >= since)
+    out = pd.DataFrame([months[k] for k in keys], columns=["deliveries", "baskets", "checksum"])
+    out["period"] = pd.to_datetime([f"{k}-01" for k in keys]).to_numpy().astype("datetime64[D]")
+    return out.set_index("period")[["deliveries", "baskets", "checksum"]].astype(np.int64)
+
+
+def _month_of(df):
+    """Mês (AAAA-MM, UTC) de cada entrega."""
+    return df["delivered_at"].dt.strftime("%Y-%m")
+
+
+def _month_summary(df):
+    """Totais de um mês como ficam nos metadados (mesma conta de delivery_checksums)."""
+    return {"deliveries": len(df), "baskets": int(df["quantity"].sum()),
+            "checksum": int(df["checksum"].astype(np.int64).sum())}
+
+
+def _same_rows(local, new):
+    """As linhas de new já estão no arquivo, iguais (mesmo checksum e datas)?"""
+    old = local.set_index("id").reindex(new["id"])
+    return all(np.array_equal(old[col].to_numpy(), new[col].to_numpy())
+               for col in ("checksum", "delivered_at", "created_at"))
+
+
+def _different(local, server):
+    """Períodos em que o arquivo e o banco não batem."""
+    cmp = local.join(server, how="outer", lsuffix="_local", rsuffix="_banco").fillna(0)
+    bad = np.zeros(len(cmp), dtype=bool)
+    for col in ("deliveries", "baskets", "checksum"):
+        bad |= (cmp[f"{col}_local"] != cmp[f"{col}_banco"]).to_numpy()
+    return list(cmp.index[bad])
+
+
+class DeliveryCache:
+    """
+    Arquivos locais das entregas (entregas/AAAA-MM.arrow, um por mês) +
+    metadados (entregas.json: totais de cada mês, marcas d'água, origem,
+    horário dos syncs).
+    """
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory or CACHE_DIR)
+        self.months_dir = self.directory / "entregas"
+        self.meta_path = self.directory / "entregas.json"
+
+    def exists(self):
+        # ⚠️ sem "months": formato antigo (um arquivo só) -> o sync faz a cópia completa
+        return "months" in self.meta()
+
+    def meta(self):
+        if not self.meta_path.exists():
+            return {}
+        return json.loads(self.meta_path.read_text(encoding="utf-8"))
+
+    def month_path(self, month):
+        return self.months_dir / f"{month}.arrow"
+
+    def size(self):
+        """Bytes em disco de todos os meses."""
+        return sum(p.stat().st_size for p in self.months_dir.glob("*.arrow"))
+
+    def _open(self, months):
+        # ✅ memory map: o SO só lê do disco as páginas das colunas/linhas usadas
+        tables = []
+        for month in sorted(months):
+            path = self.month_path(month)
+            if path.exists():
+                with pa.memory_map(str(path), "r") as source:
+                    tables.append(pa.ipc.open_file(source).read_all())
+        return pa.concat_tables(tables) if tables else SCHEMA.empty_table()
+
+    def table(self):
+        """Todos os meses como uma pyarrow.Table (ordenada por delivered_at), sem copiar (memory map)."""
+        return self._open(self.meta().get("months", {}))
+
+    def read_months(self, months):
+        """Entregas dos meses pedidos ("AAAA-MM") como DataFrame."""
+        if not months:
+            return normalize([])
+        return self._open(months).to_pandas()
+
+    def read_all(self):
+        return self.read_months(list(self.meta().get("months", {})))
+
+    def read_period(self, start, end):
+        """Entregas com delivered_at no período (datas inclusive, UTC), só dos meses que o cobrem."""
+        first_month, last_month = start.strftime("%Y-%m"), end.strftime("%Y-%m")
+        table = self._open([m for m in self.meta().get("months", {}) if first_month <= m <= last_month])
+        at = table.column("delivered_at").to_numpy()
+        lo = np.datetime64(f"{start.isoformat()}T00:00:00", "us")
+        hi = np.datetime64(f"{(end + timedelta(days=1)).isoformat()}T00:00:00", "us")
+        first, last = np.searchsorted(at, lo, side="left"), np.searchsorted(at, hi, side="left")
+        return table.slice(first, last - first).to_pandas()
+
+    def write(self, df, **meta):
+        """Grava todos os meses de df e apaga os que não estão nele (cópia completa)."""
+        frames = dict(tuple(df.groupby(_month_of(df), sort=False)))
+        drop = {p.stem for p in self.months_dir.glob("*.arrow")} - set(frames)
+        legacy = self.directory / "entregas.arrow"
+        if legacy.exists():
+            legacy.unlink()
+        self.write_months({**frames, **{m: normalize([]) for m in drop}}, replace=True, **meta)
+
+    def write_months(self, frames, replace=False, **meta):
+        """
+        Grava só os meses de frames ({"AAAA-MM": DataFrame com o mês inteiro};
+        vazio apaga o mês) e atualiza os totais e marcas d'água nos metadados.
+        replace: esquece os totais e marcas d'água anteriores (cópia completa).
+        """
+        self.months_dir.mkdir(parents=True, exist_ok=True)
+        old = {} if replace else self.meta()
+        months = dict(old.get("months", {}))
+        marks = {col: [old[col]] if old.get(col) else [] for col in ("created_at", "delivered_at")}
+        for month, df in frames.items():
+            path = self.month_path(month)
+            if df.empty:
+                months.pop(month, None)
+                if path.exists():
+                    path.unlink()
+                continue
+            df = df.sort_values(["delivered_at", "id"], kind="stable").reset_index(drop=True)
+            table = pa.Table.from_pandas(df[CACHE_COLUMNS], schema=SCHEMA, preserve_index=False).combine_chunks()
+            tmp = path.with_suffix(".arrow.tmp")
+            with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, SCHEMA) as writer:
+                writer.write_table(table)
+            os.replace(tmp, path)
+            months[month] = _month_summary(df)
+            for col in marks:
+                marks[col].append(_iso(df[col].max()))
+
+        meta = {
+            **self.meta(),
+            **meta,
+            "rows": sum(m["deliveries"] for m in months.values()),
+            "months": dict(sorted(months.items())),
+            # ⚠️ marca d'água só sobe: apagar a última entrega não faz buscar de novo o que já está no arquivo
+            **{col: max(values, key=pd.Timestamp) if values else None for col, values in marks.items()},
+        }
+        tmp = self.meta_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        os.replace(tmp, self.meta_path)
+
+
+def sync(cache=None, full=False, log=None):
+    """
+    Atualiza o arquivo local a partir do banco (ver docstring do módulo).
+    Retorna {"full", "new", "days", "rows", "checked"}:
+    - new: linhas novas/alteradas vindas pela marca d'água
+    - days: dias relidos porque o checksum não bateu
+    - checked: False se o banco não tem delivery_checksums (migration 0007)
+    """
+    cache = cache or DeliveryCache()
+    log = log or (lambda msg: None)
+    meta = cache.meta()
+    now = datetime.now(timezone.utc)
+
+    def _older(key):
+        return meta.get(key) is None or now - datetime.fromisoformat(meta[key]) > timedelta(hours=FULL_SYNC_HOURS)
+
+    if full or not cache.exists() or meta.get("source") != _source() or (_older("full_at") and not meta.get("checked")):
+        df = _fetch()
+        cache.write(df, source=_source(), full_at=now.isoformat(), synced_at=now.isoformat(),
+                    checked_at=now.isoformat(), checked=meta.get("checked", False))
+        log(f"← cópia completa: {len(df)} entregas")
+        return {"full": True, "new": len(df), "days": 0, "rows": len(df), "checked": meta.get("checked", False)}
+
+    # ✅ só os meses tocados são lidos do disco (e regravados)
+    loaded, changed = {}, set()
+
+    def month_rows(month):
+        if month not in loaded:
+            loaded[month] = cache.read_months([month] if month in meta["months"] else [])
+        return loaded[month]
+
+    # ======= 1) NOVAS (marca d'água) =======
+    new = []
+    for column in ("created_at", "delivered_at"):
+        if meta.get(column):
+            since = datetime.fromisoformat(meta[column]) - SYNC_MARGIN
+            new.append(_fetch({f"{column}__gt": since.isoformat()}, key=column))
+    new = pd.concat(new, ignore_index=True).drop_duplicates("id") if new else normalize([])
+    for month, rows in new.groupby(_month_of(new), sort=False):
+        local = month_rows(month)
+        # ⚠️ a margem sempre traz de volta as últimas entregas: só regrava se algo mudou
+        if not _same_rows(local, rows):
+            loaded[month] = pd.concat([local[~local["id"].isin(rows["id"])], rows], ignore_index=True)
+            changed.add(month)
+
+    # ======= 2) EDITADAS / APAGADAS (checksums por mês -> por dia) =======
+    # janela recente a cada sync; o histórico inteiro a cada FULL_SYNC_HOURS
+    since = None if _older("checked_at") else (now - timedelta(days=CHECK_DAYS)).strftime("%Y-%m")
+    months = {**meta["months"], **{m: _month_summary(loaded[m]) for m in changed}}
+    days = []
+    try:
+        server = _server_totals("month", f"{since}-01" if since else None)
+        for month in _different(_month_totals(months, since), server):
+            month = pd.Timestamp(month).date()
+            next_month = (month + timedelta(days=32)).replace(day=1)
+            key = month.strftime("%Y-%m")
+            in_month = month_rows(key)
+            bad = [pd.Timestamp(d).date() for d in
+                   _different(_totals(in_month, "day"), _server_totals("day", month, next_month))]
+            if bad:
+                day_of = in_month["delivered_at"].dt.tz_convert(None).dt.date
+                refetched = [_fetch({"delivered_at__gte": f"{d}T00:00:00+00:00",
+                                     "delivered_at__lt": f"{d + timedelta(days=1)}T00:00:00+00:00"},
+                                    key="delivered_at") for d in bad]
+                loaded[key] = (pd.concat([in_month[~day_of.isin(bad)], *refetched], ignore_index=True)
+                               .drop_duplicates("id", keep="last"))
+                changed.add(key)
+                days.extend(bad)
+        checked = True
+    except MigrationMissing:
+        checked = False
+
+    extra = {"checked_at": now.isoformat()} if checked and since is None else {}
+    if changed or extra or checked != meta.get("checked"):
+        cache.write_months({m: loaded[m] for m in changed}, synced_at=now.isoformat(), checked=checked, **extra)
+    rows = cache.meta()["rows"] if changed else meta.get("rows", 0)
+    log(f"← {len(new)} entrega(s) pela marca d'água, {len(days)} dia(s) relido(s)"
+        f"{'' if since else ' (histórico inteiro conferido)'}")
+    return {"full": False, "new": len(new), "days": len(days), "rows": rows, "checked": checked}
+
+
+_sync_lock = threading.Lock()
+_last_sync = {}
+
+
+def throttled(key, tables, run, force=False):
+    """
+    Roda run() se passou SYNC_SECONDS desde a última vez (por key), se
+    este processo gravou em tables desde então ou se force. Retorna True se rodou.
+    """
+    with _sync_lock:
+        version = table_version(*tables)
+        last = _last_sync.get(key)
+        fresh = last is not None and last[0] == version and time.monotonic() - last[1] <= SYNC_SECONDS
+        if fresh and not force:
+            return False
+        run()
+        _last_sync[key] = (version, time.monotonic())
+        return True
+
+
+def ensure_synced(cache=None):
+    """Sincroniza o arquivo se estiver na hora (ver throttled). Retorna o cache."""
+    cache = cache or DeliveryCache()
+    throttled(cache.directory, ("deliveries",), lambda: sync(cache))
+    return cache
+
+
+def load_deliveries(start, end, cache=None):
+    """
+    Entregas do período (datas inclusive, UTC) do arquivo local, com
+    FETCH_COLUMNS. Sincroniza antes se passou SYNC_SECONDS ou se este
+    processo gravou entregas desde o último sync.
+    """
+    cache = ensure_synced(cache)
+    df = cache.read_period(start, end)[FETCH_COLUMNS]
+    df["delivered_at"] = df["delivered_at"].dt.as_unit("ns")
+    return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cache local das entregas (Relatórios)")
+    parser.add_argument("command", choices=["status", "sync"])
+    parser.add_argument("--dir", default=CACHE_DIR)
+    parser.add_argument("--full", action="store_true", help="copia tudo de novo")
+    args = parser.parse_args(argv)
+
+    cache = DeliveryCache(args.dir)
+    if args.command == "sync":
+        r = sync(cache, full=args.full, log=print)
+        if not r["checked"]:
+            print("⚠️ Migration 0007_delivery_checksums não aplicada: edições só aparecem na cópia completa.")
+        print(f"✅ {r['rows']} entregas no cache.")
+        return 0
+
+    meta = cache.meta()
+    if not cache.exists():
+        print(f"Sem cache em {cache.directory}.")
+        return 0
+    size = cache.size() / 2**20
+    print(f"{meta.get('rows')} entregas em {len(meta['months'])} mês(es) ({size:.1f} MiB) em {cache.months_dir}")
+    print(f"origem {meta.get('source')} · último sync {meta.get('synced_at')} · cópia completa {meta.get('full_at')}")
+    print(f"marcas d'água: created_at {meta.get('created_at')} · delivered_at {meta.get('delivered_at')}")
+    print(f"histórico inteiro conferido em {meta.get('checked_at')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
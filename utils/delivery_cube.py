@@ -0,0 +1,260 @@
+"""
+Cubo de entregas: totais pré-agregados para o Resumo e os gráficos dos Relatórios.
+
+A tabela delivery_cube (migrations/0006) guarda, por dia (UTC) x célula x
+líder x tipo de cesta, o nº de entregas e de cestas. Ela é mantida por
+triggers na mesma transação da entrega, então está sempre em dia.
+- o supervisor não fica no cubo: é o da célula, senão o do líder (mesma regra
+  da view delivery_report), resolvido aqui nas dimensões
+- famílias atendidas não somam entre linhas do cubo: vêm da RPC
+  delivery_family_count (1 número calculado no banco)
+- as entregas linha a linha (load_report_index) só são lidas no detalhe
+
+Sem a migration, o cubo é montado a partir das entregas do período.
+
+Uso:
+    python -m utils.delivery_cube verify    # cubo = agregado das entregas?
+    python -m utils.delivery_cube rebuild   # refaz o cubo no banco
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from utils.db import call_rpc, iter_table_frames, MigrationMissing
+from utils.reports import (FILTER_COLUMNS, compact_report, load_report_index, period_cache,
+                           _dim, _positions, _take, _follow, _period, _ids)
+
+# célula/líder/cesta ausente (a chave única do cubo não aceita null)
+NO_ID = "00000000-0000-0000-0000-000000000000"
+
+CUBE_COLUMNS = ["id", "day", "cell_id", "leader_id", "basket_type_id", "deliveries", "baskets"]
+KEY_COLUMNS = ["day", "cell_id", "leader_id", "basket_type_id"]
+
+# colunas de texto do cubo rotulado (mesmos nomes do relatório)
+LABEL_COLUMNS = ["Célula", "Rede da Célula", "Supervisor", "Líder", "Cesta"]
+SUMMARY_COLUMNS = ["Dia", *LABEL_COLUMNS, "Entregas", "Cestas"]
+
+# agrupamentos dos gráficos: rótulo na tela -> coluna
+ROLLUPS = {
+    "Dia": "Dia",
+    "Célula": "Célula",
+    "Supervisor": "Supervisor",
+    "Líder": "Líder",
+    "Cesta": "Cesta",
+}
+
+
+def label_cube(rows, dims):
+    """
+    Linhas do cubo (ids) -> nomes das dimensões, vetorizado como o join do
+    relatório. Id que não existe mais (ou NO_ID) vira "-".
+    Retorna DataFrame com SUMMARY_COLUMNS (nomes como category).
+    """
+    cube = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows, columns=CUBE_COLUMNS)
+    if cube.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+
+    cells = _dim(dims["cells"], ["cell_name", "network_name", "supervisor_id"])
+    leaders = _dim(dims["leaders"], ["name", "supervisor_id"])
+    baskets = _dim(dims["baskets"], ["name"])
+    supers = _dim(dims["supers"], ["name"])
+
+    c = _positions(cells, cube["cell_id"])
+    l = _positions(leaders, cube["leader_id"])
+    b = _positions(baskets, cube["basket_type_id"])
+
+    # ======= SUPERVISOR (fallback: célula -> líder) =======
+    by_cell = _follow(_positions(supers, cells["supervisor_id"]), c)
+    by_leader = _follow(_positions(supers, leaders["supervisor_id"]), l)
+    sup = np.where(by_cell >= 0, by_cell, by_leader)
+
+    return compact_report(pd.DataFrame({
+        "Dia": pd.to_datetime(cube["day"]).to_numpy(),
+        "Célula": _take(cells["cell_name"], c),
+        "Rede da Célula": _take(cells["network_name"], c),
+        "Supervisor": _take(supers["name"], sup),
+        "Líder": _take(leaders["name"], l),
+        "Cesta": _take(baskets["name"], b),
+        "Entregas": cube["deliveries"].to_numpy(dtype=np.int64),
+        "Cestas": cube["baskets"].to_numpy(dtype=np.int64),
+    }, columns=SUMMARY_COLUMNS))
+
+
+def _cube_from_report(start, end, dims):
+    """Sem a migration: o mesmo cubo, agregado das entregas do período."""
+    df = load_report_index(start, end, dims).df
+    if df.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    grouped = df.assign(Dia=df["Data"].dt.normalize()).groupby(["Dia", *LABEL_COLUMNS], observed=True, sort=False)
+    cube = grouped["Quantidade"].agg(Entregas="size", Cestas="sum").reset_index()
+    return cube.astype({"Entregas": np.int64, "Cestas": np.int64})
+
+
+def _read_cube(start, end):
+    frames = list(iter_table_frames(
+        "delivery_cube", {"day__gte": start.isoformat(), "day__lte": end.isoformat()},
+        columns=CUBE_COLUMNS, key="day"
+    ))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=CUBE_COLUMNS)
+
+
+def load_cube(start, end, dims):
+    """
+    Cubo rotulado do período (datas inclusive, dias UTC), guardado em memória
+    como o relatório (period_cache). Poucas linhas: 1 por dia x célula x
+    líder x cesta com entrega, qualquer que seja o nº de entregas.
+    """
+    def build():
+        try:
+            return label_cube(_read_cube(start, end), dims)
+        except MigrationMissing:
+            return _cube_from_report(start, end, dims)
+
+    return period_cache("cube", start, end, build)
+
+
+def filter_cube(cube, network=None, leader=None, basket=None, cell=None, supervisor=None):
+    """Mesmos filtros da tela (nome exibido, None = todos)."""
+    filters = dict(network=network, leader=leader, basket=basket, cell=cell, supervisor=supervisor)
+    keep = np.ones(len(cube), dtype=bool)
+    for name, value in filters.items():
+        if value is not None:
+            keep &= (cube[FILTER_COLUMNS[name]] == value).to_numpy()
+    return cube[keep]
+
+
+def summary(cube):
+    """Retorna {"deliveries", "baskets"} do cubo (já filtrado)."""
+    return {"deliveries": int(cube["Entregas"].sum()), "baskets": int(cube["Cestas"].sum())}
+
+
+def rollup(cube, by):
+    """Entregas e cestas somadas por uma coluna (ex: "Célula"), maiores primeiro; por dia, em ordem de data."""
+    out = cube.groupby(by, observed=True, sort=False)[["Entregas", "Cestas"]].sum()
+    return out.sort_index() if by == "Dia" else out.sort_values("Cestas", ascending=False)
+
+
+def _family_params(start, end, dims, network=None, leader=None, basket=None, cell=None, supervisor=None):
+    """Filtros da tela -> parâmetros da RPC (listas de ids). None se nada pode passar."""
+    period = _period(start, end)
+    params = {"p_start": period["delivered_at__gte"], "p_end": period["delivered_at__lt"]}
+    ids = {}
+    if leader:
+        ids["p_leader_ids"] = _ids(dims["leaders"], "name", leader)
+    if basket:
+        ids["p_basket_type_ids"] = _ids(dims["baskets"], "name", basket)
+    if supervisor:
+        ids["p_supervisor_ids"] = _ids(dims["supers"], "name", supervisor)
+    if cell or network:
+        ids["p_cell_ids"] = {c["id"] for c in dims["cells"]
+                             if (not cell or c["cell_name"] == cell) and (not network or c["network_name"] == network)}
+    for name, values in ids.items():
+        if not values:
+            return None
+        params[name] = sorted(values)
+    return params
+
+
+def family_count(start, end, dims, **filters):
+    """
+    Famílias distintas atendidas no período/filtros (telefones distintos,
+    "-" = entrega sem família), mesmo critério do Resumo antigo: o telefone da
+    família é obrigatório, então "-" só aparece para entrega sem família (ou
+    com a família apagada) e conta 1, como no nunique() da linha a linha.
+    Calculado no banco (delivery_family_count); sem a migration, nas entregas.
+    """
+    def from_index():
+        return int(load_report_index(start, end, dims).select(**filters)["Telefone Representante"].nunique())
+
+    def build():
+        # ⚠️ "-" (sem o cadastro) não tem id para a RPC: conta no relatório do período
+        if "-" in filters.values():
+            return from_index()
+        params = _family_params(start, end, dims, **filters)
+        if params is None:
+            return 0
+        try:
+            return int(call_rpc("delivery_family_count", params) or 0)
+        except MigrationMissing:
+            return from_index()
+
+    chosen = tuple(sorted((k, v) for k, v in filters.items() if v is not None))
+    return period_cache("families", start, end, build, extra=chosen)
+
+
+# ==========================
+# CONFERÊNCIA / MANUTENÇÃO
+# ==========================
+def expected_cube(start=None, end=None):
+    """Agregado das entregas (lidas em páginas) no formato do cubo, para conferência."""
+    filters = _period(start, end) if start and end else None
+    frames = list(iter_table_frames("deliveries", filters, key="delivered_at",
+                                    columns=["id", "delivered_at", "family_id", "leader_id", "basket_type_id",
+                                             "quantity"]))
+    if not frames:
+        return pd.DataFrame(columns=[*KEY_COLUMNS, "deliveries", "baskets"])
+    d = pd.concat(frames, ignore_index=True)
+    families = pd.concat(list(iter_table_frames("families", columns=["id", "cell_id"])) or
+                         [pd.DataFrame(columns=["id", "cell_id"])], ignore_index=True)
+    cell = families.set_index("id")["cell_id"]
+
+    d["day"] = pd.to_datetime(d["delivered_at"], utc=True, format="ISO8601").dt.strftime("%Y-%m-%d")
+    d["cell_id"] = d["family_id"].map(cell)
+    for col in ("cell_id", "leader_id", "basket_type_id"):
+        d[col] = d[col].fillna(NO_ID)
+    out = d.groupby(KEY_COLUMNS)["quantity"].agg(deliveries="size", baskets="sum").reset_index()
+    return out.astype({"deliveries": np.int64, "baskets": np.int64})
+
+
+def verify(start=None, end=None):
+    """
+    Confere o cubo contra o agregado das entregas (mesmo período, ou tudo).
+    Retorna {"ok", "rows", "deliveries", "mismatches"}.
+    """
+    expected = expected_cube(start, end).set_index(KEY_COLUMNS)
+    filters = {"day__gte": start.isoformat(), "day__lte": end.isoformat()} if start and end else None
+    frames = list(iter_table_frames("delivery_cube", filters, columns=CUBE_COLUMNS, key="day"))
+    found = (pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=CUBE_COLUMNS))
+    found = found.astype({"day": str}).set_index(KEY_COLUMNS)[["deliveries", "baskets"]]
+
+    cmp = expected.join(found, how="outer", lsuffix="_entregas", rsuffix="_cubo").fillna(0)
+    bad = cmp[(cmp["deliveries_entregas"] != cmp["deliveries_cubo"]) | (cmp["baskets_entregas"] != cmp["baskets_cubo"])]
+    return {
+        "ok": bad.empty,
+        "rows": len(found),
+        "deliveries": int(expected["deliveries"].sum()),
+        "mismatches": bad.reset_index(),
+    }
+
+
+def rebuild():
+    """Refaz o cubo inteiro no banco a partir das entregas. Retorna o nº de linhas."""
+    return call_rpc("delivery_cube_rebuild", touches=("delivery_cube",))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cubo de entregas (migrations/0006)")
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "rebuild":
+            print(f"✅ Cubo refeito: {rebuild()} linha(s).")
+            return 0
+        r = verify()
+    except MigrationMissing:
+        print("⚠️ Migration 0006_delivery_cube ainda não aplicada.")
+        return 1
+
+    print(f"{r['deliveries']} entregas, {r['rows']} linhas no cubo.")
+    if not r["ok"]:
+        print("❌ Linhas diferentes (dia, célula, líder, cesta):")
+        print(r["mismatches"].head(30).to_string(index=False))
+    print("✅ Cubo consistente." if r["ok"] else "❌ Cubo inconsistente: rode `python -m utils.delivery_cube rebuild`.")
+    return 0 if r["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,363 @@
+"""
+Fila de entregas (write-behind) para o Dashboard.
+
+Com DELIVERY_WRITE_BEHIND=1 a entrega não espera o banco:
+- valida contra o estoque local (estoque lido - o que já está na fila)
+- grava na fila (SQLite em DELIVERY_QUEUE_PATH, sobrevive a restart)
+- confirma na hora; uma thread envia a fila em lotes (register_delivery_tx)
+
+Cada item da fila usa a chave de idempotência da entrega: reenviar depois
+de um erro de rede nunca duplica a baixa, e a entrega é gravada com a hora em
+que entrou na fila (não a do envio). Por isso a fila só liga com as
+migrations 0002 (register_delivery_tx) e 0009 (datas) aplicadas. Erros que reenviar não
+resolve (família apagada, receita vazia, permissão, PGRST...) viram conflito
+e ficam para alguém resolver na tela; erro de rede tenta de novo.
+
+Variáveis de ambiente:
+- DELIVERY_WRITE_BEHIND=1        liga a fila (padrão: desligada)
+- DELIVERY_QUEUE_PATH=arquivo    padrão delivery_queue.db
+- DELIVERY_FLUSH_SECONDS=2       intervalo entre envios
+- DELIVERY_FLUSH_BATCH=20        entregas por envio
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+import streamlit as st
+
+from utils.db import call_rpc, fetch_table, get_client, MigrationMissing
+from utils.calculations import get_inventory_map, RECIPE_COLUMNS
+from utils.operations import delivery_tx_params, new_idempotency_key, DELIVERY_TABLES
+
+ENABLED = os.getenv("DELIVERY_WRITE_BEHIND", "").lower() in ("1", "true", "yes", "on")
+QUEUE_PATH = os.getenv("DELIVERY_QUEUE_PATH", "delivery_queue.db")
+FLUSH_SECONDS = float(os.getenv("DELIVERY_FLUSH_SECONDS", "2"))
+FLUSH_BATCH = int(os.getenv("DELIVERY_FLUSH_BATCH", "20"))
+
+# espera entre tentativas depois de erro de rede: 2s, 4s, 8s... até 5 min
+RETRY_BASE_SECONDS = 2.0
+RETRY_MAX_SECONDS = 300.0
+# entregas já enviadas ficam 1 dia no arquivo (consulta/suporte) e depois saem
+KEEP_DONE_SECONDS = 86400
+
+# SQLSTATE que passam sozinhos (conexão, deadlock, recursos, servidor reiniciando)
+# e erros do PostgREST sem acesso ao banco: tenta de novo. Qualquer outro código
+# (dados, permissão 42501, PGRST...) vira conflito; sem código = rede, tenta de novo.
+_TRANSIENT_CODES = ("08", "40", "53", "57", "58", "PGRST00")
+
+_SCHEMA = """
+create table if not exists delivery_queue (
+    key text primary key,
+    created_at real not null,
+    kind text not null,
+    params text not null,
+    items text not null,
+    status text not null default 'pending',
+    attempts integer not null default 0,
+    next_attempt_at real not null default 0,
+    last_error text,
+    flushed_at real,
+    result text
+);
+create index if not exists delivery_queue_status_idx on delivery_queue (status, created_at);
+"""
+
+
+class InsufficientStock(Exception):
+    """A entrega pediria mais do que o estoque local (descontada a fila)."""
+
+
+def _is_conflict(error):
+    if isinstance(error, MigrationMissing):
+        return True
+    code = str(getattr(error, "code", "") or "")
+    return bool(code) and not code.startswith(_TRANSIENT_CODES)
+
+
+def check_migration(client):
+    """
+    ⚠️ A fila só envia pelo register_delivery_tx com datas (migrations/0002 e 0009):
+    sem ele não há chave de idempotência (um reenvio duplicaria a baixa) e a
+    entrega cairia no dia do envio.
+    operation_dates_version (0009) só lê: levanta MigrationMissing sem a migration;
+    qualquer outro erro (rede, permissão) sobe como está.
+    """
+    call_rpc("operation_dates_version", client=client)
+
+
+class DeliveryQueue:
+    def __init__(self, path=QUEUE_PATH, client=None):
+        """
+        client: banco usado pela thread de envio (padrão: o da página que criou a fila)
+        Levanta MigrationMissing sem as migrations 0002/0009.
+        """
+        # ✅ resolvido aqui, no contexto do Streamlit: a thread não chama get_client
+        self.client = client or get_client()
+        check_migration(self.client)
+        self.path = path
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_flush_at = None
+        self.last_error = None
+
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            # ✅ confirmada = gravada em disco (a entrega já foi "aceita" na tela)
+            self.conn.execute("pragma journal_mode = wal")
+            self.conn.execute("pragma synchronous = full")
+        self.conn.executescript(_SCHEMA)
+
+    # ==========================
+    # ENFILEIRAR
+    # ==========================
+    def reserved(self):
+        """{product_id: quantidade} das entregas ainda não enviadas."""
+        with self._lock:
+            rows = self.conn.execute("select items from delivery_queue where status = 'pending'").fetchall()
+        out = {}
+        for r in rows:
+            for pid, qty in json.loads(r["items"]):
+                out[pid] = out.get(pid, 0.0) + qty
+        return out
+
+    def local_inventory(self, inv_map=None):
+        """Estoque como vai ficar depois que a fila for enviada."""
+        inv = dict(get_inventory_map() if inv_map is None else inv_map)
+        for pid, qty in self.reserved().items():
+            inv[pid] = inv.get(pid, 0.0) - qty
+        return inv
+
+    def enqueue(self, key, kind, params, items, check_stock=True):
+        """
+        Grava a entrega na fila (mesma key = mesma entrega, não duplica).
+        items: [(product_id, qty_total)] usados para reservar o estoque local
+        Levanta InsufficientStock se check_stock e faltar algum item.
+        Retorna {"key": key, "queued": True} (o id da entrega só existe depois do envio)
+        """
+        with self._lock:
+            found = self.conn.execute("select key from delivery_queue where key = ?", (key,)).fetchone()
+            if found is None:
+                if check_stock:
+                    inv = self.local_inventory()
+                    short = [(pid, qty - inv.get(pid, 0.0)) for pid, qty in items if qty > inv.get(pid, 0.0) + 1e-9]
+                    if short:
+                        names = {p["id"]: p["name"] for p in fetch_table("products", columns=["id", "name"])}
+                        raise InsufficientStock(
+                            "Estoque insuficiente (contando as entregas na fila): "
+                            + ", ".join(f"falta {round(q, 2)} de {names.get(pid, pid)}" for pid, q in short)
+                        )
+                self.conn.execute(
+                    "insert into delivery_queue (key, created_at, kind, params, items) values (?, ?, ?, ?, ?)",
+                    (key, time.time(), kind, json.dumps(params, default=str), json.dumps(items))
+                )
+        self._wake.set()
+        return {"key": key, "queued": True}
+
+    # ==========================
+    # ENVIO
+    # ==========================
+    def _send(self, row):
+        p = json.loads(row["params"])
+        items = None
+        if row["kind"] == "custom":
+            items = [(pid, float(qty)) for pid, qty in p["items_dict"].items() if float(qty) > 0]
+        # ✅ a entrega vale na hora em que entrou na fila, não na do envio
+        queued_at = datetime.fromtimestamp(row["created_at"], timezone.utc).isoformat()
+        params = delivery_tx_params(row["key"], p["family_id"], p["leader_id"], p["basket_type_id"], p["quantity"],
+                                    p.get("notes"), p.get("is_partial", False), p.get("partial_notes"), items,
+                                    delivered_at=queued_at, created_at=queued_at)
+        return call_rpc("register_delivery_tx", params, touches=DELIVERY_TABLES, client=self.client)
+
+    def flush(self, batch_size=None):
+        """
+        Envia até batch_size entregas pendentes, na ordem em que entraram.
+        Para no primeiro erro de rede (o resto espera a próxima tentativa).
+        Retorna (enviadas, conflitos)
+        """
+        now = time.time()
+        with self._lock:
+            rows = self.conn.execute(
+                "select * from delivery_queue where status = 'pending' and next_attempt_at <= ? "
+                "order by created_at limit ?", (now, batch_size or FLUSH_BATCH)
+            ).fetchall()
+
+        sent = conflicts = 0
+        for row in rows:
+            try:
+                result = self._send(row)
+            except Exception as e:
+                attempts = row["attempts"] + 1
+                with self._lock:
+                    if _is_conflict(e):
+                        conflicts += 1
+                        self.conn.execute(
+                            "update delivery_queue set status = 'conflict', attempts = ?, last_error = ? where key = ?",
+                            (attempts, str(e), row["key"])
+                        )
+                        continue
+                    delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+                    self.conn.execute(
+                        "update delivery_queue set attempts = ?, next_attempt_at = ?, last_error = ? where key = ?",
+                        (attempts, time.time() + delay, str(e), row["key"])
+                    )
+                    self.last_error = str(e)
+                break
+            with self._lock:
+                self.conn.execute(
+                    "update delivery_queue set status = 'done', attempts = attempts + 1, flushed_at = ?, "
+                    "last_error = null, result = ? where key = ?",
+                    (time.time(), json.dumps(result, default=str), row["key"])
+                )
+            sent += 1
+
+        if rows:
+            self.last_flush_at = time.time()
+            if sent:
+                self.last_error = None
+                with self._lock:
+                    self.conn.execute("delete from delivery_queue where status = 'done' and flushed_at < ?",
+                                      (time.time() - KEEP_DONE_SECONDS,))
+        return sent, conflicts
+
+    def requeue(self, key):
+        """Conflito resolvido (ex: família recadastrada): tenta enviar de novo."""
+        with self._lock:
+            self.conn.execute(
+                "update delivery_queue set status = 'pending', next_attempt_at = 0 where key = ? and status = 'conflict'",
+                (key,)
+            )
+        self._wake.set()
+
+    def discard(self, key):
+        """Desiste de uma entrega em conflito (o estoque reservado é liberado)."""
+        with self._lock:
+            self.conn.execute("delete from delivery_queue where key = ? and status = 'conflict'", (key,))
+
+    # ==========================
+    # THREAD
+    # ==========================
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(FLUSH_SECONDS)
+            self._wake.clear()
+            try:
+                while self.flush()[0] == FLUSH_BATCH:
+                    pass
+            except Exception as e:
+                # ⚠️ a thread nunca morre: o erro aparece no status da fila
+                self.last_error = str(e)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="delivery-queue", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # ==========================
+    # STATUS
+    # ==========================
+    def stats(self):
+        """
+        Retorna:
+        - pending: entregas esperando envio
+        - conflicts: entregas com erro de dados (precisam de ação)
+        - lag_seconds: idade da entrega pendente mais antiga (0 se vazia)
+        - last_flush_at / last_error: último envio e último erro de rede
+        """
+        with self._lock:
+            counts = dict(self.conn.execute(
+                "select status, count(*) from delivery_queue where status <> 'done' group by status"
+            ).fetchall())
+            oldest = self.conn.execute(
+                "select min(created_at) from delivery_queue where status = 'pending'"
+            ).fetchone()[0]
+        return {
+            "pending": counts.get("pending", 0),
+            "conflicts": counts.get("conflict", 0),
+            "lag_seconds": time.time() - oldest if oldest else 0.0,
+            "last_flush_at": self.last_flush_at,
+            "last_error": self.last_error,
+        }
+
+    def conflicts(self):
+        with self._lock:
+            rows = self.conn.execute(
+                "select key, created_at, kind, params, last_error from delivery_queue "
+                "where status = 'conflict' order by created_at"
+            ).fetchall()
+        return [{
+            "key": r["key"],
+            "created_at": datetime.fromtimestamp(r["created_at"], timezone.utc).isoformat(),
+            "kind": r["kind"],
+            "params": json.loads(r["params"]),
+            "error": r["last_error"],
+        } for r in rows]
+
+
+@st.cache_resource
+def get_queue():
+    # uma fila (e uma thread) por processo; None sem as migrations 0002/0009 (fila desligada)
+    try:
+        return DeliveryQueue(QUEUE_PATH).start()
+    except MigrationMissing:
+        return None
+
+
+def _recipe_items(basket_type_id, quantity):
+    # mesma leitura do Dashboard (fetch_many), então normalmente sai do cache
+    items = fetch_table("basket_type_items", columns=RECIPE_COLUMNS)
+    return [(it["product_id"], float(it["quantity_required"]) * int(quantity))
+            for it in items if it["basket_type_id"] == basket_type_id]
+
+
+def enqueue_delivery(family_id, leader_id, basket_type_id, quantity, recipient_name, notes=None,
+                     idempotency_key=None, queue=None):
+    """Mesmos parâmetros de operations.register_delivery, mas só enfileira."""
+    params = {
+        "family_id": family_id,
+        "leader_id": leader_id,
+        "basket_type_id": basket_type_id,
+        "quantity": int(quantity),
+        "recipient_name": recipient_name,
+        "notes": notes,
+    }
+    queue = queue or get_queue()
+    items = _recipe_items(basket_type_id, quantity)
+    return queue.enqueue(idempotency_key or new_idempotency_key(), "delivery", params, items)
+
+
+def enqueue_delivery_custom_items(family_id, leader_id, basket_type_id, quantity, recipient_name, items_dict,
+                                  notes=None, is_partial=True, partial_notes=None, idempotency_key=None,
+                                  queue=None):
+    """
+    Mesmos parâmetros de operations.register_delivery_custom_items, mas só enfileira.
+    Como no caminho direto, a entrega personalizada aceita qualquer quantidade
+    (não valida estoque), mas reserva o que foi pedido.
+    """
+    params = {
+        "family_id": family_id,
+        "leader_id": leader_id,
+        "basket_type_id": basket_type_id,
+        "quantity": int(quantity),
+        "recipient_name": recipient_name,
+        "items_dict": {pid: float(qty) for pid, qty in items_dict.items()},
+        "notes": notes,
+        "is_partial": bool(is_partial),
+        "partial_notes": partial_notes,
+    }
+    items = [(pid, float(qty)) for pid, qty in items_dict.items() if float(qty) > 0]
+    queue = queue or get_queue()
+    return queue.enqueue(idempotency_key or new_idempotency_key(), "custom", params, items, check_stock=False)
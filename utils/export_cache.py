@@ -0,0 +1,105 @@
+"""
+Cache dos arquivos exportados (CSV / Excel) da página de Relatórios.
+
+O arquivo só é gerado quando alguém pede (botão "Gerar") e fica guardado
+com a chave formato + hash dos filtros + carimbo dos dados:
+- mexer em outro widget ou baixar de novo não gera nada
+- dado novo (entrega registrada, edição em outro processo) muda o carimbo
+  e o arquivo antigo deixa de ser usado
+
+O cache é do processo (compartilhado entre as sessões) e limitado em bytes
+(EXPORT_CACHE_MAX_MB): cheio, sai o arquivo usado há mais tempo.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from utils.reports import export_csv, export_excel_pretty
+
+EXPORT_CACHE_MAX_BYTES = int(float(os.getenv("EXPORT_CACHE_MAX_MB", "64")) * 2**20)
+
+EXPORTERS = {
+    "csv": export_csv,
+    "xlsx": export_excel_pretty,
+}
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_bytes = 0
+
+
+def filters_fingerprint(filters):
+    """Hash dos filtros da tela (dict com datas/nomes/None)."""
+    raw = json.dumps(filters, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def data_stamp(df):
+    """
+    Carimbo do conteúdo do relatório: hash vetorizado das linhas (na ordem)
+    + colunas. Custa milissegundos, bem menos que gerar o arquivo.
+    """
+    h = hashlib.sha1(json.dumps([str(c) for c in df.columns]).encode("utf-8"))
+    if len(df):
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return f"{len(df)}:{h.hexdigest()}"
+
+
+def export_key(filters, df):
+    return filters_fingerprint(filters), data_stamp(df)
+
+
+def get_cached_export(kind, key):
+    """Bytes já gerados para (formato, chave) ou None (nada é gerado aqui)."""
+    with _cache_lock:
+        data = _cache.get((kind, key))
+        if data is not None:
+            _cache.move_to_end((kind, key))
+        return data
+
+
+def get_export(kind, df, key):
+    """Bytes do arquivo: do cache ou gerados agora (e guardados)."""
+    return build_export(kind, key, lambda: EXPORTERS[kind](df))
+
+
+def build_export(kind, key, build):
+    """Como get_export, mas quem gera é build() (ex: exportação em SQL do utils.analytics)."""
+    data = get_cached_export(kind, key)
+    if data is None:
+        data = build()
+        _put(kind, key, data)
+    return data
+
+
+def _put(kind, key, data):
+    global _cache_bytes
+    # ⚠️ arquivo maior que o cache inteiro: entrega, mas não guarda
+    if len(data) > EXPORT_CACHE_MAX_BYTES:
+        return
+    with _cache_lock:
+        old = _cache.pop((kind, key), None)
+        if old is not None:
+            _cache_bytes -= len(old)
+        _cache[(kind, key)] = data
+        _cache_bytes += len(data)
+        # ✅ passou do limite: descarta os usados há mais tempo
+        while _cache_bytes > EXPORT_CACHE_MAX_BYTES:
+            _, evicted = _cache.popitem(last=False)
+            _cache_bytes -= len(evicted)
+
+
+def clear_export_cache():
+    global _cache_bytes
+    with _cache_lock:
+        _cache.clear()
+        _cache_bytes = 0
+
+
+def cache_info():
+    with _cache_lock:
+        return {"entries": len(_cache), "bytes": _cache_bytes, "max_bytes": EXPORT_CACHE_MAX_BYTES}
@@ -0,0 +1,280 @@
+"""
+Estoque reconstruído a partir do ledger (stock_movements).
+
+inventory é um contador que o app altera; stock_movements é o histórico
+append-only de tudo que entrou e saiu. Aqui o histórico vira, por produto,
+um array ordenado por data com o saldo acumulado (cumsum vetorizado):
+- saldo de um produto numa data: busca binária (searchsorted), O(log n)
+- checkpoints mensais (stock_checkpoints, migrations/0004): a reconstrução
+  lê só os movimentos depois do último checkpoint
+- reconcile: compara inventory.quantity com o saldo do ledger (drift)
+
+Datas em UTC. Uma data (sem hora) conta o dia inteiro.
+
+Uso:
+    python -m utils.ledger reconcile [--csv drift.csv]
+    python -m utils.ledger checkpoint
+    python -m utils.ledger as-of <product_id> 2025-06-30
+"""
+import argparse
+import sys
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from utils.db import fetch_table, iter_table_frames, upsert_rows, MigrationMissing
+from utils.calculations import INVENTORY_COLUMNS
+
+MOVEMENT_COLUMNS = ["product_id", "qty_change", "created_at"]
+
+# diferença abaixo disso é arredondamento, não drift
+DRIFT_TOLERANCE = 1e-6
+
+
+def _ts(values):
+    """Datas ISO (texto) -> datetime64 UTC."""
+    return pd.to_datetime(values, utc=True, format="ISO8601")
+
+
+def _cutoff(when):
+    """
+    Instante limite (exclusivo) de uma consulta "até when".
+    date -> meia-noite do dia seguinte; datetime -> o próprio instante (incluído).
+    """
+    if isinstance(when, str):
+        when = date.fromisoformat(when) if len(when) == 10 else datetime.fromisoformat(when)
+    if isinstance(when, datetime):
+        t = pd.Timestamp(when)
+        t = t.tz_localize("UTC") if t.tzinfo is None else t.tz_convert("UTC")
+        # o banco guarda microssegundos
+        return t + pd.Timedelta(1, "us")
+    return pd.Timestamp(when + timedelta(days=1), tz="UTC")
+
+
+def _iso(ts):
+    return ts.isoformat()
+
+
+class Ledger:
+    """
+    Saldos acumulados por produto, em arrays NumPy:
+    - times / balance: movimentos ordenados por (produto, data) e saldo depois de cada um
+    - starts / ends: fatia de cada produto nesses arrays
+    - base_qty / base_moves: saldo e nº de movimentos do checkpoint de partida
+    """
+
+    def __init__(self, movements, base=None, base_time=None):
+        """
+        movements: DataFrame com product_id, qty_change, created_at
+        base: {product_id: (quantidade, movimentos)} do checkpoint (saldo antes de base_time)
+        """
+        base = base or {}
+        self.base_time = base_time
+
+        pids = movements["product_id"].to_numpy(dtype=object) if len(movements) else np.array([], dtype=object)
+        self.products = pd.Index(sorted(set(pids) | set(base)))
+        self._code = {pid: k for k, pid in enumerate(self.products)}
+
+        codes = self.products.get_indexer(pids)
+        times = (pd.DatetimeIndex(_ts(movements["created_at"])).asi8 if len(movements)
+                 else np.array([], dtype="int64"))
+        qty = movements["qty_change"].to_numpy(dtype=float) if len(movements) else np.array([], dtype=float)
+
+        order = np.lexsort((times, codes))
+        self.codes, self.times, qty = codes[order], times[order], qty[order]
+
+        self.base_qty = np.array([float(base.get(pid, (0.0, 0))[0]) for pid in self.products])
+        self.base_moves = np.array([int(base.get(pid, (0.0, 0))[1]) for pid in self.products], dtype="int64")
+
+        # ✅ cumsum por produto (groupby do pandas, sem laço Python) + saldo do checkpoint
+        running = pd.Series(qty).groupby(self.codes).cumsum().to_numpy() if len(qty) else qty
+        self.balance = running + self.base_qty[self.codes]
+
+        k = np.arange(len(self.products))
+        self.starts = np.searchsorted(self.codes, k, side="left")
+        self.ends = np.searchsorted(self.codes, k, side="right")
+
+    def __len__(self):
+        return len(self.times)
+
+    def _check(self, cutoff):
+        if self.base_time is not None and cutoff.value < self.base_time.value:
+            raise ValueError(f"Ledger começa em {self.base_time}: use load_ledger(until=...) para datas anteriores")
+
+    def _at(self, k, cutoff_ns):
+        s, e = self.starts[k], self.ends[k]
+        i = np.searchsorted(self.times[s:e], cutoff_ns, side="left")
+        return (self.balance[s + i - 1] if i else self.base_qty[k]), int(self.base_moves[k] + i)
+
+    def as_of(self, product_id, when=None):
+        """Saldo do produto em when (None = saldo atual). Busca binária: O(log n)."""
+        k = self._code.get(product_id)
+        if k is None:
+            return 0.0
+        if when is None:
+            return float(self.balance[self.ends[k] - 1]) if self.ends[k] > self.starts[k] else float(self.base_qty[k])
+        cutoff = _cutoff(when)
+        self._check(cutoff)
+        return float(self._at(k, cutoff.value)[0])
+
+    def snapshot(self, when=None):
+        """Saldo de todos os produtos em when: Series product_id -> quantidade."""
+        if when is None:
+            last = np.where(self.ends > self.starts, self.balance[np.maximum(self.ends - 1, 0)], self.base_qty) \
+                if len(self.times) else self.base_qty
+            return pd.Series(last, index=self.products, dtype=float)
+        cutoff = _cutoff(when)
+        self._check(cutoff)
+        return pd.Series([self._at(k, cutoff.value)[0] for k in range(len(self.products))],
+                         index=self.products, dtype=float)
+
+    def totals(self):
+        return self.snapshot()
+
+    def checkpoint_rows(self, until=None, freq="MS"):
+        """
+        Saldos no início de cada mês (freq do pandas) depois do checkpoint de
+        partida e até until (padrão: agora). Só produtos com algum movimento.
+        Retorna linhas para stock_checkpoints.
+        """
+        until = pd.Timestamp(until or datetime.now(timezone.utc))
+        until = until.tz_localize("UTC") if until.tzinfo is None else until
+        first = self.base_time if self.base_time is not None else (
+            pd.Timestamp(self.times.min(), tz="UTC") if len(self.times) else until
+        )
+        bounds = pd.date_range(first.normalize(), until, freq=freq, tz="UTC")
+        bounds = bounds[bounds > first]
+        if not len(bounds):
+            return []
+
+        rows = []
+        ns = bounds.asi8
+        for k, pid in enumerate(self.products):
+            s, e = self.starts[k], self.ends[k]
+            idx = np.searchsorted(self.times[s:e], ns, side="left")
+            qty = np.where(idx > 0, self.balance[s + np.maximum(idx, 1) - 1] if e > s else 0.0, self.base_qty[k])
+            moves = self.base_moves[k] + idx
+            for b, q, m in zip(bounds, qty, moves):
+                if m:
+                    rows.append({"product_id": pid, "as_of": _iso(b), "quantity": float(q), "movements": int(m)})
+        return rows
+
+
+def load_movements(since=None, until=None):
+    """
+    Movimentos com since <= created_at < until (Timestamps UTC, opcionais),
+    em páginas por keyset. Retorna DataFrame com MOVEMENT_COLUMNS.
+    """
+    filters = {}
+    if since is not None:
+        filters["created_at__gte"] = _iso(since)
+    if until is not None:
+        filters["created_at__lt"] = _iso(until)
+    frames = [f[MOVEMENT_COLUMNS] for f in iter_table_frames(
+        "stock_movements", filters or None, columns=MOVEMENT_COLUMNS, key="created_at"
+    )]
+    if not frames:
+        return pd.DataFrame(columns=MOVEMENT_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def latest_checkpoint(until=None):
+    """
+    Último checkpoint com as_of <= until.
+    Retorna ({product_id: (quantidade, movimentos)}, as_of) ou ({}, None).
+    Levanta MigrationMissing sem a migration 0004.
+    """
+    filters = {"as_of__lte": _iso(until)} if until is not None else None
+    last = fetch_table("stock_checkpoints", filters, order="as_of", desc=True, limit=1, columns=["as_of"])
+    if not last:
+        return {}, None
+    as_of = last[0]["as_of"]
+    rows = fetch_table("stock_checkpoints", {"as_of": as_of}, columns=["product_id", "quantity", "movements"])
+    return {r["product_id"]: (float(r["quantity"]), int(r["movements"])) for r in rows}, _ts([as_of])[0]
+
+
+def load_ledger(until=None, use_checkpoints=True):
+    """
+    Monta o Ledger a partir do último checkpoint (se houver) até until
+    (date/datetime, padrão: tudo). Sem a migration 0004, lê o histórico inteiro.
+    """
+    cutoff = _cutoff(until) if until is not None else None
+    base, base_time = {}, None
+    if use_checkpoints:
+        try:
+            base, base_time = latest_checkpoint(cutoff)
+        except MigrationMissing:
+            pass
+    return Ledger(load_movements(base_time, cutoff), base, base_time)
+
+
+def save_checkpoints(ledger=None, until=None):
+    """
+    Grava em stock_checkpoints os inícios de mês ainda sem checkpoint.
+    Retorna quantas linhas foram gravadas.
+    """
+    ledger = ledger or load_ledger()
+    rows = ledger.checkpoint_rows(until)
+    if rows:
+        upsert_rows("stock_checkpoints", rows, on_conflict="product_id,as_of")
+    return len(rows)
+
+
+def reconcile(ledger=None, tolerance=DRIFT_TOLERANCE):
+    """
+    Compara inventory.quantity com o saldo do ledger, produto a produto.
+    Retorna DataFrame (product_id, name, inventory, ledger, drift) só com os
+    produtos com diferença, do maior drift para o menor.
+    """
+    ledger = ledger or load_ledger()
+    inv = pd.DataFrame(fetch_table("inventory", columns=INVENTORY_COLUMNS, use_cache=False),
+                       columns=INVENTORY_COLUMNS)
+    inv = inv.astype({"quantity": float}).groupby("product_id")["quantity"].sum()
+
+    df = pd.concat({"inventory": inv, "ledger": ledger.totals()}, axis=1).fillna(0.0)
+    df["drift"] = df["inventory"] - df["ledger"]
+    df = df[df["drift"].abs() > tolerance]
+    df = df.iloc[np.argsort(-df["drift"].abs().to_numpy(), kind="stable")]
+    df.index.name = "product_id"
+    df = df.reset_index()
+
+    names = {p["id"]: p["name"] for p in fetch_table("products", columns=["id", "name"])}
+    df.insert(1, "name", df["product_id"].map(names).fillna("-"))
+    return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ledger de estoque: reconcile / checkpoint / as-of")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("reconcile", help="inventory x soma dos movimentos")
+    rec.add_argument("--csv", help="salva o drift neste arquivo")
+    sub.add_parser("checkpoint", help="grava os checkpoints mensais que faltam")
+    asof = sub.add_parser("as-of", help="saldo de um produto numa data")
+    asof.add_argument("product_id")
+    asof.add_argument("when", help="AAAA-MM-DD ou data/hora ISO")
+    args = parser.parse_args(argv)
+
+    if args.command == "as-of":
+        ledger = load_ledger(until=args.when)
+        print(f"{args.product_id} em {args.when}: {ledger.as_of(args.product_id, args.when):g}")
+        return 0
+
+    ledger = load_ledger()
+    if args.command == "checkpoint":
+        print(f"✅ {save_checkpoints(ledger)} checkpoint(s) gravado(s) ({len(ledger)} movimentos lidos).")
+        return 0
+
+    df = reconcile(ledger)
+    if args.csv:
+        df.to_csv(args.csv, index=False)
+    if df.empty:
+        print(f"✅ inventory bate com o ledger ({len(ledger)} movimentos lidos).")
+    else:
+        print(f"⚠️ {len(df)} produto(s) com drift ({len(ledger)} movimentos lidos):")
+        print(df.head(30).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,749 @@
+"""
+Backend local (em memória) que imita o cliente Supabase usado em utils/db.
+
+Serve para testar e medir o app sem rede:
+- mesma cadeia table().select().eq().order().insert().update().delete().execute()
+- rpc() executa versões Python das funções SQL de migrations/, com a mesma
+  semântica: tudo dentro de uma transação (trava + rollback em caso de erro)
+- SELECTs cortados em max-rows, como o PostgREST (DB_MAX_ROWS, 1000; 0 desliga):
+  leitura que esquece de paginar aparece nos testes e benchmarks
+
+Uso:
+    from utils.db import use_client
+    from utils.local_backend import MemoryClient
+    use_client(MemoryClient())
+
+Ou pelo .env, para o app inteiro (ver utils.db.create_backend):
+    DB_BACKEND=memory
+    DB_MEMORY_DATA=dados.json      # opcional: {tabela: [linhas]}
+    DB_LATENCY_MS=80               # opcional: simula a ida e volta até o Supabase
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+
+class LocalBackendError(Exception):
+    """Erro no formato do PostgREST (tem .code, igual ao APIError)."""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code}: {message}")
+        self.code = code
+        self.message = message
+
+
+class Response:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+# Colunas preenchidas pelo banco quando o insert não informa
+_DEFAULTS = {
+    "deliveries": {"delivered_at": _now},
+    "inventory": {"updated_at": _now},
+}
+
+
+class Query:
+    """Acumula a query (como o builder do postgrest) e executa no client."""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.op = "select"
+        self.columns = "*"
+        self.payload = None
+        self.on_conflict = None
+        self.filters = []
+        self.orders = []
+        self.limit_n = None
+        self.offset_n = 0
+
+    def select(self, *columns, count=None):
+        self.op = "select"
+        self.columns = ",".join(columns) if columns else "*"
+        return self
+
+    def insert(self, data, **kwargs):
+        self.op = "insert"
+        self.payload = data
+        return self
+
+    def upsert(self, data, on_conflict="id", **kwargs):
+        self.op = "upsert"
+        self.payload = data
+        self.on_conflict = on_conflict or "id"
+        return self
+
+    def update(self, data, **kwargs):
+        self.op = "update"
+        self.payload = data
+        return self
+
+    def delete(self, **kwargs):
+        self.op = "delete"
+        return self
+
+    def _filter(self, column, op, value):
+        self.filters.append((column, op, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._filter(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._filter(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "lte", value)
+
+    def like(self, column, pattern):
+        return self._filter(column, "like", (pattern, _like_regex(pattern, 0)))
+
+    def ilike(self, column, pattern):
+        return self._filter(column, "ilike", (pattern, _like_regex(pattern, re.IGNORECASE)))
+
+    def in_(self, column, values):
+        return self._filter(column, "in", set(values))
+
+    def is_(self, column, value):
+        return self._filter(column, "is", None if value in (None, "null") else value)
+
+    def or_(self, filters, reference_table=None):
+        # ex: "delivered_at.gt.X,and(delivered_at.eq.X,id.gt.Y)" (sintaxe do PostgREST)
+        return self._filter(None, "tree", ("or", parse_logic(filters)))
+
+    def order(self, column, desc=False, **kwargs):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, size, **kwargs):
+        self.limit_n = size
+        return self
+
+    def offset(self, size):
+        self.offset_n = size
+        return self
+
+    def range(self, start, end, **kwargs):
+        self.offset_n = start
+        self.limit_n = end - start + 1
+        return self
+
+    def matches(self, row):
+        return all(_match(row, f) for f in self.filters)
+
+    def execute(self):
+        return self.client._execute(self)
+
+
+def _like_regex(pattern, flags):
+    parts = [".*" if ch == "%" else "." if ch == "_" else re.escape(ch) for ch in pattern]
+    return re.compile("^" + "".join(parts) + "$", flags | re.DOTALL)
+
+
+def _compare(fn):
+    # comparação com NULL nunca é verdadeira (como no SQL)
+    return lambda a, b: a is not None and b is not None and fn(a, b)
+
+
+_MATCHERS = {
+    "eq": _compare(lambda a, b: a == b),
+    "neq": _compare(lambda a, b: a != b),
+    "gt": _compare(lambda a, b: a > b),
+    "gte": _compare(lambda a, b: a >= b),
+    "lt": _compare(lambda a, b: a < b),
+    "lte": _compare(lambda a, b: a <= b),
+    # valor = (padrão original, regex compilada)
+    "like": lambda a, p: a is not None and p[1].match(str(a)) is not None,
+    "ilike": lambda a, p: a is not None and p[1].match(str(a)) is not None,
+    "in": lambda a, values: a in values,
+    "is": lambda a, b: a is b or a == b,
+}
+
+
+def _split_top(text):
+    """Separa por vírgula fora de parênteses e aspas."""
+    parts, depth, quoted, start = [], 0, False, 0
+    for i, ch in enumerate(text):
+        if ch == '"' and (i == 0 or text[i - 1] != "\\"):
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ",":
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+def parse_logic(text):
+    """
+    Filtro lógico do PostgREST (conteúdo de or=(...)) -> lista de condições:
+    (coluna, op, valor) ou (None, "tree", ("and"|"or", [condições])).
+    Valores entre aspas duplas podem ter vírgula, ponto e parênteses.
+    """
+    out = []
+    for part in _split_top(text):
+        for logic in ("and", "or"):
+            if part.startswith(logic + "(") and part.endswith(")"):
+                out.append((None, "tree", (logic, parse_logic(part[len(logic) + 1:-1]))))
+                break
+        else:
+            column, op, value = part.split(".", 2)
+            if value.startswith('"') and value.endswith('"'):
+                value = value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+            elif value == "null":
+                value = None
+            out.append((column, op, value))
+    return out
+
+
+def _coerce(stored, value):
+    # o valor do filtro lógico chega como texto: compara no tipo da coluna
+    if isinstance(stored, bool) or not isinstance(stored, (int, float)) or not isinstance(value, str):
+        return value
+    return float(value)
+
+
+def _match(row, condition):
+    column, op, value = condition
+    if op == "tree":
+        logic, conditions = value
+        return (any if logic == "or" else all)(_match(row, c) for c in conditions)
+    stored = row.get(column)
+    return _MATCHERS[op](stored, _coerce(stored, value))
+
+
+class RpcCall:
+    def __init__(self, client, fn, params):
+        self.client = client
+        self.fn = fn
+        self.params = params or {}
+
+    def execute(self):
+        return Response(self.client._call_rpc(self.fn, self.params))
+
+
+# ==========================
+# STAND-INS DAS FUNÇÕES SQL (migrations/)
+# ==========================
+RPC_FUNCTIONS = {}
+
+
+def rpc_function(name, touches):
+    """Registra a versão Python de uma função SQL e as tabelas que ela escreve."""
+    def deco(fn):
+        RPC_FUNCTIONS[name] = (fn, tuple(touches))
+        return fn
+    return deco
+
+
+@rpc_function("apply_stock_movement", touches=("inventory", "stock_movements"))
+def apply_stock_movement(client, p_product_id, p_qty_change, p_movement_type="entrada", p_reference=None,
+                         p_idempotency_key=None, p_created_at=None):
+    """Espelho de migrations/0001_apply_stock_movement.sql (com as datas da 0009)"""
+    if p_idempotency_key is not None:
+        stored = _stored_result(client, p_idempotency_key)
+        if stored is not None:
+            return stored["quantity"]
+
+    inv = client.table("inventory").select("*").eq("product_id", p_product_id).execute().data
+    if inv:
+        new_qty = float(inv[0]["quantity"]) + float(p_qty_change)
+        client.table("inventory").update(
+            {"quantity": new_qty, "updated_at": _now()}
+        ).eq("product_id", p_product_id).execute()
+    else:
+        new_qty = float(p_qty_change)
+        client.table("inventory").insert({"product_id": p_product_id, "quantity": new_qty}).execute()
+
+    movement = {
+        "product_id": p_product_id,
+        "qty_change": float(p_qty_change),
+        "movement_type": p_movement_type,
+        "reference": p_reference
+    }
+    if p_created_at is not None:
+        movement["created_at"] = p_created_at
+    client.table("stock_movements").insert(movement).execute()
+
+    if p_idempotency_key is not None:
+        client.table("operation_keys").insert(
+            {"key": p_idempotency_key, "kind": "stock", "result": {"quantity": new_qty}}
+        ).execute()
+    return new_qty
+
+
+def _stored_result(client, key):
+    found = client.table("operation_keys").select("*").eq("key", key).execute().data
+    return found[0]["result"] if found else None
+
+
+_DELIVERY_TABLES = ("deliveries", "delivery_items", "inventory", "stock_movements", "operation_keys")
+
+
+@rpc_function("register_delivery_tx", touches=_DELIVERY_TABLES)
+def register_delivery_tx(client, p_idempotency_key, p_family_id, p_leader_id, p_basket_type_id, p_quantity,
+                         p_notes=None, p_is_partial=False, p_partial_notes=None, p_items=None,
+                         p_delivered_at=None, p_created_at=None):
+    """Espelho de migrations/0002_register_delivery_tx.sql (com as datas da 0009)"""
+    stored = _stored_result(client, p_idempotency_key)
+    if stored is not None:
+        return stored
+
+    now = p_created_at or _now()
+    delivery = client.table("deliveries").insert({
+        "family_id": p_family_id,
+        "leader_id": p_leader_id,
+        "basket_type_id": p_basket_type_id,
+        "quantity": int(p_quantity),
+        "notes": p_notes,
+        "is_partial": bool(p_is_partial),
+        "partial_notes": p_partial_notes,
+        "delivered_at": p_delivered_at or now,
+        "created_at": now
+    }).execute().data[0]
+    ref = f"Entrega {delivery['id']}"
+
+    if p_items is None:
+        recipe = client.table("basket_type_items").select("*").eq("basket_type_id", p_basket_type_id).execute().data
+        items = [(it["product_id"], float(it["quantity_required"]) * int(p_quantity)) for it in recipe]
+    else:
+        items = [(it["product_id"], float(it["qty"])) for it in p_items]
+
+    for product_id, qty in items:
+        if qty <= 0:
+            continue
+        apply_stock_movement(client, product_id, -qty, "saida_cesta", ref, p_created_at=now)
+        client.table("delivery_items").insert({
+            "delivery_id": delivery["id"],
+            "product_id": product_id,
+            "qty_delivered": qty
+        }).execute()
+
+    client.table("operation_keys").insert({"key": p_idempotency_key, "kind": "delivery", "result": delivery}).execute()
+    return delivery
+
+
+@rpc_function("checkout_basket_tx", touches=_DELIVERY_TABLES)
+def checkout_basket_tx(client, p_idempotency_key, p_basket_type_id, p_quantity, p_reference="Baixa rápida - Dashboard",
+                       p_created_at=None):
+    """Espelho de migrations/0002_register_delivery_tx.sql (com as datas da 0009)"""
+    stored = _stored_result(client, p_idempotency_key)
+    if stored is not None:
+        return stored
+
+    recipe = client.table("basket_type_items").select("*").eq("basket_type_id", p_basket_type_id).execute().data
+    if not recipe:
+        raise LocalBackendError("P0001", "Esta cesta não tem itens cadastrados. Cadastre a receita primeiro.")
+
+    for it in recipe:
+        apply_stock_movement(client, it["product_id"], -float(it["quantity_required"]) * int(p_quantity),
+                             "saida_cesta", p_reference, p_created_at=p_created_at)
+
+    result = {"basket_type_id": p_basket_type_id, "quantity": int(p_quantity), "items": len(recipe)}
+    client.table("operation_keys").insert({"key": p_idempotency_key, "kind": "checkout", "result": result}).execute()
+    return result
+
+
+@rpc_function("operation_dates_version", touches=())
+def operation_dates_version(client):
+    """Espelho de migrations/0009_operation_dates.sql (só leitura: a migration foi aplicada)"""
+    return 9
+
+
+# RPCs que o sync do banco local pode repetir em lote (migrations/0008)
+SYNC_BATCH_RPCS = ("apply_stock_movement", "register_delivery_tx", "checkout_basket_tx")
+
+
+@rpc_function("sync_rpc_batch", touches=_DELIVERY_TABLES)
+def sync_rpc_batch(client, p_calls):
+    """Espelho de migrations/0008_sync_rpc_batch.sql"""
+    for call in p_calls:
+        if call["fn"] not in SYNC_BATCH_RPCS:
+            raise LocalBackendError("P0001", f"sync_rpc_batch: função {call['fn']} não pode ser repetida em lote.")
+        RPC_FUNCTIONS[call["fn"]][0](client, **call["params"])
+    return len(p_calls)
+
+
+@rpc_function("compact_stock_movements", touches=("stock_movements",))
+def compact_stock_movements(client, p_before, p_ids, p_expected):
+    """Espelho de migrations/0010_compact_archived_ids.sql"""
+    ids = set(p_ids)
+    old = [r for r in client.table("stock_movements").select("*").lt("created_at", p_before)
+           .neq("movement_type", "compactado").execute().data if r["id"] in ids]
+    if len(old) != p_expected:
+        raise LocalBackendError("P0001", f"Compactação cancelada: {len(old)} movimentos a apagar, "
+                                         f"{p_expected} no arquivo.")
+
+    groups = {}
+    for r in old:
+        t = datetime.fromisoformat(r["created_at"]).astimezone(timezone.utc)
+        qty, n = groups.get((r["product_id"], t.year, t.month), (0.0, 0))
+        groups[(r["product_id"], t.year, t.month)] = (qty + float(r["qty_change"]), n + 1)
+
+    ids = [r["id"] for r in old]
+    for i in range(0, len(ids), 500):
+        client.table("stock_movements").delete().in_("id", ids[i:i + 500]).execute()
+
+    summaries = []
+    for (product_id, year, month), (qty, n) in groups.items():
+        end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc) - timedelta(microseconds=1)
+        summaries.append({
+            "product_id": product_id,
+            "qty_change": qty,
+            "movement_type": "compactado",
+            "reference": f"Compactação {year:04d}-{month:02d}: {n} movimentos",
+            "created_at": end.isoformat()
+        })
+    if summaries:
+        client.table("stock_movements").insert(summaries).execute()
+    return {"archived": len(old), "summaries": len(summaries)}
+
+
+@rpc_function("delivery_family_count", touches=())
+def delivery_family_count(client, p_start, p_end, p_cell_ids=None, p_leader_ids=None, p_basket_type_ids=None,
+                          p_supervisor_ids=None):
+    """Espelho de migrations/0011_delivery_family_count.sql (só leitura)"""
+    q = client.table("delivery_report").select("representative_phone") \
+        .gte("delivered_at", p_start).lt("delivered_at", p_end)
+    for column, ids in (("cell_id", p_cell_ids), ("leader_id", p_leader_ids),
+                        ("basket_type_id", p_basket_type_ids), ("supervisor_id", p_supervisor_ids)):
+        if ids is not None:
+            q = q.in_(column, ids)
+    # phone nulo = entrega sem família (families.representative_phone é not null): conta como "-"
+    return len({"-" if r["representative_phone"] is None else r["representative_phone"] for r in q.execute().data})
+
+
+# ==========================
+# STAND-INS DAS VIEWS (migrations/)
+# ==========================
+def row_checksum(id, family_id, leader_id, basket_type_id, quantity):
+    """Hash de uma entrega: 32 bits do md5, com sinal (mesma conta de migrations/0007)."""
+    text = "|".join("" if v is None else str(v) for v in (id, family_id, leader_id, basket_type_id, quantity))
+    value = int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+    return value - 2**32 if value >= 2**31 else value
+
+
+@rpc_function("delivery_checksums", touches=())
+def delivery_checksums(client, p_unit="month", p_start=None, p_end=None):
+    """Espelho de migrations/0007_delivery_checksums.sql (só leitura)"""
+    start = datetime.fromisoformat(p_start) if p_start else None
+    end = datetime.fromisoformat(p_end) if p_end else None
+    totals = {}
+    for d in client.table("deliveries").select("id", "family_id", "leader_id", "basket_type_id", "quantity",
+                                               "delivered_at").execute().data:
+        at = datetime.fromisoformat(d["delivered_at"]).astimezone(timezone.utc)
+        if (start and at < start) or (end and at >= end):
+            continue
+        day = at.date()
+        period = (day.replace(day=1) if p_unit == "month" else day).isoformat()
+        n, baskets, checksum = totals.get(period, (0, 0, 0))
+        totals[period] = (n + 1, baskets + d["quantity"],
+                          checksum + row_checksum(d["id"], d["family_id"], d["leader_id"], d["basket_type_id"],
+                                                  d["quantity"]))
+    return [{"period": p, "deliveries": n, "baskets": b, "checksum": c} for p, (n, b, c) in sorted(totals.items())]
+
+
+VIEWS = {}
+
+
+def view(name):
+    """Registra a versão Python de uma view: fn(tables) -> linhas."""
+    def deco(fn):
+        VIEWS[name] = fn
+        return fn
+    return deco
+
+
+@view("delivery_report")
+def delivery_report(tables):
+    """Espelho de migrations/0003_delivery_report_view.sql"""
+    def index(table):
+        return {r["id"]: r for r in tables.get(table, [])}
+
+    families, cells = index("families"), index("cells")
+    leaders, supers, baskets = index("cell_leaders"), index("supervisors"), index("basket_types")
+
+    out = []
+    for d in tables.get("deliveries", []):
+        fam = families.get(d.get("family_id")) or {}
+        cell = cells.get(fam.get("cell_id")) or {}
+        leader = leaders.get(d.get("leader_id")) or {}
+        basket = baskets.get(d.get("basket_type_id")) or {}
+        # supervisor da célula, senão o do líder
+        sup = supers.get(cell.get("supervisor_id")) or supers.get(leader.get("supervisor_id")) or {}
+        out.append({
+            "id": d["id"],
+            "created_at": d.get("created_at"),
+            "delivered_at": d.get("delivered_at"),
+            "quantity": d.get("quantity"),
+            "family_id": d.get("family_id"),
+            "leader_id": d.get("leader_id"),
+            "basket_type_id": d.get("basket_type_id"),
+            "cell_id": cell.get("id"),
+            "supervisor_id": sup.get("id"),
+            "representative_name": fam.get("representative_name"),
+            "representative_phone": fam.get("representative_phone"),
+            "cell_name": cell.get("cell_name"),
+            "cell_network": cell.get("network_name"),
+            "supervisor_name": sup.get("name"),
+            "supervisor_phone": sup.get("phone"),
+            "leader_name": leader.get("name"),
+            "leader_phone": leader.get("phone"),
+            "leader_network": leader.get("network_name"),
+            "basket_name": basket.get("name"),
+        })
+    return out
+
+
+# célula/líder/cesta ausente no cubo (mesmo valor de migrations/0006)
+NO_ID = "00000000-0000-0000-0000-000000000000"
+
+
+@view("delivery_cube")
+def delivery_cube(tables):
+    """Espelho de migrations/0006_delivery_cube.sql (lá a tabela é mantida por triggers)"""
+    family_cell = {f["id"]: f.get("cell_id") for f in tables.get("families", [])}
+    totals = {}
+    for d in tables.get("deliveries", []):
+        day = datetime.fromisoformat(d["delivered_at"]).astimezone(timezone.utc).date().isoformat()
+        key = (day, family_cell.get(d.get("family_id")) or NO_ID, d.get("leader_id") or NO_ID,
+               d.get("basket_type_id") or NO_ID)
+        n, baskets = totals.get(key, (0, 0))
+        totals[key] = (n + 1, baskets + int(d.get("quantity") or 0))
+    return [{
+        "id": str(uuid.uuid5(uuid.NAMESPACE_OID, "|".join(key))),
+        "day": key[0],
+        "cell_id": key[1],
+        "leader_id": key[2],
+        "basket_type_id": key[3],
+        "deliveries": n,
+        "baskets": baskets,
+    } for key, (n, baskets) in totals.items()]
+
+
+# ==========================
+# CLIENTE EM MEMÓRIA
+# ==========================
+# ✅ Como o Supabase: nenhum SELECT vindo de fora devolve mais que max-rows linhas
+#    (leituras internas das RPCs não têm limite, como dentro do Postgres)
+MAX_ROWS = int(os.getenv("DB_MAX_ROWS", "1000")) or None
+
+
+def max_rows_limit(limit, max_rows, depth):
+    """Limite efetivo de um SELECT: o pedido, cortado em max_rows fora das RPCs."""
+    if max_rows is None or depth > 0:
+        return limit
+    return max_rows if limit is None else min(limit, max_rows)
+
+
+class MemoryClient:
+    def __init__(self, tables=None, rpc_functions=None, views=None, max_rows=MAX_ROWS):
+        """
+        tables: {tabela: [linhas]} para já começar com dados
+        rpc_functions: substitui RPC_FUNCTIONS ({} simula banco sem migrations)
+        views: substitui VIEWS ({} simula banco sem migrations)
+        max_rows: corta cada SELECT como o max-rows do PostgREST (None = sem limite)
+        """
+        self._lock = threading.RLock()
+        self._depth = 0
+        # views são recalculadas só depois de alguma escrita (Postgres usaria índices)
+        self._version = 0
+        self._view_cache = {}
+        self.tables = {t: [dict(r) for r in rows] for t, rows in (tables or {}).items()}
+        self.rpc_functions = RPC_FUNCTIONS if rpc_functions is None else rpc_functions
+        self.views = VIEWS if views is None else views
+        self.max_rows = max_rows
+        # requests que teriam ido ao Supabase (chamadas internas das RPCs não contam)
+        self.request_count = 0
+
+    def table(self, name):
+        return Query(self, name)
+
+    from_ = table
+
+    def rpc(self, fn, params=None):
+        return RpcCall(self, fn, params)
+
+    @contextmanager
+    def transaction(self, tables):
+        """Trava o banco e restaura as tabelas se algo falhar no meio."""
+        with self._lock:
+            snapshot = {t: list(self.tables.get(t, [])) for t in tables}
+            self._depth += 1
+            try:
+                yield
+            except Exception:
+                self.tables.update(snapshot)
+                self._version += 1
+                raise
+            finally:
+                self._depth -= 1
+
+    def _call_rpc(self, fn, params):
+        with self._lock:
+            if self._depth == 0:
+                self.request_count += 1
+        if fn not in self.rpc_functions:
+            raise LocalBackendError("PGRST202", f"Could not find the function public.{fn}")
+        impl, touches = self.rpc_functions[fn]
+        with self.transaction(touches):
+            return impl(self, **params)
+
+    def _insert(self, table, data):
+        rows = data if isinstance(data, list) else [data]
+        out = []
+        for r in rows:
+            row = {"id": str(uuid.uuid4()), "created_at": _now()}
+            for col, default in _DEFAULTS.get(table, {}).items():
+                row[col] = default()
+            row.update(r)
+            out.append(row)
+        self.tables.setdefault(table, []).extend(out)
+        return [dict(r) for r in out]
+
+    def _upsert(self, table, data, on_conflict):
+        keys = [c.strip() for c in on_conflict.split(",")]
+        rows = self.tables.setdefault(table, [])
+        position = {tuple(r.get(k) for k in keys): i for i, r in enumerate(rows)}
+        out = []
+        for r in (data if isinstance(data, list) else [data]):
+            i = position.get(tuple(r.get(k) for k in keys))
+            if i is None:
+                out.extend(self._insert(table, r))
+            else:
+                rows[i] = {**rows[i], **r}
+                out.append(dict(rows[i]))
+        return out
+
+    def _execute(self, q):
+        with self._lock:
+            if self._depth == 0:
+                self.request_count += 1
+
+            if q.table in VIEWS:
+                if q.table not in self.views:
+                    raise LocalBackendError("PGRST205", f"Could not find the table 'public.{q.table}' in the schema cache")
+                if q.op != "select":
+                    raise LocalBackendError("55000", f"cannot change view \"{q.table}\"")
+                cached = self._view_cache.get(q.table)
+                if cached is None or cached[0] != self._version:
+                    cached = (self._version, self.views[q.table](self.tables))
+                    self._view_cache[q.table] = cached
+                rows = cached[1]
+            else:
+                rows = self.tables.setdefault(q.table, [])
+
+            if q.op != "select":
+                self._version += 1
+
+            if q.op == "insert":
+                return Response(self._insert(q.table, q.payload))
+
+            if q.op == "upsert":
+                return Response(self._upsert(q.table, q.payload, q.on_conflict))
+
+            if q.op == "update":
+                out = []
+                for i, r in enumerate(rows):
+                    if q.matches(r):
+                        # ✅ copy-on-write: snapshots de transação continuam válidos
+                        rows[i] = {**r, **q.payload}
+                        out.append(dict(rows[i]))
+                return Response(out)
+
+            if q.op == "delete":
+                out = [dict(r) for r in rows if q.matches(r)]
+                self.tables[q.table] = [r for r in rows if not q.matches(r)]
+                return Response(out)
+
+            data = [r for r in rows if q.matches(r)]
+            for column, desc in reversed(q.orders):
+                data.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+            if q.offset_n:
+                data = data[q.offset_n:]
+            limit = max_rows_limit(q.limit_n, self.max_rows, self._depth)
+            if limit is not None:
+                data = data[:limit]
+            if q.columns != "*":
+                cols = [c.strip() for c in q.columns.split(",")]
+                data = [{c: r.get(c) for c in cols} for r in data]
+            else:
+                data = [dict(r) for r in data]
+            return Response(data)
+
+
+def load_tables(path):
+    """Lê um JSON {tabela: [linhas]} para usar como MemoryClient(tables=...)."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ==========================
+# LATÊNCIA SIMULADA
+# ==========================
+def _delayed(attr, delay):
+    if not callable(attr):
+        return attr
+
+    def call(*args, **kwargs):
+        if getattr(attr, "__name__", None) == "execute":
+            time.sleep(delay())
+            return attr(*args, **kwargs)
+        out = attr(*args, **kwargs)
+        # builders (table(), select(), eq()...) continuam embrulhados até o execute()
+        return _Delayed(out, delay) if hasattr(out, "execute") else out
+    return call
+
+
+class _Delayed:
+    def __init__(self, target, delay):
+        self._target = target
+        self._delay = delay
+
+    def __getattr__(self, name):
+        return _delayed(getattr(self._target, name), self._delay)
+
+
+class LatencyClient(_Delayed):
+    """
+    Embrulha qualquer cliente (MemoryClient ou o Supabase de verdade) e espera
+    latency_ms (± jitter_ms) antes de cada execute(), como uma ida ao servidor.
+    O resto (table, rpc, filtros, atributos do cliente) passa direto.
+    """
+
+    def __init__(self, client, latency_ms, jitter_ms=0.0):
+        super().__init__(client, self._sample)
+        self.latency_ms = float(latency_ms)
+        self.jitter_ms = float(jitter_ms)
+
+    def _sample(self):
+        ms = self.latency_ms
+        if self.jitter_ms:
+            ms += random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, ms) / 1000.0
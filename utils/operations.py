@@ -1,59 +1,127 @@
-from utils.db import fetch_table, update_row, insert_row
+from utils.db import fetch_table, insert_row, insert_rows, upsert_rows, call_rpc, MigrationMissing
 from datetime import datetime
+import uuid
 
 
-def add_stock(product_id, qty, movement_type="entrada", reference=None):
-    inv = fetch_table("inventory", {"product_id": product_id})
-    current = float(inv[0]["quantity"]) if inv else 0.0
-    new_qty = current + float(qty)
-
-    if inv:
-        update_row(
-            "inventory",
-            {"product_id": product_id},
-            {"quantity": new_qty, "updated_at": datetime.utcnow().isoformat()}
-        )
-    else:
-        insert_row("inventory", {"product_id": product_id, "quantity": new_qty})
+# Tabelas escritas pelas funções de entrega (para invalidar o cache)
+DELIVERY_TABLES = ("deliveries", "delivery_items", "inventory", "stock_movements", "operation_keys")
 
-    insert_row("stock_movements", {
-        "product_id": product_id,
-        "qty_change": float(qty),
-        "movement_type": movement_type,
-        "reference": reference
-    })
 
+def new_idempotency_key():
+    """Chave única por operação: guarde no session_state e reenvie em reruns."""
+    return str(uuid.uuid4())
 
-def register_delivery(family_id, leader_id, basket_type_id, quantity, recipient_name, notes=None):
+
+def add_stock(product_id, qty, movement_type="entrada", reference=None):
     """
-    Registra entrega completa e baixa o estoque baseado na receita.
+    Entrada (+) ou baixa (-) de estoque atômica.
+    A função apply_stock_movement (migrations/0001) soma o delta no banco e
+    grava o stock_movements na mesma transação: 1 round-trip e sem lost update.
+    Retorna a nova quantidade em estoque.
     """
-    delivery = insert_row("deliveries", {
-        "family_id": family_id,
-        "leader_id": leader_id,
-        "basket_type_id": basket_type_id,
-        "quantity": int(quantity),
-        "notes": notes,
-        "is_partial": False,
-        "partial_notes": None
-    })[0]
-
-    items = fetch_table("basket_type_items", {"basket_type_id": basket_type_id})
-    for it in items:
-        product_id = it["product_id"]
-        req = float(it["quantity_required"])
-        total_to_remove = req * int(quantity)
+    try:
+        return call_rpc("apply_stock_movement", {
+            "p_product_id": product_id,
+            "p_qty_change": float(qty),
+            "p_movement_type": movement_type,
+            "p_reference": reference
+        }, touches=("inventory", "stock_movements"))
+    except MigrationMissing:
+        return _add_stock_read_modify_write(product_id, qty, movement_type, reference)
+
+
+def _add_stock_read_modify_write(product_id, qty, movement_type, reference):
+    """
+    ⚠️ Caminho antigo, só usado enquanto a migration 0001 não foi aplicada.
+    Não é atômico: duas baixas simultâneas podem perder atualização.
+    """
+    return _apply_stock_changes_client_side([(product_id, float(qty))], movement_type, reference)[product_id]
 
-        add_stock(product_id, -total_to_remove, movement_type="saida_cesta", reference=f"Entrega {delivery['id']}")
 
-        # registra item entregue (receita padrão)
-        insert_row("delivery_items", {
-            "delivery_id": delivery["id"],
+def _apply_stock_changes_client_side(changes, movement_type, reference):
+    """
+    Aplica vários deltas de estoque (sem a migration 0001) em lote:
+    1 leitura do inventory (só os produtos alterados) + 1 upsert + 1 insert de
+    stock_movements, independente do número de itens.
+    changes: [(product_id, delta)]
+    Retorna {product_id: nova_quantidade}
+    """
+    pids = sorted({pid for pid, _ in changes})
+    inv = {r["product_id"]: r for r in fetch_table("inventory", {"product_id__in": pids}, use_cache=False)}
+    now = datetime.utcnow().isoformat()
+
+    new_qty = {}
+    for product_id, delta in changes:
+        current = new_qty.get(product_id, float(inv[product_id]["quantity"]) if product_id in inv else 0.0)
+        new_qty[product_id] = current + float(delta)
+
+    updated = [
+        {**inv[pid], "quantity": qty, "updated_at": now}
+        for pid, qty in new_qty.items() if pid in inv
+    ]
+    created = [
+        {"product_id": pid, "quantity": qty}
+        for pid, qty in new_qty.items() if pid not in inv
+    ]
+
+    upsert_rows("inventory", updated)
+    insert_rows("inventory", created)
+    insert_rows("stock_movements", [
+        {
             "product_id": product_id,
-            "qty_delivered": total_to_remove
-        })
+            "qty_change": float(delta),
+            "movement_type": movement_type,
+            "reference": reference
+        }
+        for product_id, delta in changes
+    ])
+    return new_qty
 
-    return delivery
+
+def delivery_tx_params(idempotency_key, family_id, leader_id, basket_type_id, quantity, notes=None,
+                       is_partial=False, partial_notes=None, items=None, delivered_at=None, created_at=None):
+    """
+    Parâmetros do register_delivery_tx (migrations/0002).
+    items: [(product_id, qty_total)] ou None para a receita padrão x quantity
+    delivered_at / created_at: datas ISO de uma entrega feita antes (fila, sync);
+    só vão no request quando informadas (parâmetros da migrations/0009)
+    """
+    params = {
+        "p_idempotency_key": idempotency_key or new_idempotency_key(),
+        "p_family_id": family_id,
+        "p_leader_id": leader_id,
+        "p_basket_type_id": basket_type_id,
+        "p_quantity": int(quantity),
+        "p_notes": notes,
+        "p_is_partial": bool(is_partial),
+        "p_partial_notes": partial_notes,
+        "p_items": None if items is None else [{"product_id": pid, "qty": qty} for pid, qty in items]
+    }
+    # ⚠️ o PostgREST escolhe a função pelos nomes: sem a 0009, p_delivered_at não existe
+    if delivered_at is not None:
+        params["p_delivered_at"] = delivered_at
+    if created_at is not None:
+        params["p_created_at"] = created_at
+    return params
+
+
+def register_delivery(family_id, leader_id, basket_type_id, quantity, recipient_name, notes=None,
+                      idempotency_key=None):
+    """
+    Registra entrega completa e baixa o estoque baseado na receita.
+    Tudo numa transação no banco (register_delivery_tx, migrations/0002).
+    Repetir a chamada com a mesma idempotency_key devolve a mesma entrega.
+    """
+    try:
+        return call_rpc("register_delivery_tx", delivery_tx_params(
+            idempotency_key, family_id, leader_id, basket_type_id, quantity, notes
+        ), touches=DELIVERY_TABLES)
+    except MigrationMissing:
+        items = fetch_table("basket_type_items", {"basket_type_id": basket_type_id})
+        return _register_delivery_client_side(
+            family_id, leader_id, basket_type_id, quantity, notes, False, None,
+            [(it["product_id"], float(it["quantity_required"]) * int(quantity)) for it in items]
+        )
 
 
 def register_delivery_custom_items(
@@ -65,11 +133,62 @@ def register_delivery_custom_items(
     items_dict,
     notes=None,
     is_partial=True,
-    partial_notes=None
+    partial_notes=None,
+    idempotency_key=None
 ):
     """
     Registra entrega com itens customizados (qualquer ajuste permitido).
     items_dict: {product_id: qty_total_entregue}
+    Itens com quantidade 0 são ignorados.
+    """
+    items = [(pid, float(qty)) for pid, qty in items_dict.items() if float(qty) > 0]
+    try:
+        return call_rpc("register_delivery_tx", delivery_tx_params(
+            idempotency_key, family_id, leader_id, basket_type_id, quantity, notes, is_partial, partial_notes, items
+        ), touches=DELIVERY_TABLES)
+    except MigrationMissing:
+        return _register_delivery_client_side(
+            family_id, leader_id, basket_type_id, quantity, notes, is_partial, partial_notes, items
+        )
+
+
+def quick_basket_checkout(basket_type_id, quantity, reference="Baixa rápida - Dashboard", idempotency_key=None):
+    """
+    Baixa estoque baseado na receita SEM registrar entrega.
+    """
+    try:
+        return call_rpc("checkout_basket_tx", {
+            "p_idempotency_key": idempotency_key or new_idempotency_key(),
+            "p_basket_type_id": basket_type_id,
+            "p_quantity": int(quantity),
+            "p_reference": reference
+        }, touches=DELIVERY_TABLES)
+    except MigrationMissing:
+        return _quick_basket_checkout_client_side(basket_type_id, quantity, reference)
+
+
+def _quick_basket_checkout_client_side(basket_type_id, quantity, reference):
+    """⚠️ Caminho antigo (sem a migration 0002): escritas em lote, sem transação."""
+    items = fetch_table("basket_type_items", {"basket_type_id": basket_type_id})
+
+    if not items:
+        raise Exception("Esta cesta não tem itens cadastrados. Cadastre a receita primeiro.")
+
+    _apply_stock_changes_client_side(
+        [(it["product_id"], -float(it["quantity_required"]) * int(quantity)) for it in items],
+        movement_type="saida_cesta",
+        reference=reference
+    )
+
+    return {"basket_type_id": basket_type_id, "quantity": int(quantity), "items": len(items)}
+
+
+def _register_delivery_client_side(family_id, leader_id, basket_type_id, quantity, notes, is_partial,
+                                   partial_notes, items):
+    """
+    ⚠️ Caminho antigo (sem a migration 0002): sem transação nem idempotência.
+    Usa escritas em lote: ~5 requests por entrega, seja qual for o tamanho da cesta.
+    items: [(product_id, qty_total)]
     """
     delivery = insert_row("deliveries", {
         "family_id": family_id,
@@ -81,38 +200,15 @@ def register_delivery_custom_items(
         "partial_notes": partial_notes
     })[0]
 
-    for product_id, qty in items_dict.items():
-        qty = float(qty)
+    _apply_stock_changes_client_side(
+        [(product_id, -qty) for product_id, qty in items],
+        movement_type="saida_cesta",
+        reference=f"Entrega {delivery['id']}"
+    )
 
-        # ignora itens com 0
-        if qty <= 0:
-            continue
-
-        # baixa estoque
-        add_stock(product_id, -qty, movement_type="saida_cesta", reference=f"Entrega {delivery['id']}")
-
-        # registra item entregue
-        insert_row("delivery_items", {
-            "delivery_id": delivery["id"],
-            "product_id": product_id,
-            "qty_delivered": qty
-        })
+    insert_rows("delivery_items", [
+        {"delivery_id": delivery["id"], "product_id": product_id, "qty_delivered": qty}
+        for product_id, qty in items
+    ])
 
     return delivery
-
-
-def quick_basket_checkout(basket_type_id, quantity, reference="Baixa rápida - Dashboard"):
-    """
-    Baixa estoque baseado na receita SEM registrar entrega.
-    """
-    items = fetch_table("basket_type_items", {"basket_type_id": basket_type_id})
-
-    if not items:
-        raise Exception("Esta cesta não tem itens cadastrados. Cadastre a receita primeiro.")
-
-    for it in items:
-        product_id = it["product_id"]
-        req = float(it["quantity_required"])
-        total_to_remove = req * int(quantity)
-
-        add_stock(product_id, -total_to_remove, movement_type="saida_cesta", reference=reference)
@@ -0,0 +1,135 @@
+"""
+Instrumentação das chamadas ao banco (utils/db).
+
+Cada rerun de página abre um log (apply_global_layout chama start). Todas as chamadas
+feitas pelo utils/db entram nele: tabela, operação, filtros, linhas, bytes
+e tempo. Leituras servidas pelo cache também aparecem, marcadas como cached.
+
+Liga com variáveis de ambiente:
+- DB_DEBUG=1            mostra o resumo do rerun na sidebar
+- DB_QUERY_LOG=arquivo  grava cada chamada em JSON lines (análise offline)
+
+Sem nenhuma das duas, nada é registrado (custo zero).
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+
+DEBUG = os.getenv("DB_DEBUG", "").lower() in ("1", "true", "yes", "on")
+LOG_PATH = os.getenv("DB_QUERY_LOG") or None
+ENABLED = DEBUG or LOG_PATH is not None
+
+_current = contextvars.ContextVar("query_log", default=None)
+_file_lock = threading.Lock()
+
+
+def _json(value):
+    return json.dumps(value, default=str, ensure_ascii=False, sort_keys=True)
+
+
+class QueryLog:
+    """Chamadas de um rerun. add() pode vir de várias threads (fetch_many)."""
+
+    def __init__(self, page=None, path=None, on_change=None):
+        self.rerun_id = uuid.uuid4().hex[:12]
+        self.page = page
+        self.path = path
+        self.on_change = on_change
+        self.records = []
+        self._lock = threading.Lock()
+        self._owner = threading.get_ident()
+
+    def add(self, record):
+        record = {"rerun_id": self.rerun_id, "page": self.page, **record}
+        with self._lock:
+            self.records.append(record)
+        if self.path:
+            with _file_lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(_json(record) + "\n")
+        self.refresh()
+
+    def refresh(self):
+        # Streamlit só pode ser atualizado pela thread do script
+        if self.on_change and threading.get_ident() == self._owner:
+            self.on_change(self)
+
+    def summary(self):
+        return summarize(self.records)
+
+    def to_jsonl(self):
+        with self._lock:
+            return "".join(_json(r) + "\n" for r in self.records)
+
+
+def start(page=None, on_change=None):
+    """Abre o log do rerun atual (None se a instrumentação estiver desligada)."""
+    if not ENABLED:
+        _current.set(None)
+        return None
+    log = QueryLog(page=page, path=LOG_PATH, on_change=on_change)
+    _current.set(log)
+    return log
+
+
+def current():
+    return _current.get()
+
+
+def refresh():
+    log = _current.get()
+    if log is not None:
+        log.refresh()
+
+
+def payload_bytes(data):
+    return len(_json(data).encode("utf-8")) if data is not None else 0
+
+
+def record(table, op, params=None, data=None, elapsed=0.0, sent=None, cached=False, error=None):
+    """Registra uma chamada no log do rerun (se houver)."""
+    log = _current.get()
+    if log is None:
+        return
+    log.add({
+        "ts": time.time(),
+        "table": table,
+        "op": op,
+        "params": params or {},
+        "rows": len(data) if isinstance(data, list) else (0 if data is None else 1),
+        "bytes": payload_bytes(data),
+        "sent_bytes": payload_bytes(sent),
+        "ms": round(elapsed * 1000, 2),
+        "cached": cached,
+        "error": error,
+    })
+
+
+def summarize(records):
+    """
+    Resumo de um rerun.
+    Retorna:
+    - queries: chamadas que foram ao banco
+    - total_ms: soma do tempo dessas chamadas
+    - cache_hits: leituras servidas pelo cache
+    - slowest: a chamada mais lenta (ou None)
+    - duplicates: [(tabela, operação, vezes)] de chamadas idênticas repetidas
+    """
+    calls = [r for r in records if not r["cached"]]
+    counts = {}
+    for r in calls:
+        sig = (r["table"], r["op"], _json(r["params"]))
+        counts[sig] = counts.get(sig, 0) + 1
+
+    return {
+        "queries": len(calls),
+        "total_ms": round(sum(r["ms"] for r in calls), 2),
+        "cache_hits": len(records) - len(calls),
+        "slowest": max(calls, key=lambda r: r["ms"]) if calls else None,
+        "duplicates": sorted(
+            ((table, op, n) for (table, op, _), n in counts.items() if n > 1),
+            key=lambda d: -d[2]
+        ),
+    }
@@ -0,0 +1,574 @@
+"""
+Relatório de entregas (páginas de Relatórios).
+
+Os filtros da tela viram predicados no banco: só vêm as entregas do período
+e dos filtros escolhidos, e só as famílias que essas entregas referenciam.
+
+Com a migration 0003 instalada o join inteiro é feito pela view
+delivery_report; sem ela, o join é montado aqui (build_report_frame).
+
+Nas páginas, o período vem do banco uma vez (ReportIndex) e os filtros de
+líder/cesta/célula/rede/supervisor viram intersecção de índices em memória.
+Com DELIVERY_CACHE=1 as entregas do período vêm do arquivo local
+(utils.delivery_cache) e só as famílias e dimensões vêm do banco.
+"""
+import io
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from utils.db import (fetch_table, fetch_many, fetch_by_ids, iter_table, iter_table_frames, table_version,
+                      MigrationMissing, IN_CHUNK_SIZE, PAGE_SIZE, CACHE_TTL_SECONDS, VIEW_DEPENDENCIES)
+from utils import delivery_cache
+
+DELIVERY_COLUMNS = ["id", "delivered_at", "family_id", "leader_id", "basket_type_id", "quantity"]
+FAMILY_COLUMNS = ["id", "representative_name", "representative_phone", "cell_id"]
+
+REPORT_COLUMNS = [
+    "Data",
+    "Representante",
+    "Telefone Representante",
+    "Célula",
+    "Rede da Célula",
+    "Supervisor",
+    "Telefone Supervisor",
+    "Líder",
+    "Telefone Líder",
+    "Rede do Líder",
+    "Cesta",
+    "Quantidade",
+]
+
+# ✅ textos repetidos (nomes, telefones, redes) viram category: 1 cópia de cada texto + códigos inteiros
+CATEGORY_COLUMNS = [c for c in REPORT_COLUMNS if c not in ("Data", "Quantidade")]
+
+# filtro da tela -> coluna do relatório
+FILTER_COLUMNS = {
+    "network": "Rede da Célula",
+    "leader": "Líder",
+    "basket": "Cesta",
+    "cell": "Célula",
+    "supervisor": "Supervisor",
+}
+
+# períodos guardados em memória, por tipo (ver period_cache)
+REPORT_INDEX_ENTRIES = 4
+
+# coluna da view delivery_report -> coluna do relatório
+VIEW_COLUMNS = {
+    "delivered_at": "Data",
+    "representative_name": "Representante",
+    "representative_phone": "Telefone Representante",
+    "cell_name": "Célula",
+    "cell_network": "Rede da Célula",
+    "supervisor_name": "Supervisor",
+    "supervisor_phone": "Telefone Supervisor",
+    "leader_name": "Líder",
+    "leader_phone": "Telefone Líder",
+    "leader_network": "Rede do Líder",
+    "basket_name": "Cesta",
+    "quantity": "Quantidade",
+}
+
+
+def load_dimensions():
+    """
+    Tabelas pequenas usadas nos filtros e no join (famílias ficam de fora:
+    são carregadas só as referenciadas pelas entregas).
+    """
+    return fetch_many({
+        "leaders": ("cell_leaders", {"columns": ["id", "name", "phone", "network_name", "supervisor_id"]}),
+        "baskets": ("basket_types", {"columns": ["id", "name"]}),
+        "cells": ("cells", {"columns": ["id", "cell_name", "network_name", "supervisor_id"]}),
+        "supers": ("supervisors", {"columns": ["id", "name", "phone"]}),
+    })
+
+
+def filter_options(dims):
+    """
+    Opções dos selectboxes (nomes ordenados), a partir das dimensões.
+    "-" = entregas sem célula/líder/cesta/supervisor (ou com o cadastro
+    apagado), como aparecem no relatório.
+    """
+    def names(rows, col):
+        return sorted({r[col] for r in rows if r.get(col)} | {"-"})
+
+    return {
+        "networks": names(dims["cells"], "network_name"),
+        "leaders": names(dims["leaders"], "name"),
+        "baskets": names(dims["baskets"], "name"),
+        "cells": names(dims["cells"], "cell_name"),
+        "supers": names(dims["supers"], "name"),
+    }
+
+
+def _ids(rows, col, value):
+    return {r["id"] for r in rows if r.get(col) == value}
+
+
+def _split_in(filters, column, values):
+    """Quebra um filtro column__in grande em vários dicts de filtro."""
+    values = sorted(values)
+    for i in range(0, len(values), IN_CHUNK_SIZE):
+        yield {**filters, f"{column}__in": values[i:i + IN_CHUNK_SIZE]}
+
+
+def _period(start, end):
+    return {
+        "delivered_at__gte": f"{start.isoformat()}T00:00:00+00:00",
+        "delivered_at__lt": f"{(end + timedelta(days=1)).isoformat()}T00:00:00+00:00",
+    }
+
+
+def _view_queries(start, end, dims, network=None, leader=None, basket=None, cell=None, supervisor=None):
+    """
+    Filtros da tela -> filtros exatos na view delivery_report (ela já traz o
+    supervisor efetivo). Retorna None se nenhum registro pode passar.
+    """
+    filters = _period(start, end)
+    id_filters = []
+    if leader:
+        id_filters.append(("leader_id__in", _ids(dims["leaders"], "name", leader)))
+    if basket:
+        id_filters.append(("basket_type_id__in", _ids(dims["baskets"], "name", basket)))
+    if supervisor:
+        id_filters.append(("supervisor_id__in", _ids(dims["supers"], "name", supervisor)))
+    for column, ids in id_filters:
+        if not ids:
+            return None
+        filters[column] = sorted(ids)
+
+    if cell or network:
+        cell_ids = {c["id"] for c in dims["cells"]
+                    if (not cell or c["cell_name"] == cell) and (not network or c["network_name"] == network)}
+        if not cell_ids:
+            return None
+        return list(_split_in(filters, "cell_id", cell_ids))
+    return [filters]
+
+
+def _load_from_view(start, end, dims, **filters):
+    queries = _view_queries(start, end, dims, **filters)
+
+    rows = {}
+    for f in queries or []:
+        for r in iter_table("delivery_report", f, columns=["id", *VIEW_COLUMNS], key="delivered_at"):
+            rows[r["id"]] = r
+
+    df = pd.DataFrame(list(rows.values()), columns=["id", *VIEW_COLUMNS])
+    df = df.rename(columns=VIEW_COLUMNS)[REPORT_COLUMNS]
+    # left joins sem par voltam null: mesmo "-" do join feito no app
+    text_cols = [c for c in REPORT_COLUMNS if c not in ("Data", "Quantidade")]
+    df[text_cols] = df[text_cols].fillna("-")
+    return df
+
+
+def _delivery_queries(start, end, dims, network=None, leader=None, basket=None, cell=None, supervisor=None):
+    """
+    Traduz os filtros da tela em uma lista de filtros de fetch para deliveries.
+    A união dos resultados contém todas as entregas que passam nos filtros.
+    Retorna None se nenhum registro pode passar.
+    """
+    base = _period(start, end)
+
+    leader_ids = None
+    if leader:
+        leader_ids = _ids(dims["leaders"], "name", leader)
+    if basket:
+        base["basket_type_id__in"] = sorted(_ids(dims["baskets"], "name", basket))
+        if not base["basket_type_id__in"]:
+            return None
+
+    # célula / rede -> famílias dessas células
+    family_ids = None
+    if cell or network:
+        cell_ids = {c["id"] for c in dims["cells"]
+                    if (not cell or c["cell_name"] == cell) and (not network or c["network_name"] == network)}
+        if not cell_ids:
+            return None
+        family_ids = {f["id"] for f in _families_in_cells(cell_ids)}
+
+    if not supervisor:
+        queries = [(base, family_ids, leader_ids)]
+    else:
+        # supervisor efetivo = supervisor da célula, senão o do líder:
+        # 1) famílias de células desse supervisor
+        # 2) entregas de líderes desse supervisor (filtro exato depois do join)
+        sup_ids = _ids(dims["supers"], "name", supervisor)
+        sup_cells = {c["id"] for c in dims["cells"] if c.get("supervisor_id") in sup_ids}
+        sup_leaders = {l["id"] for l in dims["leaders"] if l.get("supervisor_id") in sup_ids}
+
+        by_cell = {f["id"] for f in _families_in_cells(sup_cells)} if sup_cells else set()
+        if family_ids is not None:
+            by_cell &= family_ids
+        by_leader = sup_leaders if leader_ids is None else sup_leaders & leader_ids
+
+        queries = []
+        if by_cell:
+            queries.append((base, by_cell, leader_ids))
+        if by_leader:
+            queries.append((base, family_ids, by_leader))
+
+    out = []
+    for filters, fams, leads in queries:
+        if (fams is not None and not fams) or (leads is not None and not leads):
+            continue
+        if leads is not None:
+            filters = {**filters, "leader_id__in": sorted(leads)}
+        if fams is not None:
+            out.extend(_split_in(filters, "family_id", fams))
+        else:
+            out.append(filters)
+    return out
+
+
+def _families_in_cells(cell_ids):
+    out = []
+    for filters in _split_in({}, "cell_id", cell_ids):
+        out.extend(fetch_table("families", filters, columns=["id"]))
+    return out
+
+
+def _dim(rows, columns):
+    # mesmo id repetido: vale o último (como no {id: row} do join antigo)
+    return pd.DataFrame(rows, columns=["id", *columns]).drop_duplicates("id", keep="last")
+
+
+def _positions(dim, keys):
+    """Posição de cada key na dimensão (-1 = não existe)."""
+    return pd.Index(dim["id"]).get_indexer(keys)
+
+
+def _take(values, pos):
+    # ✅ pos -1 cai no "-" extra do fim: registro ausente -> "-", sem laço
+    return np.append(np.asarray(values, dtype=object), "-")[pos]
+
+
+def _follow(positions, pos):
+    """positions[pos], com -1 (ausente) propagado."""
+    return np.append(positions, -1)[pos]
+
+
+def build_report_frame(deliveries, families, dims):
+    """
+    Join entrega -> família -> célula -> supervisor (fallback: líder) -> cesta,
+    vetorizado: o join célula/supervisor é feito nas dimensões (poucas linhas)
+    e cada entrega só faz 3 buscas de posição (família, líder, cesta).
+    - deliveries: DataFrame ou lista de dicts com DELIVERY_COLUMNS
+    Retorna DataFrame com REPORT_COLUMNS, na ordem das entregas.
+    """
+    d = deliveries if isinstance(deliveries, pd.DataFrame) else pd.DataFrame(deliveries, columns=DELIVERY_COLUMNS)
+    if d.empty:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+
+    fams = _dim(families, ["representative_name", "representative_phone", "cell_id"])
+    cells = _dim(dims["cells"], ["cell_name", "network_name", "supervisor_id"])
+    leaders = _dim(dims["leaders"], ["name", "phone", "network_name", "supervisor_id"])
+    baskets = _dim(dims["baskets"], ["name"])
+    supers = _dim(dims["supers"], ["name", "phone"])
+
+    # nas dimensões: célula da família, supervisor da célula e do líder
+    fam_cell = _positions(cells, fams["cell_id"])
+    cell_super = _positions(supers, cells["supervisor_id"])
+    leader_super = _positions(supers, leaders["supervisor_id"])
+
+    # por entrega
+    f = _positions(fams, d["family_id"])
+    l = _positions(leaders, d["leader_id"])
+    b = _positions(baskets, d["basket_type_id"])
+    c = _follow(fam_cell, f)
+
+    # ======= SUPERVISOR (fallback: célula -> líder) =======
+    by_cell = _follow(cell_super, c)
+    by_leader = _follow(leader_super, l)
+    sup = np.where(by_cell >= 0, by_cell, by_leader)
+
+    return pd.DataFrame({
+        "Data": d["delivered_at"].to_numpy(),
+        "Representante": _take(fams["representative_name"], f),
+        "Telefone Representante": _take(fams["representative_phone"], f),
+        "Célula": _take(cells["cell_name"], c),
+        "Rede da Célula": _take(cells["network_name"], c),
+        "Supervisor": _take(supers["name"], sup),
+        "Telefone Supervisor": _take(supers["phone"], sup),
+        "Líder": _take(leaders["name"], l),
+        "Telefone Líder": _take(leaders["phone"], l),
+        "Rede do Líder": _take(leaders["network_name"], l),
+        "Cesta": _take(baskets["name"], b),
+        "Quantidade": d["quantity"].to_numpy(),
+    }, columns=REPORT_COLUMNS, copy=False)
+
+
+def report_from_deliveries(deliveries, dims):
+    """
+    Entregas (DataFrame com DELIVERY_COLUMNS) -> relatório, buscando só as famílias referenciadas.
+    ⚠️ Muitas famílias (ex: 1 ano do cache local): a tabela inteira em páginas de
+    PAGE_SIZE sai mais barata que blocos de IN_CHUNK_SIZE ids.
+    """
+    ids = deliveries["family_id"].dropna().unique()
+    if len(ids) > PAGE_SIZE:
+        families = fetch_table("families", columns=FAMILY_COLUMNS)
+    else:
+        families = fetch_by_ids("families", ids.tolist(), columns=FAMILY_COLUMNS)
+    return build_report_frame(deliveries, families, dims)
+
+
+def _load_client_side(start, end, dims, network=None, leader=None, basket=None, cell=None, supervisor=None):
+    queries = _delivery_queries(start, end, dims, network, leader, basket, cell, supervisor)
+
+    frames = [page[DELIVERY_COLUMNS] for filters in queries or []
+              for page in iter_table_frames("deliveries", filters, columns=DELIVERY_COLUMNS, key="delivered_at")]
+    deliveries = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=DELIVERY_COLUMNS)
+    # as consultas podem se sobrepor (ex: supervisor por célula e por líder)
+    deliveries = deliveries.drop_duplicates("id").reset_index(drop=True)
+    df = report_from_deliveries(deliveries, dims)
+
+    # o filtro de supervisor no banco é um superconjunto (fallback célula -> líder)
+    if supervisor:
+        df = df[df["Supervisor"] == supervisor]
+    return df
+
+
+def load_report(start, end, dims, network=None, leader=None, basket=None, cell=None, supervisor=None):
+    """
+    Monta o DataFrame do relatório só com as entregas que passam nos filtros.
+    - start/end: datas (inclusive), comparadas em UTC
+    - demais filtros: nome exibido na tela (None = todos)
+    Lê a view delivery_report; sem a migration, faz o join no app.
+    """
+    filters = dict(network=network, leader=leader, basket=basket, cell=cell, supervisor=supervisor)
+    # ⚠️ "-" (sem o cadastro) não tem id para filtrar no banco: filtro exato depois do join
+    missing = [name for name, value in filters.items() if value == "-"]
+    pushed = {name: None if name in missing else value for name, value in filters.items()}
+    try:
+        df = _load_from_view(start, end, dims, **pushed)
+    except MigrationMissing:
+        df = _load_client_side(start, end, dims, **pushed)
+    for name in missing:
+        df = df[df[FILTER_COLUMNS[name]] == "-"]
+    return _finish_report(df)
+
+
+def _finish_report(df):
+    # ✅ Converte Data já removendo timezone (Excel friendly)
+    # ⚠️ ISO8601: sem isso o formato vem da 1ª linha e datas com/sem fração de segundo viram NaT
+    df["Data"] = pd.to_datetime(df["Data"], errors="coerce", utc=True, format="ISO8601").dt.tz_localize(None)
+    return compact_report(df.sort_values("Data", kind="stable").reset_index(drop=True))
+
+
+def compact_report(df):
+    """Colunas de texto do relatório -> category (mesmos valores, bem menos memória)."""
+    cols = [c for c in CATEGORY_COLUMNS if c in df.columns and not isinstance(df[c].dtype, pd.CategoricalDtype)]
+    return df.astype({c: "category" for c in cols}) if cols else df
+
+
+def _day(value):
+    """date -> dias desde 1970-01-01 (mesma escala de ReportIndex.day)."""
+    return (value - date(1970, 1, 1)).days
+
+
+class ReportIndex:
+    """
+    Relatório de um período em memória, pronto para filtrar sem varrer o frame:
+    - df: relatório compacto (category), ordenado por Data
+    - day: dia UTC de cada linha (int32, dias desde 1970-01-01), crescente
+    - groups[coluna][valor]: posições (ordenadas) das linhas com aquele valor
+    Filtrar = recorte do período por busca binária + intersecção das posições.
+    """
+
+    def __init__(self, df):
+        self.df = compact_report(df.sort_values("Data", kind="stable").reset_index(drop=True))
+        days = self.df["Data"].to_numpy(dtype="datetime64[D]")
+        # NaT (sem data) ficam no fim e fora de qualquer período
+        self.day = np.where(np.isnat(days), np.iinfo(np.int32).max, days.astype("int64")).astype(np.int32)
+        self.groups = {
+            col: self.df.groupby(col, observed=True, sort=False).indices
+            for col in FILTER_COLUMNS.values()
+        }
+
+    def __len__(self):
+        return len(self.df)
+
+    def positions(self, start=None, end=None, **filters):
+        """Posições das linhas no período (datas inclusive) que passam em todos os filtros."""
+        lo = 0 if start is None else int(np.searchsorted(self.day, _day(start), side="left"))
+        hi = len(self.day) if end is None else int(np.searchsorted(self.day, _day(end), side="right"))
+
+        pos = None
+        # ✅ menor grupo primeiro: as intersecções seguintes ficam pequenas
+        selected = sorted(
+            (self.groups[FILTER_COLUMNS[name]].get(value, np.array([], dtype=np.intp))
+             for name, value in filters.items() if value is not None),
+            key=len
+        )
+        for rows in selected:
+            pos = rows if pos is None else np.intersect1d(pos, rows, assume_unique=True)
+        if pos is None:
+            return np.arange(lo, hi)
+        return pos[(pos >= lo) & (pos < hi)]
+
+    def select(self, start=None, end=None, **filters):
+        """Mesmo resultado de load_report(start, end, dims, **filters) dentro do período carregado."""
+        return self.df.take(self.positions(start, end, **filters)).reset_index(drop=True)
+
+
+_period_caches = {}
+_period_lock = threading.Lock()
+
+
+def period_cache(kind, start, end, build, extra=()):
+    """
+    Resultado de build() para o período, guardado em memória por tipo
+    (kind: "index", "cube"...; até REPORT_INDEX_ENTRIES chaves cada).
+    - extra: o que mais muda o resultado (ex: filtros), entra na chave
+    A chave inclui a versão das tabelas do relatório: entrega registrada
+    neste processo invalida na hora; escritas de fora aparecem depois de
+    CACHE_TTL_SECONDS, como no cache do banco.
+    """
+    key = (start, end, extra, table_version(*VIEW_DEPENDENCIES["delivery_report"]))
+    now = time.monotonic()
+    with _period_lock:
+        cache = _period_caches.setdefault(kind, OrderedDict())
+        entry = cache.get(key)
+        if entry is not None and entry[0] > now:
+            cache.move_to_end(key)
+            return entry[1]
+
+    value = build()
+    with _period_lock:
+        cache[key] = (now + CACHE_TTL_SECONDS, value)
+        cache.move_to_end(key)
+        while len(cache) > REPORT_INDEX_ENTRIES:
+            cache.popitem(last=False)
+    return value
+
+
+def load_report_index(start, end, dims):
+    """
+    ReportIndex do período (sem filtros de dimensão), guardado em memória (period_cache).
+    Com DELIVERY_CACHE=1 as entregas vêm do arquivo local, sincronizado antes.
+    """
+    def build():
+        if delivery_cache.ENABLED:
+            df = _finish_report(report_from_deliveries(delivery_cache.load_deliveries(start, end), dims))
+        else:
+            df = load_report(start, end, dims)
+        return ReportIndex(df)
+
+    return period_cache("index", start, end, build)
+
+
+def clear_report_index():
+    with _period_lock:
+        _period_caches.clear()
+
+
+# linhas convertidas por vez no export (NaN -> célula vazia)
+EXPORT_CHUNK_ROWS = 5000
+
+
+def _chunks(df):
+    for start in range(0, len(df), EXPORT_CHUNK_ROWS):
+        yield df.iloc[start:start + EXPORT_CHUNK_ROWS]
+
+
+def export_csv(df: pd.DataFrame) -> bytes:
+    """✅ CSV padrão Excel BR (separado por ;, UTF-8 com BOM)."""
+    return export_csv_batches(df.columns, _chunks(df))
+
+
+def export_csv_batches(columns, frames) -> bytes:
+    """
+    Mesmo CSV de export_csv, a partir de blocos (DataFrames com as colunas
+    columns, em ordem): cada bloco é escrito e descartado, ex: os lotes de
+    uma consulta do DuckDB (utils.analytics).
+    """
+    out = io.BytesIO()
+    out.write(pd.DataFrame(columns=list(columns)).to_csv(index=False, sep=";").encode("utf-8-sig"))
+    for frame in frames:
+        out.write(frame.to_csv(index=False, sep=";", header=False).encode("utf-8"))
+    return out.getvalue()
+
+
+def column_width(longest, name):
+    """Largura de uma coluna no Excel: maior texto (header incluído) + 2, até 45."""
+    return min(max(longest, len(str(name))) + 2, 45)
+
+
+def _column_widths(df):
+    """
+    Largura de cada coluna (column_width). Um str.len() vetorizado por
+    coluna, sem percorrer célula a célula.
+    """
+    widths = []
+    for col in df.columns:
+        values = df[col].dropna()
+        longest = int(values.astype(str).str.len().max()) if len(values) else 0
+        widths.append(column_width(longest, col))
+    return widths
+
+
+def export_excel_pretty(df: pd.DataFrame) -> bytes:
+    """
+    Exporta Excel bonitinho:
+    - header negrito com fundo cinza
+    - auto filtro
+    - freeze header
+    - largura automática
+    """
+    # ✅ Excel não suporta datetimes com timezone
+    if "Data" in df.columns:
+        df = df.copy()
+        df["Data"] = pd.to_datetime(df["Data"], errors="coerce", utc=True).dt.tz_localize(None)
+    return export_excel_batches(df.columns, _chunks(df), len(df), _column_widths(df))
+
+
+def export_excel_batches(columns, frames, rows, widths) -> bytes:
+    """
+    Mesmo Excel de export_excel_pretty, a partir de blocos (DataFrames com as
+    colunas columns, datas sem timezone). rows e widths vêm antes porque o
+    filtro e as larguras são gravados antes da primeira linha.
+
+    ✅ Workbook write-only do openpyxl: as linhas vão direto para o arquivo,
+    sem montar uma célula Python por valor.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment
+    from openpyxl.utils import get_column_letter
+
+    columns = list(columns)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Entregas")
+
+    # ⚠️ no modo write-only larguras, freeze e filtro vêm antes da primeira linha
+    for i, width in enumerate(widths, start=1):
+        ws.column_dimensions[get_column_letter(i)].width = width
+    ws.freeze_panes = "A2"
+    last_col = get_column_letter(max(len(columns), 1))
+    ws.auto_filter.ref = f"A1:{last_col}{rows + 1}"
+
+    # Estilo header
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill("solid", fgColor="4F4F4F")
+    header_alignment = Alignment(horizontal="center", vertical="center")
+
+    header = []
+    for name in columns:
+        cell = WriteOnlyCell(ws, value=str(name))
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = header_alignment
+        header.append(cell)
+    ws.append(header)
+
+    for chunk in frames:
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        for row in chunk.itertuples(index=False, name=None):
+            ws.append(row)
+
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
@@ -0,0 +1,604 @@
+"""
+Backend local em SQLite (dias de entrega sem internet boa).
+
+Mesmo schema e mesma semântica do Supabase, num arquivo local:
+- as tabelas, índices e a view delivery_report são gerados a partir de
+  migrations/*.sql (tipos traduzidos para SQLite)
+- table().select().eq()...execute() e rpc() iguais ao MemoryClient; as RPCs
+  rodam as versões Python de utils.local_backend dentro de uma transação SQLite
+- SELECTs cortados em max-rows (DB_MAX_ROWS), como no MemoryClient
+- toda escrita é registrada no journal (sync_journal), na mesma transação
+- o cubo de entregas (delivery_cube) é mantido por triggers, como no Supabase
+
+Depois, com internet, o journal é enviado ao Supabase em lote (sync):
+- escritas diretas em tabelas viram upsert das linhas (por id) / delete por id
+- RPCs são repetidas no Supabase em lote (sync_rpc_batch, migrations/0008),
+  com as datas originais (parâmetros da migrations/0009) e uma chave de idempotência fixadas na chamada local:
+  repetir o sync não baixa o estoque duas vezes; o servidor recalcula o estoque
+Linhas editadas nos dois lados: vale a última enviada (last-writer-wins).
+⚠️ Linhas criadas por RPC (entregas, movimentos) ganham outro id no servidor:
+   não edite/apague localmente uma entrega feita offline antes do sync.
+
+Uso:
+    DB_BACKEND=sqlite DB_SQLITE_PATH=estoque_local.db streamlit run app.py
+
+    python -m utils.sqlite_backend pull     # copia o Supabase para o arquivo local
+    python -m utils.sqlite_backend status   # escritas ainda não enviadas
+    python -m utils.sqlite_backend sync     # envia o journal para o Supabase
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from utils.local_backend import (
+    Query, RpcCall, Response, LocalBackendError, RPC_FUNCTIONS, MAX_ROWS, SYNC_BATCH_RPCS, _DEFAULTS, _now,
+    max_rows_limit
+)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[1] / "migrations"
+
+# tabelas copiadas no pull (ordem respeita as foreign keys)
+SYNC_TABLES = (
+    "supervisors", "cell_leaders", "cells", "families", "products", "inventory",
+    "basket_types", "basket_type_items", "deliveries", "delivery_items", "stock_movements", "operation_keys",
+)
+
+_TYPES = [
+    (r"\buuid\b", "TEXT"),
+    (r"\btimestamptz\b", "TEXT"),
+    (r"\bnumeric\b", "REAL"),
+    (r"\bjsonb\b", "JSON"),
+    (r"\bboolean\b", "BOOLEAN"),
+    (r"\s+default gen_random_uuid\(\)", ""),
+    (r"\bdefault now\(\)", "default (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))"),
+]
+
+_JOURNAL = """
+create table if not exists sync_journal (
+    seq integer primary key autoincrement,
+    created_at TEXT not null,
+    kind TEXT not null,
+    target TEXT not null,
+    payload JSON not null,
+    synced_at TEXT
+);
+create index if not exists sync_journal_pending_idx on sync_journal (synced_at, seq);
+"""
+
+# Triggers do cubo de entregas (migrations/0006 em plpgsql): mesma regra, em SQL do SQLite.
+# Não passam pelo journal: no Supabase o cubo é mantido pelos triggers de lá.
+_NO_ID = "'00000000-0000-0000-0000-000000000000'"
+_CUBE_ADD = """
+    insert into delivery_cube (id, day, cell_id, leader_id, basket_type_id, deliveries, baskets)
+    values (lower(hex(randomblob(16))), date({r}.delivered_at),
+            coalesce((select cell_id from families where id = {r}.family_id), {none}),
+            coalesce({r}.leader_id, {none}), coalesce({r}.basket_type_id, {none}), {sign}, {sign} * {r}.quantity)
+    on conflict (day, cell_id, leader_id, basket_type_id) do update
+        set deliveries = deliveries + excluded.deliveries, baskets = baskets + excluded.baskets;"""
+_CUBE_TRIGGERS = f"""
+create trigger if not exists delivery_cube_on_insert after insert on deliveries begin
+{_CUBE_ADD.format(r="new", sign=1, none=_NO_ID)}
+end;
+create trigger if not exists delivery_cube_on_delete after delete on deliveries begin
+{_CUBE_ADD.format(r="old", sign=-1, none=_NO_ID)}
+    delete from delivery_cube where deliveries = 0;
+end;
+create trigger if not exists delivery_cube_on_update
+after update of delivered_at, family_id, leader_id, basket_type_id, quantity on deliveries begin
+{_CUBE_ADD.format(r="old", sign=-1, none=_NO_ID)}
+{_CUBE_ADD.format(r="new", sign=1, none=_NO_ID)}
+    delete from delivery_cube where deliveries = 0;
+end;
+create trigger if not exists delivery_cube_on_family_cell
+after update of cell_id on families when old.cell_id is not new.cell_id begin
+    insert into delivery_cube (id, day, cell_id, leader_id, basket_type_id, deliveries, baskets)
+    select lower(hex(randomblob(16))), date(d.delivered_at), m.cell_id,
+           coalesce(d.leader_id, {_NO_ID}), coalesce(d.basket_type_id, {_NO_ID}), sum(m.sign), sum(m.sign * d.quantity)
+      from deliveries d
+      cross join (select coalesce(old.cell_id, {_NO_ID}) as cell_id, -1 as sign
+                  union all select coalesce(new.cell_id, {_NO_ID}), 1) m
+     where d.family_id = new.id
+     group by 2, 3, 4, 5
+    on conflict (day, cell_id, leader_id, basket_type_id) do update
+        set deliveries = deliveries + excluded.deliveries, baskets = baskets + excluded.baskets;
+    delete from delivery_cube where deliveries = 0;
+end;
+"""
+
+
+def schema_sql(directory=MIGRATIONS_DIR):
+    """
+    DDL SQLite gerado das migrations: create table / create index / view.
+    Funções plpgsql ficam de fora (as RPCs rodam em Python).
+    """
+    out = []
+    for path in sorted(Path(directory).glob("*.sql")):
+        sql = path.read_text(encoding="utf-8")
+        for stmt in re.findall(r"create table if not exists .*?\n\);|create index if not exists [^;]*;",
+                               sql, re.IGNORECASE | re.DOTALL):
+            for pattern, repl in _TYPES:
+                stmt = re.sub(pattern, repl, stmt, flags=re.IGNORECASE)
+            out.append(stmt)
+        for name, body in re.findall(r"create or replace view (\w+) as(.*?);", sql, re.IGNORECASE | re.DOTALL):
+            out.append(f"drop view if exists {name};\ncreate view {name} as{body};")
+    return "\n\n".join(out) + "\n" + _JOURNAL + _CUBE_TRIGGERS
+
+
+def _quote(name):
+    if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", name):
+        raise LocalBackendError("42601", f"nome inválido: {name!r}")
+    return f'"{name}"'
+
+
+_SQL_OPS = {"eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+def _conditions(filters, logic="and"):
+    parts, params = [], []
+    for column, op, value in filters:
+        col = None if column is None else _quote(column)
+        if op == "tree":
+            # filtro lógico (or=(...)): entre parênteses, com and/or dentro
+            inner, values = _conditions(value[1], value[0])
+            parts.append(f"({inner})")
+            params.extend(values)
+        elif op in _SQL_OPS:
+            parts.append(f"{col} {_SQL_OPS[op]} ?")
+            params.append(_to_sql(value))
+        elif op == "like":
+            parts.append(f"{col} LIKE ?")
+            params.append(value[0])
+        elif op == "ilike":
+            parts.append(f"lower({col}) LIKE lower(?)")
+            params.append(value[0])
+        elif op == "in":
+            values = [_to_sql(v) for v in value]
+            if not values:
+                parts.append("0")
+            else:
+                parts.append(f"{col} IN ({','.join('?' * len(values))})")
+                params.extend(values)
+        elif op == "is":
+            parts.append(f"{col} IS ?")
+            params.append(_to_sql(value))
+        else:
+            raise LocalBackendError("PGRST100", f"operador não suportado: {op}")
+    return f" {logic.upper()} ".join(parts) or "1", params
+
+
+def _where(filters):
+    if not filters:
+        return "", []
+    sql, params = _conditions(filters)
+    return " WHERE " + sql, params
+
+
+def _to_sql(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return value
+
+
+class SQLiteClient:
+    def __init__(self, path=":memory:", rpc_functions=None, journal=True, max_rows=MAX_ROWS):
+        """
+        path: arquivo do banco (":memory:" para testes)
+        rpc_functions: substitui RPC_FUNCTIONS ({} simula banco sem migrations)
+        journal: False não registra escritas (ex: pull)
+        max_rows: corta cada SELECT como o max-rows do PostgREST (None = sem limite)
+        """
+        self.path = str(path)
+        self._lock = threading.RLock()
+        self._depth = 0
+        self.journal = journal
+        self.rpc_functions = RPC_FUNCTIONS if rpc_functions is None else rpc_functions
+        self.max_rows = max_rows
+        self.request_count = 0
+
+        self.conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("pragma foreign_keys = on")
+        self.conn.execute("pragma case_sensitive_like = on")
+        if self.path != ":memory:":
+            self.conn.execute("pragma journal_mode = wal")
+            self.conn.execute("pragma synchronous = normal")
+        self.conn.executescript(schema_sql())
+        self._types = {}
+        self._views = {r[0] for r in self.conn.execute("select name from sqlite_master where type = 'view'")}
+
+    def close(self):
+        self.conn.close()
+
+    def table(self, name):
+        return Query(self, name)
+
+    from_ = table
+
+    def rpc(self, fn, params=None):
+        return RpcCall(self, fn, params)
+
+    # ==========================
+    # TRANSAÇÃO
+    # ==========================
+    @contextmanager
+    def transaction(self, tables=()):
+        """Tudo dentro do bloco é atômico (BEGIN IMMEDIATE ... COMMIT/ROLLBACK)."""
+        with self._lock:
+            outer = self._depth == 0
+            if outer:
+                self.conn.execute("begin immediate")
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if outer:
+                    self.conn.execute("rollback")
+                raise
+            else:
+                self._depth -= 1
+                if outer:
+                    self.conn.execute("commit")
+
+    def _count_request(self):
+        if self._depth == 0:
+            self.request_count += 1
+
+    def _record(self, kind, target, payload):
+        # só a chamada de fora é registrada: escritas de dentro de uma RPC vão junto com ela
+        if self.journal and self._depth == 1:
+            self.conn.execute(
+                "insert into sync_journal (created_at, kind, target, payload) values (?, ?, ?, ?)",
+                (_now(), kind, target, json.dumps(payload, default=str))
+            )
+
+    # ==========================
+    # EXECUÇÃO
+    # ==========================
+    def _call_rpc(self, fn, params):
+        with self._lock:
+            self._count_request()
+            if fn not in self.rpc_functions:
+                raise LocalBackendError("PGRST202", f"Could not find the function public.{fn}")
+            impl, touches = self.rpc_functions[fn]
+            with self.transaction(touches):
+                # RPC só de leitura (touches vazio) não vai para o sync
+                if touches and self.journal and self._depth == 1:
+                    params = replay_params(fn, params)
+                    self._record("rpc", fn, params)
+                try:
+                    return impl(self, **params)
+                except sqlite3.Error as e:
+                    raise _api_error(e) from e
+
+    def _table_info(self, table):
+        info = self._types.get(table)
+        if info is None:
+            rows = self.conn.execute(f"pragma table_info({_quote(table)})").fetchall()
+            if not rows:
+                raise LocalBackendError("PGRST205", f"Could not find the table 'public.{table}' in the schema cache")
+            info = ({r["name"]: (r["type"] or "").upper() for r in rows},
+                    [r["name"] for r in sorted(rows, key=lambda r: r["pk"]) if r["pk"]])
+            self._types[table] = info
+        return info
+
+    def _column_types(self, table):
+        return self._table_info(table)[0]
+
+    def primary_key(self, table):
+        """Colunas da chave primária (ex: ["id"]; operation_keys usa ["key"])."""
+        return self._table_info(table)[1]
+
+    def _rows(self, table, cursor):
+        types = self._column_types(table)
+        out = []
+        for row in cursor.fetchall():
+            r = dict(row)
+            for col, value in r.items():
+                t = types.get(col)
+                if value is None:
+                    continue
+                if t == "BOOLEAN":
+                    r[col] = bool(value)
+                elif t == "JSON" and isinstance(value, str):
+                    r[col] = json.loads(value)
+            out.append(r)
+        return out
+
+    def _execute(self, q):
+        with self._lock:
+            self._count_request()
+            types = self._column_types(q.table)
+            try:
+                if q.op == "select":
+                    return Response(self._select(q))
+                if q.table in self._views:
+                    raise LocalBackendError("55000", f"cannot change view \"{q.table}\"")
+                with self.transaction((q.table,)):
+                    if q.op in ("insert", "upsert"):
+                        rows = self._insert(q, types)
+                        self._record("rows", q.table, rows)
+                    elif q.op == "update":
+                        rows = self._update(q)
+                        self._record("rows", q.table, rows)
+                    elif q.op == "delete":
+                        rows = self._delete(q)
+                        pk = self.primary_key(q.table)
+                        self._record("delete", q.table, [[r[k] for k in pk] for r in rows])
+                    else:
+                        raise LocalBackendError("PGRST100", f"operação não suportada: {q.op}")
+                return Response(rows)
+            except sqlite3.Error as e:
+                raise _api_error(e) from e
+
+    def _select(self, q):
+        cols = "*" if q.columns == "*" else ", ".join(_quote(c.strip()) for c in q.columns.split(","))
+        where, params = _where(q.filters)
+        sql = f"select {cols} from {_quote(q.table)}{where}"
+        if q.orders:
+            # mesma ordem do Postgres: NULL no fim no ASC, no começo no DESC
+            sql += " order by " + ", ".join(
+                f"{_quote(c)} desc nulls first" if desc else f"{_quote(c)} asc nulls last" for c, desc in q.orders
+            )
+        limit = max_rows_limit(q.limit_n, self.max_rows, self._depth)
+        if limit is not None or q.offset_n:
+            sql += " limit ? offset ?"
+            params += [-1 if limit is None else limit, q.offset_n or 0]
+        return self._rows(q.table, self.conn.execute(sql, params))
+
+    def _insert(self, q, types):
+        rows = q.payload if isinstance(q.payload, list) else [q.payload]
+        out = []
+        for r in rows:
+            row = {}
+            if "id" in types:
+                row["id"] = str(uuid.uuid4())
+            if "created_at" in types:
+                row["created_at"] = _now()
+            for col, default in _DEFAULTS.get(q.table, {}).items():
+                row[col] = default()
+            row.update(r)
+            if q.op == "upsert":
+                # upsert só escreve as colunas enviadas numa linha que já existe
+                keys = [c.strip() for c in q.on_conflict.split(",")]
+                sent = [c for c in r if c not in keys]
+                if keys == ["id"] and "id" not in r:
+                    conflict = ""
+                else:
+                    updates = ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in sent)
+                    action = f"do update set {updates}" if updates else "do nothing"
+                    conflict = f" on conflict ({', '.join(_quote(k) for k in keys)}) {action}"
+            else:
+                conflict = ""
+            cols = list(row)
+            sql = (f"insert into {_quote(q.table)} ({', '.join(_quote(c) for c in cols)}) "
+                   f"values ({', '.join('?' * len(cols))}){conflict} returning *")
+            out.extend(self._rows(q.table, self.conn.execute(sql, [_to_sql(row[c]) for c in cols])))
+        return out
+
+    def _update(self, q):
+        sets = ", ".join(f"{_quote(c)} = ?" for c in q.payload)
+        where, params = _where(q.filters)
+        sql = f"update {_quote(q.table)} set {sets}{where} returning *"
+        return self._rows(q.table, self.conn.execute(sql, [_to_sql(v) for v in q.payload.values()] + params))
+
+    def _delete(self, q):
+        where, params = _where(q.filters)
+        return self._rows(q.table, self.conn.execute(f"delete from {_quote(q.table)}{where} returning *", params))
+
+    def load_rows(self, table, rows):
+        """
+        Carga em lote (pull, dados de teste): upsert pela chave primária, sem
+        journal e sem defaults. As linhas precisam ter as mesmas colunas.
+        """
+        if not rows:
+            return
+        # upsert (e não "insert or replace", que dispararia os on delete cascade)
+        cols = list(rows[0])
+        pk = self.primary_key(table)
+        updates = ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in cols if c not in pk)
+        action = f"do update set {updates}" if updates else "do nothing"
+        sql = (f"insert into {_quote(table)} ({', '.join(_quote(c) for c in cols)}) "
+               f"values ({', '.join('?' * len(cols))}) "
+               f"on conflict ({', '.join(_quote(k) for k in pk)}) {action}")
+        with self.transaction((table,)):
+            self.conn.executemany(sql, [[_to_sql(r.get(c)) for c in cols] for r in rows])
+
+    # ==========================
+    # JOURNAL
+    # ==========================
+    def pending(self):
+        """Escritas ainda não enviadas, em ordem."""
+        with self._lock:
+            cur = self.conn.execute(
+                "select seq, created_at, kind, target, payload from sync_journal where synced_at is null order by seq"
+            )
+            return [{**dict(r), "payload": json.loads(r["payload"])} for r in cur.fetchall()]
+
+    def mark_synced(self, seqs):
+        with self._lock:
+            for i in range(0, len(seqs), 500):
+                chunk = seqs[i:i + 500]
+                self.conn.execute(
+                    f"update sync_journal set synced_at = ? where seq in ({','.join('?' * len(chunk))})",
+                    [_now(), *chunk]
+                )
+
+
+# sqlite3 -> códigos do Postgres que o app já trata
+_SQLITE_CODES = [
+    ("UNIQUE constraint failed", "23505"),
+    ("FOREIGN KEY constraint failed", "23503"),
+    ("NOT NULL constraint failed", "23502"),
+    ("no such table", "42P01"),
+    ("no such column", "42703"),
+]
+
+
+def _api_error(e):
+    msg = str(e)
+    code = next((c for text, c in _SQLITE_CODES if text in msg), "XX000")
+    return LocalBackendError(code, msg)
+
+
+# ==========================
+# SYNC COM O SUPABASE
+# ==========================
+# ✅ Fixados na chamada local (se não vierem) e gravados no journal: no sync o
+#    Supabase grava as mesmas datas, e a chave impede aplicar duas vezes
+_REPLAY_PARAMS = {
+    "apply_stock_movement": ("p_idempotency_key", "p_created_at"),
+    "register_delivery_tx": ("p_created_at",),
+    "checkout_basket_tx": ("p_created_at",),
+}
+
+
+def replay_params(fn, params):
+    """Parâmetros da RPC com a chave de idempotência e a data da chamada local."""
+    out = dict(params or {})
+    now = _now()
+    for name in _REPLAY_PARAMS.get(fn, ()):
+        if out.get(name) is None:
+            out[name] = f"sync-{uuid.uuid4()}" if name == "p_idempotency_key" else now
+    if fn == "register_delivery_tx" and out.get("p_delivered_at") is None:
+        out["p_delivered_at"] = out["p_created_at"]
+    return out
+
+
+def _group_key(e):
+    if e["kind"] == "rpc":
+        return ("rpc",) if e["target"] in SYNC_BATCH_RPCS else None
+    return e["kind"], e["target"]
+
+
+def _groups(entries, rpc_chunk_size=500):
+    """
+    Junta entradas seguidas do mesmo tipo/tabela (1 request por bloco).
+    RPCs seguidas vão juntas (até rpc_chunk_size) se o sync_rpc_batch souber repeti-las.
+    """
+    group = []
+    for e in entries:
+        key = _group_key(e)
+        full = key == ("rpc",) and len(group) >= rpc_chunk_size
+        if group and (key is None or key != _group_key(group[0]) or full):
+            yield group
+            group = []
+        group.append(e)
+    if group:
+        yield group
+
+
+def _replay_rpcs(remote, entries):
+    """Repete as RPCs no Supabase: 1 request (sync_rpc_batch) ou, sem a migration 0008, uma a uma."""
+    if len(entries) > 1 or entries[0]["target"] in SYNC_BATCH_RPCS:
+        calls = [{"fn": e["target"], "params": e["payload"]} for e in entries]
+        try:
+            remote.rpc("sync_rpc_batch", {"p_calls": calls}).execute()
+            return
+        except Exception as e:
+            if getattr(e, "code", None) != "PGRST202":
+                raise
+    for e in entries:
+        remote.rpc(e["target"], e["payload"]).execute()
+
+
+def sync(local, remote, chunk_size=500, log=print):
+    """
+    Envia o journal do SQLite para o Supabase (remote), em ordem.
+    Cada bloco enviado é marcado como sincronizado; se algo falhar, o resto
+    fica pendente para a próxima tentativa.
+    Retorna quantas entradas foram enviadas.
+    """
+    sent = 0
+    for group in _groups(local.pending(), chunk_size):
+        kind, target = group[0]["kind"], group[0]["target"]
+        if kind == "rpc":
+            _replay_rpcs(remote, group)
+            target = ", ".join(sorted({e["target"] for e in group}))
+        elif kind == "rows":
+            # a última versão de cada linha ganha (upsert não aceita a mesma chave 2x)
+            pk = local.primary_key(target)
+            rows = {}
+            for e in group:
+                for r in e["payload"]:
+                    rows[tuple(r[k] for k in pk)] = r
+            rows = list(rows.values())
+            for i in range(0, len(rows), chunk_size):
+                remote.table(target).upsert(rows[i:i + chunk_size], on_conflict=",".join(pk)).execute()
+        elif kind == "delete":
+            pk = local.primary_key(target)
+            keys = [k for e in group for k in e["payload"]]
+            if len(pk) == 1:
+                ids = sorted({k[0] for k in keys})
+                for i in range(0, len(ids), chunk_size):
+                    remote.table(target).delete().in_(pk[0], ids[i:i + chunk_size]).execute()
+            else:
+                for k in keys:
+                    q = remote.table(target).delete()
+                    for col, value in zip(pk, k):
+                        q = q.eq(col, value)
+                    q.execute()
+        local.mark_synced([e["seq"] for e in group])
+        sent += len(group)
+        log(f"→ {kind} {target}: {len(group)}")
+    return sent
+
+
+def pull(local, remote, tables=SYNC_TABLES, page_size=1000, log=print):
+    """Copia as tabelas do Supabase para o SQLite (sem passar pelo journal)."""
+    with local._lock, local.transaction():
+        for table in tables:
+            total = 0
+            start = 0
+            while True:
+                q = remote.table(table).select("*").order(local.primary_key(table)[0])
+                page = q.range(start, start + page_size - 1).execute().data
+                local.load_rows(table, page)
+                total += len(page)
+                start += len(page)
+                if len(page) < page_size:
+                    break
+            log(f"← {table}: {total}")
+
+
+def main(argv=None):
+    from utils.db import create_backend
+
+    parser = argparse.ArgumentParser(description="Banco local SQLite: pull / status / sync com o Supabase")
+    parser.add_argument("command", choices=["pull", "status", "sync"])
+    parser.add_argument("--path", default=os.getenv("DB_SQLITE_PATH", "estoque_local.db"))
+    args = parser.parse_args(argv)
+
+    local = SQLiteClient(args.path)
+    try:
+        pending = local.pending()
+        if args.command == "status":
+            print(f"{len(pending)} escrita(s) pendente(s) em {args.path}")
+            for e in pending[:20]:
+                print(f"  #{e['seq']} {e['created_at']} {e['kind']} {e['target']}")
+            return 0
+
+        remote = create_backend("supabase", latency_ms=0)
+        if args.command == "pull":
+            if pending:
+                print(f"⚠️ {len(pending)} escrita(s) local(is) ainda não enviada(s): rode sync antes do pull.")
+                return 1
+            pull(local, remote)
+            print("✅ Banco local atualizado.")
+        else:
+            sent = sync(local, remote)
+            print(f"✅ {sent} escrita(s) enviada(s)." if sent else "✅ Nada pendente.")
+        return 0
+    finally:
+        local.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
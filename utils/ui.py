@@ -1,13 +1,22 @@
 import streamlit as st
 
+from utils import querylog
 
-def apply_global_layout(max_width: int = 1750):
+
+def apply_global_layout(max_width: int = 1750, page: str | None = None):
     """
     ✅ Layout global responsivo.
     - Desktop: deixa a página bem mais larga
     - Mobile: mantém padding confortável
-    - Não altera lógica, só CSS
+    - page: nome da página no log de chamadas ao banco (DB_DEBUG / DB_QUERY_LOG)
     """
+    # ✅ abre o log do rerun antes de qualquer leitura da página
+    query_log = querylog.start(page=page)
+    if query_log is not None and querylog.DEBUG:
+        with st.sidebar:
+            panel = st.empty()
+        query_log.on_change = lambda log: render_query_panel(panel, log)
+        render_query_panel(panel, query_log)
 
     st.markdown(
         f"""
@@ -48,3 +57,211 @@ def apply_global_layout(max_width: int = 1750):
         """,
         unsafe_allow_html=True
     )
+
+
+def render_query_panel(placeholder, log):
+    """
+    Resumo das chamadas ao banco do rerun (DB_DEBUG=1), desenhado na sidebar.
+    - placeholder: st.empty() reaproveitado a cada atualização
+    """
+    s = log.summary()
+    lines = [
+        "**🔎 Banco — este rerun**",
+        f"{s['queries']} queries · {s['total_ms']:.0f} ms · {s['cache_hits']} do cache",
+    ]
+
+    slow = s["slowest"]
+    if slow:
+        lines.append(f"🐢 Mais lenta: `{slow['table']}` ({slow['op']}) — {slow['ms']:.0f} ms, {slow['rows']} linhas")
+
+    for table, op, n in s["duplicates"][:5]:
+        lines.append(f"⚠️ Repetida {n}x: `{table}` ({op})")
+
+    placeholder.markdown("  \n".join(lines))
+
+
+def render_queue_status(queue):
+    """
+    Situação da fila de entregas (DELIVERY_WRITE_BEHIND=1): pendentes, atraso
+    do envio e conflitos, com botões para reenviar ou descartar.
+    """
+    s = queue.stats()
+    lag = f"{s['lag_seconds']:.0f}s" if s["pending"] else "-"
+    line = f"📮 **Fila de entregas:** {s['pending']} pendente(s) · atraso {lag}"
+    if s["last_error"]:
+        line += f" · ⚠️ sem conexão, tentando de novo ({s['last_error'][:80]})"
+    st.caption(line)
+
+    if not s["conflicts"]:
+        return
+    with st.expander(f"❌ {s['conflicts']} entrega(s) com conflito"):
+        for c in queue.conflicts():
+            st.write(f"**{c['params'].get('recipient_name') or c['key']}** — {c['created_at'][:16]}")
+            st.caption(c["error"])
+            col1, col2 = st.columns(2)
+            if col1.button("🔁 Tentar de novo", key=f"requeue_{c['key']}"):
+                queue.requeue(c["key"])
+                st.experimental_rerun()
+            if col2.button("🗑️ Descartar", key=f"discard_{c['key']}"):
+                queue.discard(c["key"])
+                st.experimental_rerun()
+
+
+def render_delivery_summary(cube, families):
+    """
+    Resumo dos Relatórios (entregas, cestas, famílias), a partir do cubo
+    já filtrado (utils.delivery_cube) e da contagem de famílias.
+    """
+    from utils.delivery_cube import summary
+
+    s = summary(cube)
+    colA, colB, colC = st.columns(3)
+    colA.metric("Entregas", s["deliveries"])
+    colB.metric("Total de cestas entregues", s["baskets"])
+    colC.metric("Famílias atendidas", families)
+
+
+def render_delivery_rollups(cube):
+    """Gráficos de cestas/entregas por dia, célula, supervisor, líder e cesta (uma aba cada)."""
+    from utils.delivery_cube import ROLLUPS, rollup
+
+    if cube.empty:
+        return
+    tabs = st.tabs([f"Por {label.lower()}" for label in ROLLUPS])
+    for tab, column in zip(tabs, ROLLUPS.values()):
+        with tab:
+            totals = rollup(cube, column)
+            st.bar_chart(totals["Cestas"])
+            st.dataframe(totals, use_container_width=True)
+
+
+REPORT_EXPORTS = [
+    ("csv", "CSV (Excel - separado por ;)", "relatorio_entregas.csv", "text/csv"),
+    ("xlsx", "Excel (.xlsx) — Profissional", "relatorio_entregas.xlsx",
+     "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+]
+
+
+def render_report_exports(start, end, dims, filters, df):
+    """
+    Botões de exportação do relatório (CSV e Excel).
+    ✅ Arquivos gerados só quando pedidos e guardados por filtros + dados
+    (utils.export_cache): mexer em outro widget ou baixar de novo não gera nada.
+    - df: relatório filtrado da tela (no modo analítico a exportação lê tudo em SQL)
+    """
+    from utils import analytics
+    from utils.export_cache import export_key, get_cached_export, get_export, build_export
+
+    if analytics.ENABLED:
+        key = analytics.export_key(start, end, dims, **filters)
+    else:
+        key = export_key({"start": start, "end": end, **filters}, df)
+
+    for kind, label, file_name, mime in REPORT_EXPORTS:
+        data = get_cached_export(kind, key)
+        if data is None and st.button(f"⚙️ Gerar {label}", key=f"gerar_{kind}"):
+            with st.spinner("Gerando arquivo..."):
+                if analytics.ENABLED:
+                    data = build_export(kind, key, lambda: analytics.export(kind, start, end, dims, **filters))
+                else:
+                    data = get_export(kind, df, key)
+        if data is not None:
+            st.download_button(f"⬇️ Baixar {label}", data, file_name=file_name, mime=mime, key=f"baixar_{kind}")
+
+
+def _choice(value, everything):
+    return None if value == everything else value
+
+
+def render_delivery_report(item_totals: bool = False):
+    """
+    Seção de relatório de entregas (Registrar Entrega e Relatórios): filtros,
+    resumo e totais do cubo, detalhe sob demanda e exportação.
+    - item_totals: mostra os itens entregues (só no modo analítico)
+    """
+    from datetime import datetime, timedelta
+
+    from utils import analytics
+    from utils.delivery_cube import family_count, filter_cube, load_cube
+    from utils.reports import filter_options, load_dimensions, load_report_index
+
+    # ==========================
+    # FILTROS (viram predicados no banco)
+    # ==========================
+    dims = load_dimensions()
+    options = filter_options(dims)
+
+    st.subheader("🔎 Filtros")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        start = st.date_input("Data inicial", value=datetime.now().date() - timedelta(days=30))
+    with col2:
+        end = st.date_input("Data final", value=datetime.now().date())
+    with col3:
+        network_cell = st.selectbox("Rede da Célula", ["(todas)"] + options["networks"])
+
+    leader_filter = st.selectbox("Líder", ["(todos)"] + options["leaders"])
+    basket_filter = st.selectbox("Tipo de cesta", ["(todas)"] + options["baskets"])
+    cell_filter = st.selectbox("Célula", ["(todas)"] + options["cells"])
+    supervisor_filter = st.selectbox("Supervisor", ["(todos)"] + options["supers"])
+
+    filters = dict(
+        network=_choice(network_cell, "(todas)"),
+        leader=_choice(leader_filter, "(todos)"),
+        basket=_choice(basket_filter, "(todas)"),
+        cell=_choice(cell_filter, "(todas)"),
+        supervisor=_choice(supervisor_filter, "(todos)"),
+    )
+
+    # ==========================
+    # RESUMO E GRÁFICOS (cubo pré-agregado: sem ler as entregas linha a linha)
+    # ==========================
+    if analytics.ENABLED:
+        # modo analítico: filtros e totais em SQL (DuckDB) sobre a cópia local
+        cube = analytics.load_cube(start, end, dims, **filters)
+        families = analytics.family_count(start, end, dims, **filters)
+    else:
+        cube = filter_cube(load_cube(start, end, dims), **filters)
+        families = family_count(start, end, dims, **filters)
+
+    st.subheader("📌 Resumo")
+    render_delivery_summary(cube, families)
+
+    if cube.empty:
+        st.info("Nenhuma entrega encontrada para o período e filtros escolhidos.")
+
+    st.subheader("📈 Totais")
+    render_delivery_rollups(cube)
+
+    if item_totals and analytics.ENABLED:
+        items = analytics.item_totals(start, end, dims, **filters)
+        if not items.empty:
+            st.subheader("🥫 Itens entregues")
+            st.dataframe(items, use_container_width=True, hide_index=True)
+
+    # ==========================
+    # DETALHE (entregas linha a linha: só carregadas quando pedidas)
+    # ==========================
+    st.divider()
+    if not st.toggle("📋 Mostrar as entregas (detalhe e exportação)", key="detalhe"):
+        return
+
+    st.subheader("📋 Resultados")
+    if analytics.ENABLED:
+        # ✅ na tela só as mais recentes; a exportação lê tudo em lotes
+        df = analytics.load_report(start, end, dims, limit=analytics.PREVIEW_ROWS, newest_first=True, **filters)
+        total = analytics.summary(start, end, dims, **filters)["deliveries"]
+        if total > len(df):
+            st.caption(f"Mostrando as {len(df)} entregas mais recentes de {total}. A exportação traz todas.")
+        st.dataframe(df, use_container_width=True)
+    else:
+        # ✅ período lido uma vez (view delivery_report); os filtros usam os índices em memória
+        df = load_report_index(start, end, dims).select(**filters)
+        st.dataframe(df.sort_values("Data", ascending=False), use_container_width=True)
+
+    # ==========================
+    # EXPORTAÇÃO
+    # ==========================
+    st.subheader("📥 Exportação")
+    render_report_exports(start, end, dims, filters, df)